@@ -0,0 +1,160 @@
+"""Struct-of-arrays store for all bodies, indexed by body id.
+
+Numeric properties live in contiguous NumPy columns so per-frame updates are
+array operations over every body at once. VTK objects, which cannot go into
+arrays, are kept in parallel lists. BodyView gives UI code a lightweight
+per-body handle onto the same storage.
+"""
+import numpy as np
+
+from ephemeris import ELEMENT_KEYS
+
+# numeric columns and their per-body shape
+FLOAT_COLUMNS = {
+    'mass': (),
+    'radius': (),
+    'visual_radius': (),
+    'rotation_period': (),
+    'rotation_angle': (),
+    'axial_tilt': (),
+    'color': (3,),
+    'elements': (len(ELEMENT_KEYS),),
+    'position': (3,),
+    'velocity': (3,),
+}
+
+OBJECT_COLUMNS = ('texture_path', 'actor', 'axis_actor', 'label', 'trail', 'trail_actor')
+
+
+class BodyRegistry:
+
+    def __init__(self, capacity=16):
+        self.names = []
+        self.ids = {}
+        self.count = 0
+        self._capacity = capacity
+        self._storage = {column: np.zeros((capacity,) + shape) for column, shape in FLOAT_COLUMNS.items()}
+        self._storage['parent'] = np.full(capacity, -1, dtype=np.intp)
+        for column in OBJECT_COLUMNS:
+            setattr(self, column, [])
+        self._expose()
+
+    def add(self, name, mass, radius, color, visual_radius, rotation_period=24.0, axial_tilt=0.0,
+            parent_body=None, texture_path=None):
+        """Register a body and return its id; parents must be added first"""
+        if name in self.ids:
+            raise ValueError(f"Body {name} already registered")
+
+        if self.count == self._capacity:
+            self._grow(2 * self._capacity)
+
+        body_id = self.count
+        self.count += 1
+        self._expose()
+
+        self.names.append(name)
+        self.ids[name] = body_id
+        self.mass[body_id] = mass
+        self.radius[body_id] = radius
+        self.visual_radius[body_id] = visual_radius
+        self.rotation_period[body_id] = rotation_period
+        self.axial_tilt[body_id] = axial_tilt
+        self.color[body_id] = color
+        self.parent[body_id] = -1 if parent_body is None else self.ids[parent_body]
+
+        self.texture_path.append(texture_path)
+        for column in OBJECT_COLUMNS[1:]:
+            getattr(self, column).append(None)
+        return body_id
+
+    def parent_names(self):
+        return [self.names[p] if p >= 0 else None for p in self.parent]
+
+    def _grow(self, capacity):
+        for column, array in self._storage.items():
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            if column == 'parent':
+                grown[:] = -1
+            grown[:self.count] = array[:self.count]
+            self._storage[column] = grown
+        self._capacity = capacity
+
+    def _expose(self):
+        # public columns are views of the first `count` rows of the storage
+        for column, array in self._storage.items():
+            setattr(self, column, array[:self.count])
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __getitem__(self, name):
+        return BodyView(self, self.ids[name])
+
+    def __iter__(self):
+        for body_id in range(self.count):
+            yield BodyView(self, body_id)
+
+    def view(self, body_id):
+        return BodyView(self, body_id)
+
+
+def _column(column):
+    def get(self):
+        return getattr(self.registry, column)[self.id]
+
+    def set(self, value):
+        getattr(self.registry, column)[self.id] = value
+
+    return property(get, set)
+
+
+def _element(col):
+    def get(self):
+        return float(self.registry.elements[self.id, col])
+
+    def set(self, value):
+        self.registry.elements[self.id, col] = value
+
+    return property(get, set)
+
+
+class BodyView:
+    """Handle onto one registry row; writes go straight to the columns"""
+    __slots__ = ('registry', 'id')
+
+    def __init__(self, registry, body_id):
+        self.registry = registry
+        self.id = body_id
+
+    @property
+    def name(self):
+        return self.registry.names[self.id]
+
+    @property
+    def parent_body(self):
+        parent = self.registry.parent[self.id]
+        return self.registry.names[parent] if parent >= 0 else None
+
+    @property
+    def color(self):
+        return tuple(self.registry.color[self.id])
+
+    def __eq__(self, other):
+        return isinstance(other, BodyView) and other.registry is self.registry and other.id == self.id
+
+    def __hash__(self):
+        return hash((id(self.registry), self.id))
+
+    def __repr__(self):
+        return f"BodyView({self.name!r})"
+
+
+for _name in ('mass', 'radius', 'visual_radius', 'rotation_period', 'rotation_angle', 'axial_tilt',
+              'position', 'velocity') + OBJECT_COLUMNS:
+    setattr(BodyView, _name, _column(_name))
+for _col, _key in enumerate(ELEMENT_KEYS):
+    setattr(BodyView, _key, _element(_col))
+del _name, _col, _key
@@ -0,0 +1,249 @@
+"""Chebyshev-compressed ephemeris segments, in the style of JPL SPK type 2.
+
+Each body's position relative to its parent is fitted over a time window
+with fixed-length segments. Each segment holds a degree-n Chebyshev series
+per coordinate. The segment length is halved until the fit error, checked
+between the fitting nodes, is within tolerance. Evaluating any epoch then
+costs one segment lookup and a Clenshaw recurrence, the same for every body
+and date. Velocities come from the differentiated series.
+
+Run as a script to precompute the slider window:
+
+    python chebyshev.py ephemeris.cheb --days 10000
+
+The app loads ephemeris.cheb from the working directory if it exists.
+"""
+import argparse
+import struct
+from datetime import datetime
+
+import numpy as np
+
+import ephemeris
+
+DEGREE = 15
+TOLERANCE = 1000.0  # meters, in true (not exaggerated) coordinates
+MAX_SEGMENTS = 20000  # per body; faster orbits are left to the Kepler solver
+DEFAULT_FILE = "ephemeris.cheb"
+
+MAGIC = b"ORBCHEB\0"
+VERSION = 2  # 2: element tables moved to day number 0
+# magic, version, degree, bodies, start day, stop day, then the four physics multipliers
+HEADER = struct.Struct("<8sHHIdd4d")
+PHYSICS_KEYS = ('sun_mass_scale', 'G_multiplier', 'ecc_multiplier', 'inc_multiplier')
+BODY_DTYPE = np.dtype([
+    ('name', 'S16'), ('parent', 'S16'), ('segments', '<i8'), ('offset', '<i8'),
+    ('span', '<f8'), ('error_bound', '<f8'),
+])
+
+
+def clenshaw(coefficients, x):
+    """Sum of c_k T_k(x) over the last axis of coefficients, by Clenshaw's recurrence"""
+    b1 = np.zeros(np.broadcast_shapes(coefficients.shape[:-1], np.shape(x)))
+    b2 = np.zeros_like(b1)
+    two_x = 2 * x
+    for k in range(coefficients.shape[-1] - 1, 0, -1):
+        b1, b2 = coefficients[..., k] + two_x * b1 - b2, b1
+    return coefficients[..., 0] + x * b1 - b2
+
+
+def derivative_coefficients(coefficients):
+    """Chebyshev coefficients of d/dx of the series, same length (last one zero)"""
+    n = coefficients.shape[-1]
+    d = np.zeros(coefficients.shape[:-1] + (n + 1,))
+    for k in range(n - 1, 0, -1):
+        d[..., k - 1] = d[..., k + 1] + 2 * k * coefficients[..., k]
+    d[..., 0] *= 0.5
+    return d[..., :n]
+
+
+def _nodes(degree):
+    """Chebyshev-Gauss fitting nodes, and check points halfway between them"""
+    n = degree + 1
+    nodes = np.cos(np.pi * (np.arange(n) + 0.5) / n)
+    check = np.cos(np.pi * np.arange(1, n) / n)
+    return nodes, check
+
+
+def _relative_positions(tree, row, days, physics):
+    elements = ephemeris.apply_physics(tree.elements_at_epochs(days.reshape(1, -1), [row]), physics)
+    a_scale = tree.a_scale(physics['sun_mass_scale'])[row]
+    return ephemeris.positions_from_elements(elements, a_scale)[0].reshape(days.shape + (3,))
+
+
+def fit_body(tree, row, start, stop, physics, tolerance=TOLERANCE, degree=DEGREE, max_segments=MAX_SEGMENTS):
+    """(span, coefficients (segments, 3, degree + 1), error bound) for one body, or None"""
+    nodes, check = _nodes(degree)
+    n = degree + 1
+    # T_k at the nodes, for the discrete Chebyshev transform
+    transform = np.cos(np.outer(np.arange(n), np.arccos(nodes))) * (2.0 / n)
+    transform[0] *= 0.5
+
+    rate = abs(tree.rate[row, ephemeris.IDX_M])
+    span = stop - start
+    if rate > 0:
+        span = min(span, 2 * 360.0 / rate)
+    while True:
+        count = int(np.ceil((stop - start) / span - 1e-9))
+        if count > max_segments:
+            return None
+        mids = start + (np.arange(count) + 0.5) * span
+        days = mids[:, None] + 0.5 * span * np.concatenate((nodes, check))[None, :]
+        samples = _relative_positions(tree, row, days, physics)
+
+        coefficients = np.einsum('kj,sjc->sck', transform, samples[:, :n])
+        fitted = clenshaw(coefficients[:, :, None, :], check[None, None, :])
+        error = np.abs(fitted - samples[:, n:].transpose(0, 2, 1)).max()
+        # the last two terms show what a higher degree could still add; the
+        # check points only sample the error, so allow twice that, plus rounding
+        tail = np.abs(coefficients[..., -2:]).sum(axis=-1).max()
+        rounding = 4 * n * np.finfo(float).eps * np.abs(samples).max()
+        error_bound = 2 * max(error, tail) + rounding
+        if error_bound <= tolerance:
+            return span, coefficients, error_bound
+        span /= 2
+
+
+class ChebyshevEphemeris:
+    """Fitted segments for a set of bodies, relative to their parents"""
+
+    def __init__(self, table, coefficients, start, stop, degree, physics):
+        self.table = table
+        self.coefficients = coefficients
+        self.start = start
+        self.stop = stop
+        self.degree = degree
+        self.physics = dict(physics)
+        self.names = [name.decode() for name in table['name']]
+        self.parents = [parent.decode() for parent in table['parent']]
+        self.ids = {name: k for k, name in enumerate(self.names)}
+        self._rows = {}
+
+    @classmethod
+    def fit(cls, tree, start, stop, physics=None, tolerance=TOLERANCE, degree=DEGREE,
+            max_segments=MAX_SEGMENTS, bodies=None):
+        """Fit every moving body of the tree (or the named ones) over [start, stop] days"""
+        physics = ephemeris.DEFAULT_PHYSICS if physics is None else physics
+        rows = range(len(tree.names)) if bodies is None else tree.body_ids(bodies)
+
+        entries, blocks, offset = [], [], 0
+        for row in rows:
+            if tree.base[row, ephemeris.IDX_A] == 0:
+                continue
+            fitted = fit_body(tree, row, start, stop, physics, tolerance, degree, max_segments)
+            if fitted is None:
+                print(f"{tree.names[row]}: more than {max_segments} segments needed, left to the Kepler solver")
+                continue
+            span, coefficients, error_bound = fitted
+            parent = tree.parent_index[row]
+            entries.append((tree.names[row], tree.names[parent] if parent >= 0 else "",
+                            len(coefficients), offset, span, error_bound))
+            blocks.append(coefficients)
+            offset += len(coefficients)
+
+        table = np.array(entries, dtype=BODY_DTYPE)
+        coefficients = np.concatenate(blocks) if blocks else np.zeros((0, 3, degree + 1))
+        return cls(table, coefficients, start, stop, degree, physics)
+
+    @classmethod
+    def load(cls, path):
+        """Read a file written by save(); the coefficients are memory-mapped"""
+        with open(path, 'rb') as f:
+            magic, version, degree, n_bodies, start, stop, *physics = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} Chebyshev ephemeris")
+            table = np.frombuffer(f.read(n_bodies * BODY_DTYPE.itemsize), dtype=BODY_DTYPE)
+            data_offset = f.tell()
+        total = int(table['segments'].sum())
+        coefficients = np.memmap(path, dtype='<f8', mode='r', offset=data_offset, shape=(total, 3, degree + 1))
+        return cls(table, coefficients, start, stop, degree, dict(zip(PHYSICS_KEYS, physics)))
+
+    def save(self, path):
+        physics = [self.physics[key] for key in PHYSICS_KEYS]
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.degree, len(self.table), self.start, self.stop, *physics))
+            f.write(self.table.tobytes())
+            f.write(np.ascontiguousarray(self.coefficients, dtype='<f8').tobytes())
+
+    @property
+    def nbytes(self):
+        return HEADER.size + self.table.nbytes + self.coefficients.size * 8
+
+    def covers(self, d, physics):
+        return self.start <= d <= self.stop and physics == self.physics
+
+    def evaluate(self, days, bodies=None):
+        """Relative positions (m) and velocities (m/day) shaped (bodies, days, 3)"""
+        idx = np.arange(len(self.names)) if bodies is None else np.array(
+            [self.ids[b] if isinstance(b, str) else b for b in bodies], dtype=np.intp)
+        days = np.atleast_1d(np.asarray(days, dtype=float))[None, :]
+        table = self.table[idx]
+        span = table['span'][:, None]
+
+        segment = np.clip(np.floor((days - self.start) / span), 0, table['segments'][:, None] - 1).astype(np.intp)
+        x = 2 * (days - self.start - (segment + 0.5) * span) / span
+        coefficients = self.coefficients[table['offset'][:, None] + segment]
+        position = clenshaw(coefficients, x[..., None])
+        velocity = clenshaw(derivative_coefficients(coefficients), x[..., None]) * (2.0 / span[..., None])
+        return position, velocity
+
+    def fill(self, tree, d, physics, relative, relative_velocity, wanted):
+        """Write relative states (m, m/day) of the wanted tree rows covered at day d; returns their mask"""
+        covered = np.zeros(len(tree.names), dtype=bool)
+        if not self.covers(d, physics):
+            return covered
+        rows, idx = self._bind(tree)
+        keep = wanted[rows]
+        rows, idx = rows[keep], idx[keep]
+        if rows.size:
+            position, velocity = self.evaluate([d], idx)
+            relative[rows] = position[:, 0]
+            relative_velocity[rows] = velocity[:, 0]
+            covered[rows] = True
+        return covered
+
+    def _bind(self, tree):
+        # tree rows this file covers, with their index in the file; the segments are
+        # relative to the parent they were fitted with, so the tree must agree on it
+        key = tree.key
+        if key not in self._rows:
+            pairs = [(row, self.ids[name]) for row, name in enumerate(tree.names)
+                     if name in self.ids and self.parents[self.ids[name]] == self._parent_name(tree, row)]
+            rows = np.array([row for row, _ in pairs], dtype=np.intp)
+            idx = np.array([k for _, k in pairs], dtype=np.intp)
+            self._rows[key] = (rows, idx)
+        return self._rows[key]
+
+    @staticmethod
+    def _parent_name(tree, row):
+        parent = tree.parent_index[row]
+        return tree.names[parent] if parent >= 0 else ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute Chebyshev ephemeris segments")
+    parser.add_argument("output", nargs="?", default=DEFAULT_FILE)
+    parser.add_argument("--start", help="first date, YYYY-MM-DD (default today)")
+    parser.add_argument("--days", type=float, default=10000.0, help="window length in days")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="fit tolerance in meters")
+    parser.add_argument("--degree", type=int, default=DEGREE)
+    parser.add_argument("--max-segments", type=int, default=MAX_SEGMENTS)
+    args = parser.parse_args()
+
+    start_date = datetime.strptime(args.start, "%Y-%m-%d") if args.start else datetime.now()
+    start = float((start_date.date() - datetime(2000, 1, 1).date()).days)
+    tree = ephemeris.BodyTree(['Sun'] + list(ephemeris.MEAN_ELEMENTS))
+    table = ChebyshevEphemeris.fit(tree, start, start + args.days, tolerance=args.tolerance,
+                                   degree=args.degree, max_segments=args.max_segments)
+    table.save(args.output)
+
+    for entry in table.table:
+        print(f"{entry['name'].decode():>10}: {entry['segments']:6d} segments of {entry['span']:9.3f} days, "
+              f"error <= {entry['error_bound']:.1e} m")
+    hourly = len(table.table) * args.days * 24 * 3 * 8
+    print(f"Wrote {args.output}: {table.nbytes / 1e6:.2f} MB "
+          f"(hourly samples of the same bodies: {hourly / 1e6:.0f} MB)")
+
+
+if __name__ == '__main__':
+    main()
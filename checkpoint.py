@@ -0,0 +1,118 @@
+"""Versioned binary checkpoints of simulation state, loaded by memory mapping.
+
+A checkpoint is a small header, a JSON block of scalar state (day, physics,
+camera, selection, ...) with a directory of the arrays, and then the arrays
+themselves, each raw and aligned to 64 bytes. Loading reads the header and
+the JSON block and maps the rest: every array is a read-only view into the
+mapping, so nothing is parsed or copied until it is used.
+
+    python checkpoint.py scenario.ckpt
+
+prints what a checkpoint holds.
+"""
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b"ORBCKPT\0"
+VERSION = 1
+# magic, version, length of the JSON block
+HEADER = struct.Struct("<8sHI")
+ALIGN = 64
+DEFAULT_FILE = "scenario.ckpt"
+
+
+def _aligned(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+class Checkpoint:
+    """Scalar state (JSON-compatible) and named NumPy arrays"""
+
+    def __init__(self, state, arrays):
+        self.state = dict(state)
+        self.arrays = dict(arrays)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __contains__(self, name):
+        return name in self.arrays
+
+    @classmethod
+    def load(cls, path):
+        """Read a file written by save(); the arrays are read-only views of one memory mapping"""
+        with open(path, 'rb') as f:
+            magic, version, state_bytes = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} checkpoint")
+            state = json.loads(f.read(state_bytes))
+        directory = state.pop('arrays')
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+
+        arrays = {}
+        for name, entry in directory.items():
+            dtype = np.lib.format.descr_to_dtype(entry['dtype'])
+            shape = tuple(entry['shape'])
+            start = entry['offset']
+            nbytes = dtype.itemsize * int(np.prod(shape))
+            if start + nbytes > len(data):
+                raise ValueError(f"{path} is truncated ({name})")
+            arrays[name] = data[start:start + nbytes].view(dtype).reshape(shape)
+        return cls(state, arrays)
+
+    def save(self, path):
+        """Write beside path and swap it in, so a live mapping or a crash never sees half a file"""
+        arrays = {name: np.ascontiguousarray(array) for name, array in self.arrays.items()}
+        # offsets depend on the length of the directory that holds them, so lay
+        # out relative offsets first and shift them past the JSON block
+        layout, offset = {}, 0
+        for name, array in arrays.items():
+            layout[name] = offset
+            offset = _aligned(offset + array.nbytes)
+
+        def encode(base):
+            directory = {name: {'dtype': np.lib.format.dtype_to_descr(array.dtype), 'shape': list(array.shape),
+                                'offset': base + layout[name]} for name, array in arrays.items()}
+            return json.dumps(dict(self.state, arrays=directory)).encode()
+
+        base = 0
+        while True:
+            block = encode(base)
+            needed = _aligned(HEADER.size + len(block))
+            if needed == base:
+                break
+            base = needed
+
+        with open(path + '.tmp', 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(block)))
+            f.write(block)
+            for name, array in arrays.items():
+                f.seek(base + layout[name])
+                f.write(array.tobytes())
+            f.truncate(base + offset)
+        os.replace(path + '.tmp', path)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self.arrays.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show what a simulation checkpoint holds")
+    parser.add_argument("path", nargs="?", default=DEFAULT_FILE)
+    args = parser.parse_args()
+
+    checkpoint = Checkpoint.load(args.path)
+    for key, value in checkpoint.state.items():
+        print(f"{key:>16}: {value}")
+    for name, array in checkpoint.arrays.items():
+        print(f"{name:>16}: {array.dtype} {array.shape}")
+    print(f"{checkpoint.nbytes / 1e6:.2f} MB of arrays")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""Background computation of frame buffers off the GUI thread.
+
+The worker fills the back buffer while the GUI renders the front one. When a
+frame is complete the buffers are swapped under a lock and ``frame_ready`` is
+emitted; the GUI then reads the front buffer under the same lock. Every new
+request bumps a generation counter, and work for an older generation is
+dropped without ever being published.
+
+Event and eclipse searches over the slider window take about a second, so
+they run on their own executor and arrive through ``events_ready``.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+
+import ephemeris
+import events
+from eclipses import find_eclipses
+from playback import HermitePlayback
+
+
+class FrameBuffer:
+    __slots__ = ('positions', 'velocities', 'elements', 'orbits', 'day', 'generation', 'orbit_version')
+
+    def __init__(self, n_bodies):
+        self.positions = np.zeros((n_bodies, 3))
+        self.velocities = np.zeros((n_bodies, 3))
+        self.elements = np.zeros((n_bodies, len(ephemeris.ELEMENT_KEYS)))
+        self.orbits = np.zeros((n_bodies, ephemeris.ORBIT_POINTS + 1, 3))
+        self.day = 0.0
+        self.generation = 0
+        self.orbit_version = 0
+
+
+class FrameBuffers:
+    """Front/back pair; the swap is a reference exchange under a lock"""
+
+    def __init__(self, n_bodies):
+        self.front = FrameBuffer(n_bodies)
+        self.back = FrameBuffer(n_bodies)
+        self.lock = threading.Lock()
+
+    def swap(self):
+        with self.lock:
+            self.front, self.back = self.back, self.front
+
+
+class FrameRequest:
+    __slots__ = ('day', 'physics', 'orbits', 'interpolate')
+
+    def __init__(self, day, physics, orbits=False, interpolate=False):
+        self.day = day
+        self.physics = dict(physics)
+        self.orbits = orbits
+        self.interpolate = interpolate
+
+
+class ComputeWorker(QObject):
+    # emitted from the worker thread, delivered queued on the GUI thread
+    frame_ready = pyqtSignal(object)
+
+    def __init__(self, names, parents=None, parent=None):
+        super().__init__(parent)
+        self.tree = ephemeris.BodyTree(names, parents)
+        self.buffers = FrameBuffers(len(self.tree.names))
+        # only ever used from the worker thread
+        self.playback = HermitePlayback(self.tree)
+        # precomputed ephemerides, used wherever they cover the frame
+        self.sources = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="orbit-compute")
+        self._generation = 0
+        self._orbit_version = 0
+        self._pending = None
+        # orbit paths survive position-only frames until they are recomputed: the GUI
+        # thread records the generation of the newest orbit request, the worker the
+        # newest generation whose orbits it published, so neither overwrites the other
+        self._orbits_requested = 0
+        self._orbits_published = 0
+
+    def request(self, request):
+        """Queue a frame; any queued or running older request becomes stale"""
+        self._generation += 1
+        if request.orbits:
+            self._orbits_requested = self._generation
+        elif self._orbits_requested > self._orbits_published:
+            # a newer position request must not drop pending orbit work
+            request.orbits = True
+
+        if self._pending is not None:
+            self._pending.cancel()
+        self._pending = self._executor.submit(self._run, self._generation, request)
+        return self._generation
+
+    def compute_now(self, request):
+        """Synchronously compute and publish a frame (used before the first paint)"""
+        self._generation += 1
+        return self._run(self._generation, request, emit=False)
+
+    def restore(self, day, positions, velocities, elements, orbits):
+        """Publish a saved frame as the front buffer; queued or running work becomes stale"""
+        self._generation += 1
+        self._orbit_version += 1
+        self._orbits_requested = 0
+        with self.buffers.lock:
+            front = self.buffers.front
+            front.positions[...] = positions
+            front.velocities[...] = velocities
+            front.elements[...] = elements
+            front.orbits[...] = orbits
+            front.day = day
+            front.generation = self._generation
+            front.orbit_version = self._orbit_version
+
+    def add_source(self, source, first=False):
+        self.sources = [source] + self.sources if first else self.sources + [source]
+
+    def is_stale(self, generation):
+        return generation != self._generation
+
+    def _run(self, generation, request, emit=True):
+        if self.is_stale(generation):
+            return None
+
+        back = self.buffers.back
+        if request.orbits:
+            orbits = back.orbits
+        else:
+            orbits = None
+            # carry the last published orbits over to the buffer being filled
+            with self.buffers.lock:
+                front = self.buffers.front
+                back.orbits[...] = front.orbits
+                back.orbit_version = front.orbit_version
+
+        sources = [source for source in self.sources if source.covers(request.day, request.physics)]
+        if request.interpolate and not sources:
+            done = self.playback.compute_frame(
+                request.day, request.physics, back.positions, back.elements, orbits,
+                is_stale=lambda: self.is_stale(generation), velocities=back.velocities)
+        else:
+            done = ephemeris.compute_frame(
+                self.tree, request.day, request.physics,
+                back.positions, back.elements, orbits,
+                is_stale=lambda: self.is_stale(generation), velocities=back.velocities, sources=sources)
+        if not done or self.is_stale(generation):
+            return None
+
+        back.day = request.day
+        back.generation = generation
+        if request.orbits:
+            self._orbit_version += 1
+            back.orbit_version = self._orbit_version
+            self._orbits_published = generation
+
+        self.buffers.swap()
+        if emit:
+            self.frame_ready.emit(request)
+        return request
+
+    def shutdown(self):
+        self._generation += 1
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class EventSearch:
+    __slots__ = ('start', 'stop', 'physics', 'radii', 'index')
+
+    def __init__(self, start, stop, physics, radii):
+        self.start = start
+        self.stop = stop
+        self.physics = dict(physics)
+        self.radii = dict(radii)
+        # filled in by the worker
+        self.index = None
+
+
+class EventWorker(QObject):
+    # emitted from the worker thread with the finished EventSearch
+    events_ready = pyqtSignal(object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-search")
+        self._generation = 0
+        self._pending = None
+
+    def request(self, search):
+        """Queue a search; a queued older one is cancelled, a running one is dropped"""
+        self._generation += 1
+        if self._pending is not None:
+            self._pending.cancel()
+        self._pending = self._executor.submit(self._run, self._generation, search)
+        return self._generation
+
+    def cancel(self):
+        self._generation += 1
+        if self._pending is not None:
+            self._pending.cancel()
+
+    def is_stale(self, generation):
+        return generation != self._generation
+
+    def _run(self, generation, search):
+        if self.is_stale(generation):
+            return None
+        found = events.find_events(search.start, search.stop, search.physics)
+        if self.is_stale(generation):
+            return None
+        shadows = find_eclipses(search.start, search.stop, search.radii, search.physics)
+        if self.is_stale(generation):
+            return None
+        search.index = events.EventIndex(np.concatenate((found.events, shadows.events)))
+        self.events_ready.emit(search)
+        return search
+
+    def shutdown(self):
+        self._generation += 1
+        self._executor.shutdown(wait=True, cancel_futures=True)
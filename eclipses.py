@@ -0,0 +1,170 @@
+"""Solar and lunar eclipses and planetary transits, from shadow cones.
+
+Each case is a source (the Sun), an occluder and a target: the Moon's shadow
+on Earth, Earth's shadow on the Moon, or the shadow of Mercury or Venus on
+Earth, which is a transit seen from Earth. With the occluder at distance d
+from the Sun and the target at x behind it along the shadow axis, the cones
+have radii
+
+    penumbra  R_o + x (R_s + R_o) / d
+    umbra     R_o - x (R_s - R_o) / d    (negative: antumbra)
+
+and an event happens when the target's distance rho from the axis is
+smaller than the penumbra radius plus its own radius.
+
+The search goes coarse to fine. The window is sampled daily for all cases
+at once, and each minimum of rho is bracketed by a sign change of its
+analytic rate. Near a minimum rho falls no faster than its current rate, so
+rho - |rho'| h bounds the minimum within a step h from below. Brackets whose
+bound still misses the penumbra are dropped before any refinement, and only
+the remaining candidates are bisected on the rate and classified.
+"""
+import numpy as np
+
+import ephemeris
+from events import EVENT_DTYPE, STEP, TOLERANCE, EventIndex, INNER_PLANETS, tree_for
+
+# Earth's atmosphere widens its shadow by about 1/50 (Chauvenet's rule)
+ATMOSPHERE = 1.02
+
+# radii in meters, as in SolarSystemScene.initialize_planets
+RADII = {
+    'Sun': 696340000.0,
+    'Mercury': 4879000 / 2,
+    'Venus': 12104000 / 2,
+    'Earth': 12756000 / 2,
+    'Moon': 3476000 / 2,
+}
+
+# kind, occluder, target, occluder radius factor
+CASES = (
+    ('solar eclipse', 'Moon', 'Earth', 1.0),
+    ('lunar eclipse', 'Earth', 'Moon', ATMOSPHERE),
+)
+
+
+def _dot(u, v):
+    return np.einsum('...i,...i->...', u, v)
+
+
+def _shadow_axis(source, source_velocity, occluder, occluder_velocity, target, target_velocity):
+    """Occluder distance d, target distance x along the axis, rho off the axis, and d rho / dt"""
+    axis = occluder - source
+    axis_velocity = occluder_velocity - source_velocity
+    d = np.sqrt(_dot(axis, axis))
+    n = axis / d[..., None]
+    n_velocity = (axis_velocity - n * _dot(n, axis_velocity)[..., None]) / d[..., None]
+
+    w = target - occluder
+    w_velocity = target_velocity - occluder_velocity
+    x = _dot(w, n)
+    x_velocity = _dot(w_velocity, n) + _dot(w, n_velocity)
+    rho = np.sqrt(np.maximum(_dot(w, w) - x * x, 0.0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rho_velocity = (_dot(w, w_velocity) - x * x_velocity) / rho
+    return d, x, rho, np.nan_to_num(rho_velocity)
+
+
+class _Cases:
+    """Index arrays of the cases into a BodyTree, with their radii"""
+
+    def __init__(self, tree, radii, transits):
+        cases = list(CASES) + [('transit', planet, 'Earth', 1.0) for planet in transits]
+        self.kind = [case[0] for case in cases]
+        self.occluder_name = [case[1] for case in cases]
+        self.sun = tree.ids['Sun']
+        self.occluder = tree.body_ids(self.occluder_name)
+        self.target = tree.body_ids([case[2] for case in cases])
+        self.sun_radius = radii['Sun']
+        self.occluder_radius = np.array([radii[case[1]] * case[3] for case in cases])
+        self.target_radius = np.array([radii[case[2]] for case in cases])
+
+    def geometry(self, position, velocity, rows, columns=None):
+        """Shadow geometry of cases rows: every epoch, or one epoch per row with columns"""
+        def pick(ids):
+            if columns is None:
+                return position[ids], velocity[ids]
+            return position[ids, columns], velocity[ids, columns]
+
+        sun = np.full(len(rows), self.sun)
+        d, x, rho, rho_velocity = _shadow_axis(*pick(sun), *pick(self.occluder[rows]), *pick(self.target[rows]))
+        shape = (-1,) + (1,) * (d.ndim - 1)
+        R_o = self.occluder_radius[rows].reshape(shape)
+        penumbra = R_o + x * (self.sun_radius + R_o) / d
+        umbra = R_o - x * (self.sun_radius - R_o) / d
+        reach = penumbra + self.target_radius[rows].reshape(shape)
+        return x, rho, rho_velocity * ephemeris.SECONDS_PER_DAY, reach, umbra
+
+
+def find_eclipses(start, stop, radii=None, physics=None, transits=INNER_PLANETS, step=STEP, tolerance=TOLERANCE):
+    """Eclipses and transits between day numbers start and stop, as an EventIndex.
+
+    radii maps body names to radii in meters (Sun, Earth, Moon and the
+    transiting planets), RADII by default. Values are the gamma of solar
+    eclipses (axis distance from Earth's center in Earth radii), the umbral
+    magnitude of lunar eclipses, and the least separation from the Sun's
+    center in degrees for transits.
+    """
+    physics = ephemeris.DEFAULT_PHYSICS if physics is None else physics
+    radii = RADII if radii is None else radii
+    tree = tree_for(['Sun', 'Earth', 'Moon'] + list(transits))
+    cases = _Cases(tree, radii, transits)
+    every = np.arange(len(cases.kind))
+
+    # coarse: bracket the minima of rho, and keep those that can reach the penumbra
+    days = start + step * np.arange(int(np.ceil((stop - start) / step)) + 1)
+    position, velocity = ephemeris.state_vectors(tree, days, physics)
+    x, rho, rate, reach, _ = cases.geometry(position, velocity, every)
+    falling = rate < 0
+    lowest = np.maximum(rho[:, :-1] - np.abs(rate[:, :-1]) * step, rho[:, 1:] - np.abs(rate[:, 1:]) * step)
+    candidate = (falling[:, :-1] & ~falling[:, 1:] & (lowest < np.maximum(reach[:, :-1], reach[:, 1:]))
+                 & ((x[:, :-1] > 0) | (x[:, 1:] > 0)))
+    rows, j = np.nonzero(candidate)
+    lo, hi = days[j], days[j + 1]
+
+    # fine: bisection on the rate of rho, candidates only
+    columns = np.arange(len(rows))
+    for _ in range(int(np.ceil(np.log2(step / tolerance)))):
+        middle = 0.5 * (lo + hi)
+        position, velocity = ephemeris.state_vectors(tree, middle, physics)
+        _, _, rate, _, _ = cases.geometry(position, velocity, rows, columns)
+        falling = rate < 0
+        lo = np.where(falling, middle, lo)
+        hi = np.where(falling, hi, middle)
+
+    day = 0.5 * (lo + hi)
+    position, velocity = ephemeris.state_vectors(tree, day, physics)
+    x, rho, _, reach, umbra = cases.geometry(position, velocity, rows, columns)
+    hit = (x > 0) & (rho < reach) & (day >= start) & (day <= stop)
+
+    events = np.zeros(int(hit.sum()), dtype=EVENT_DTYPE)
+    k = np.flatnonzero(hit)
+    events['day'] = day[k]
+    events['other'] = 'Sun'
+    for out, (row, column) in enumerate(zip(rows[k], k)):
+        kind = cases.kind[row]
+        R_t = cases.target_radius[row]
+        if kind == 'solar eclipse':
+            # the umbra (or antumbra) reaching any part of Earth makes it total (annular)
+            surface = x[column] - np.sqrt(max(R_t ** 2 - rho[column] ** 2, 0.0))
+            R_o = cases.occluder_radius[row]
+            umbra_at_surface = R_o - surface * (cases.sun_radius - R_o) / (
+                np.linalg.norm(position[cases.occluder[row], column] - position[cases.sun, column]))
+            if rho[column] < R_t + abs(umbra_at_surface):
+                kind = ('total ' if umbra_at_surface > 0 else 'annular ') + kind
+            else:
+                kind = 'partial ' + kind
+            value = rho[column] / R_t
+        elif kind == 'lunar eclipse':
+            value = (umbra[column] + R_t - rho[column]) / (2 * R_t)
+            kind = ('total ' if value >= 1 else 'partial ' if value > 0 else 'penumbral ') + kind
+        else:
+            seen_planet = position[cases.occluder[row], column] - position[cases.target[row], column]
+            seen_sun = position[cases.sun, column] - position[cases.target[row], column]
+            cos = _dot(seen_planet, seen_sun) / np.sqrt(_dot(seen_planet, seen_planet) * _dot(seen_sun, seen_sun))
+            value = np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+        events[out]['kind'] = kind
+        events[out]['body'] = cases.occluder_name[row] if kind == 'transit' else (
+            'Moon' if 'solar' in kind else 'Earth')
+        events[out]['value'] = value
+    return EventIndex(events)
@@ -0,0 +1,193 @@
+"""Close encounters and collisions between bodies, per time step.
+
+Every body reaches out to the larger of its physical radius and its Hill
+radius r (m / 3M)^(1/3) about its primary, at its current distance r. Two
+bodies are in a close encounter when their distance is inside either Hill
+radius, and collide when it is below the sum of their radii.
+
+The broad phase is a uniform spatial hash. Cells are twice the reach of all
+but the LARGE_COUNT largest bodies; those are sorted by cell key, and each
+occupied cell is paired with itself and half of its neighbors through
+searchsorted on the sorted keys, so only bodies in adjacent cells become
+candidate pairs. The few bodies with larger reach (the Sun, giant planets)
+are checked against everything within reach along x, a window of the bodies
+sorted by x. Candidates go to the exact distance test. A body is never tested
+against its own parent or grandparent, which it always lies close to.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import ephemeris
+
+ENCOUNTER_DTYPE = np.dtype([
+    ('day', '<f8'), ('kind', 'U16'), ('body', 'U16'), ('other', 'U16'),
+    ('distance', '<f8'),  # meters
+    ('threshold', '<f8'),  # meters, the Hill radius or the sum of the radii
+])
+
+
+# the cell itself and half of its 26 neighbors, so each pair of cells is visited once
+HALF_NEIGHBORS = [(0, 0, 0)] + [(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)
+                                if (x, y, z) > (0, 0, 0)]
+LARGE_COUNT = 32  # cells are sized for all but this many of the largest reaches
+
+
+def _expand(start_a, count_a, start_b, count_b):
+    """All (a, b) index pairs between runs [start_a, +count_a) and [start_b, +count_b)"""
+    sizes = count_a * count_b
+    run = np.repeat(np.arange(len(sizes)), sizes)
+    local = np.arange(len(run)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    return start_a[run] + local // count_b[run], start_b[run] + local % count_b[run]
+
+
+def candidate_pairs(positions, reach):
+    """Index pairs (i, j) whose reach boxes overlap, from a uniform spatial hash"""
+    n = len(positions)
+    by_reach = np.argsort(reach)
+    large = np.zeros(n, dtype=bool)
+    large[by_reach[n - LARGE_COUNT:]] = n > LARGE_COUNT
+    small = np.flatnonzero(~large)
+    cell = 2 * reach[small].max(initial=0.0)
+    # at most 2^20 cells along an axis, so cell keys fit in 64 bits
+    span = np.ptp(positions[small], axis=0).max(initial=0.0) if len(small) else 0.0
+    cell = max(cell, span / 2 ** 20, 1e-300)
+
+    # small bodies: sort by cell key, pair each occupied cell with itself and half its neighbors
+    coords = np.floor(positions[small] / cell).astype(np.int64)
+    coords -= coords.min(axis=0, initial=0) - 1
+    shape = coords.max(axis=0, initial=0) + 2
+    keys = (coords[:, 0] * shape[1] + coords[:, 1]) * shape[2] + coords[:, 2]
+    order = np.argsort(keys, kind='stable')
+    cells, start, count = np.unique(keys[order], return_index=True, return_counts=True)
+    pairs_i, pairs_j = [], []
+    for dx, dy, dz in HALF_NEIGHBORS:
+        neighbor = cells + (dx * shape[1] + dy) * shape[2] + dz
+        k = np.minimum(np.searchsorted(cells, neighbor), len(cells) - 1)
+        found = np.flatnonzero(cells[k] == neighbor) if len(cells) else np.zeros(0, dtype=np.intp)
+        a, b = _expand(start[found], count[found], start[k[found]], count[k[found]])
+        if (dx, dy, dz) == (0, 0, 0):
+            keep = a < b
+            a, b = a[keep], b[keep]
+        pairs_i.append(small[order[a]])
+        pairs_j.append(small[order[b]])
+
+    # the few large reaches against everything within reach along x, each pair once
+    by_x = np.argsort(positions[:, 0])
+    x_sorted = positions[by_x, 0]
+    widest = reach.max(initial=0.0)
+    for body in np.flatnonzero(large):
+        x = positions[body, 0]
+        lo, hi = np.searchsorted(x_sorted, [x - reach[body] - widest, x + reach[body] + widest])
+        others = by_x[lo:hi]
+        others = others[(others != body) & (~large[others] | (others > body))]
+        pairs_i.append(np.full(len(others), body))
+        pairs_j.append(others)
+
+    i = np.concatenate(pairs_i) if pairs_i else np.zeros(0, dtype=np.intp)
+    j = np.concatenate(pairs_j) if pairs_j else np.zeros(0, dtype=np.intp)
+    overlap = np.all(np.abs(positions[i] - positions[j]) <= (reach[i] + reach[j])[:, None], axis=1)
+    return i[overlap], j[overlap]
+
+
+class EncounterDetector:
+    """Tracks which pairs are in an encounter from step to step.
+
+    parent holds the parent index of each body (-1 for heliocentric ones),
+    whose primary is the body at sun. Masses are in kg and radii in meters.
+    """
+
+    def __init__(self, names, parent, mass, radius, sun=0, hill_factor=1.0):
+        self.names = list(names)
+        self.parent = np.asarray(parent, dtype=np.intp)
+        self.mass = np.asarray(mass, dtype=float)
+        self.radius = np.asarray(radius, dtype=float)
+        self.sun = sun
+        self.hill_factor = hill_factor
+        self.sun_mass_scale = 1.0
+        self.primary = np.where(self.parent >= 0, self.parent, sun)
+        self.primary[sun] = -1
+
+        # ancestors up the tree, padded with -1, for excluding a body's own system
+        ancestors = [self.parent]
+        while (ancestors[-1] >= 0).any():
+            ancestors.append(np.where(ancestors[-1] >= 0, self.parent[ancestors[-1]], -1))
+        self.ancestors = np.stack(ancestors[:-1], axis=1) if len(ancestors) > 1 else np.full((len(parent), 0), -1)
+
+        # bodies left out of detection, such as tabulated ones outside their table
+        self.absent = np.zeros(len(self.names), dtype=bool)
+        # pair key -> kind, for the pairs in an encounter after the last step
+        self.active = {}
+
+    def set_physics(self, sun_mass_scale):
+        self.sun_mass_scale = sun_mass_scale
+
+    def hill_radii(self, positions):
+        """Hill radius of every body about its primary at the current distance (0 for the Sun)"""
+        mass = self.mass.copy()
+        mass[self.sun] *= self.sun_mass_scale
+        hill = np.zeros(len(mass))
+        orbiting = self.primary >= 0
+        primary = self.primary[orbiting]
+        distance = np.linalg.norm(positions[orbiting] - positions[primary], axis=1)
+        hill[orbiting] = distance * np.cbrt(mass[orbiting] / (3 * mass[primary]))
+        return hill * self.hill_factor
+
+    def detect(self, positions):
+        """Pairs (i, j) in an encounter at positions (n, 3) in meters, with distance, threshold and collision flag"""
+        hill = self.hill_radii(positions)
+        i, j = candidate_pairs(positions, np.maximum(hill, self.radius))
+        excluded = (self.ancestors[i] == j[:, None]).any(axis=1) | (self.ancestors[j] == i[:, None]).any(axis=1)
+        excluded |= self.absent[i] | self.absent[j]
+        i, j = i[~excluded], j[~excluded]
+
+        distance = np.linalg.norm(positions[i] - positions[j], axis=1)
+        contact = self.radius[i] + self.radius[j]
+        collision = distance < contact
+        threshold = np.where(collision, contact, np.maximum(hill[i], hill[j]))
+        inside = collision | (distance < threshold)
+        return i[inside], j[inside], distance[inside], threshold[inside], collision[inside]
+
+    def step(self, day, positions):
+        """Encounters that began at this step and pairs whose encounter ended, as event arrays"""
+        i, j, distance, threshold, collision = self.detect(positions)
+        low, high = np.minimum(i, j), np.maximum(i, j)
+        current = {}
+        began = []
+        for a, b, d, t, hit in zip(low.tolist(), high.tolist(), distance, threshold, collision):
+            kind = 'collision' if hit else 'close encounter'
+            current[(a, b)] = kind
+            # an encounter that turns into a collision is reported again
+            if self.active.get((a, b)) != kind:
+                began.append((day, kind, self.names[a], self.names[b], d, t))
+        ended = [(day, 'encounter end', self.names[a], self.names[b], np.nan, np.nan)
+                 for a, b in self.active if (a, b) not in current]
+        self.active = current
+        return np.array(began, dtype=ENCOUNTER_DTYPE), np.array(ended, dtype=ENCOUNTER_DTYPE)
+
+    def bodies_in_encounter(self):
+        return {body for pair in self.active for body in pair}
+
+
+def stream_encounters(detector, tree, days, physics=None, chunk=4096):
+    """Yield the events of every step over day numbers days, from ephemeris.state_vectors of tree"""
+    days = np.asarray(days, dtype=float)
+    for first in range(0, len(days), chunk):
+        block = days[first:first + chunk]
+        position, _ = ephemeris.state_vectors(tree, block, physics)
+        for k, day in enumerate(block):
+            began, ended = detector.step(day, position[:, k])
+            for event in began:
+                yield event
+            for event in ended:
+                yield event
+
+
+def describe(event):
+    """One line for an encounter event"""
+    when = datetime(2000, 1, 1) + timedelta(days=float(event['day']))
+    pair = f"{event['body']}-{event['other']}"
+    if event['kind'] == 'encounter end':
+        return f"{when:%Y-%m-%d %H:%M}  {pair} encounter ended"
+    return (f"{when:%Y-%m-%d %H:%M}  {pair} {event['kind']}, {event['distance'] / 1e3:,.0f} km "
+            f"(threshold {event['threshold'] / 1e3:,.0f} km)")
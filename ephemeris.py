@@ -0,0 +1,558 @@
+"""Orbital elements and positions as pure functions of the day number.
+
+Nothing in here touches Qt or VTK, so the same code runs on the GUI thread,
+in the compute worker, and in headless tools.
+"""
+import numpy as np
+
+import propagator
+
+AU = 149.6e9  # in meters
+SECONDS_PER_DAY = 86400.0
+ORBIT_POINTS = 100
+OPEN_ORBIT_EXTENT = 50.0  # AU, how far out hyperbolic and parabolic paths are drawn
+ECC_LIMIT = 0.99  # the eccentricity multiplier keeps bound orbits bound
+
+ELEMENT_KEYS = ('a', 'e', 'i', 'N', 'w', 'M')
+
+# Mean elements as (value at the table's epoch, rate per day)
+MEAN_ELEMENTS = {
+    'Mercury': {
+        'N': (48.3313, 3.24587e-5),
+        'i': (7.0047, 5.00e-8),
+        'w': (29.1241, 1.01444e-5),
+        'a': (0.387098, 0.0),
+        'e': (0.205635, 5.59e-10),
+        'M': (168.6562, 4.0923344368),
+    },
+    'Venus': {
+        'N': (76.6799, 2.46590e-5),
+        'i': (3.3946, 2.75e-8),
+        'w': (54.8910, 1.38374e-5),
+        'a': (0.723330, 0.0),
+        'e': (0.006773, -1.302e-9),
+        'M': (48.0052, 1.6021302244),
+    },
+    # the Sun's geocentric orbit turned around: perihelion 180 degrees from the
+    # Sun's perigee
+    'Earth': {
+        'N': (0.0, 0.0),
+        'i': (0.0, 0.0),
+        'w': (102.9404, 4.70935e-5),
+        'a': (1.000000, 0.0),
+        'e': (0.016709, -1.151e-9),
+        'M': (356.0470, 0.9856002585),
+    },
+    # from NASA fact sheets, geocentric
+    'Moon': {
+        'N': (125.1228, -0.0529538083),
+        'i': (5.1454, 0.0),
+        'w': (318.0634, 0.1643573223),
+        'a': (384400000 / AU, 0.0),
+        'e': (0.0549, 0.0),
+        'M': (115.3654, 13.0649929509),
+    },
+    'Mars': {
+        'N': (49.5574, 2.11081e-5),
+        'i': (1.8497, -1.78e-8),
+        'w': (286.5016, 2.92961e-5),
+        'a': (1.523688, 0.0),
+        'e': (0.093405, 2.516e-9),
+        'M': (18.6021, 0.5240207766),
+    },
+    'Jupiter': {
+        'N': (100.4542, 2.76854e-5),
+        'i': (1.3030, -1.557e-7),
+        'w': (273.8777, 1.64505e-5),
+        'a': (5.20256, 0.0),
+        'e': (0.048498, 4.469e-9),
+        'M': (19.8950, 0.0830853001),
+    },
+    'Saturn': {
+        'N': (113.6634, 2.38980e-5),
+        'i': (2.4886, -1.081e-7),
+        'w': (339.3939, 2.97661e-5),
+        'a': (9.55475, 0.0),
+        'e': (0.055546, -9.499e-9),
+        'M': (316.9670, 0.0334442282),
+    },
+    'Uranus': {
+        'N': (74.0005, 1.3978e-5),
+        'i': (0.7733, 1.9e-8),
+        'w': (96.6612, 3.0565e-5),
+        'a': (19.18171, -1.55e-8),
+        'e': (0.047318, 7.45e-9),
+        'M': (142.5905, 0.011725806),
+    },
+    'Neptune': {
+        'N': (131.7806, 3.0173e-5),
+        'i': (1.7700, -2.55e-7),
+        'w': (272.8461, -6.027e-6),
+        'a': (30.05826, 3.313e-8),
+        'e': (0.008606, 2.15e-9),
+        'M': (260.2471, 0.005995147),
+    },
+}
+
+# The planet and Moon tables count days from 1999 Dec 31 0h, one day before
+# day number 0 (2000 Jan 1 0h); move them to day number 0
+for _table in MEAN_ELEMENTS.values():
+    for _key, (_value, _rate) in _table.items():
+        _table[_key] = (_value + _rate, _rate)
+del _table, _key, _value, _rate
+
+# Satellites, as approximate mean elements. Moons of Jupiter and Saturn orbit
+# close to the planet's equator, so i and N are those of the equator on the
+# ecliptic and w absorbs the small local node.
+AU_PER_KM = 1000.0 / AU
+
+SATELLITE_ELEMENTS = {
+    'Io': {
+        'N': (337.8, 0.0), 'i': (2.2, 0.0), 'w': (49.1, 0.0),
+        'a': (421800 * AU_PER_KM, 0.0), 'e': (0.0041, 0.0), 'M': (330.9, 203.4889308),
+    },
+    'Europa': {
+        'N': (337.8, 0.0), 'i': (2.2, 0.0), 'w': (229.0, 0.0),
+        'a': (671100 * AU_PER_KM, 0.0), 'e': (0.009, 0.0), 'M': (345.4, 101.3747258),
+    },
+    'Ganymede': {
+        'N': (337.8, 0.0), 'i': (2.2, 0.0), 'w': (256.8, 0.0),
+        'a': (1070400 * AU_PER_KM, 0.0), 'e': (0.0013, 0.0), 'M': (324.8, 50.3176089),
+    },
+    'Callisto': {
+        'N': (337.8, 0.0), 'i': (2.2, 0.0), 'w': (352.9, 0.0),
+        'a': (1882700 * AU_PER_KM, 0.0), 'e': (0.0074, 0.0), 'M': (87.4, 21.5710715),
+    },
+    'Mimas': {
+        'N': (169.5, 0.0), 'i': (28.05, 0.0), 'w': (145.5, 0.0),
+        'a': (185540 * AU_PER_KM, 0.0), 'e': (0.0196, 0.0), 'M': (14.8, 381.9944781),
+    },
+    'Enceladus': {
+        'N': (169.5, 0.0), 'i': (28.05, 0.0), 'w': (342.5, 0.0),
+        'a': (238040 * AU_PER_KM, 0.0), 'e': (0.0047, 0.0), 'M': (199.7, 262.7319157),
+    },
+    'Tethys': {
+        'N': (169.5, 0.0), 'i': (28.05, 0.0), 'w': (305.0, 0.0),
+        'a': (294670 * AU_PER_KM, 0.0), 'e': (0.0001, 0.0), 'M': (243.4, 190.6979651),
+    },
+    'Dione': {
+        'N': (169.5, 0.0), 'i': (28.05, 0.0), 'w': (214.7, 0.0),
+        'a': (377420 * AU_PER_KM, 0.0), 'e': (0.0022, 0.0), 'M': (322.2, 131.5349582),
+    },
+    'Rhea': {
+        'N': (169.5, 0.0), 'i': (28.05, 0.0), 'w': (232.6, 0.0),
+        'a': (527070 * AU_PER_KM, 0.0), 'e': (0.0010, 0.0), 'M': (179.8, 79.6775362),
+    },
+    'Titan': {
+        'N': (169.5, 0.0), 'i': (28.05, 0.0), 'w': (208.6, 0.0),
+        'a': (1221870 * AU_PER_KM, 0.0), 'e': (0.0288, 0.0), 'M': (163.3, 22.5769762),
+    },
+    # Lunar Reconnaissance Orbiter, nominal 50 km polar mapping orbit (phase arbitrary)
+    'LRO': {
+        'N': (0.0, 0.0), 'i': (90.0, 0.0), 'w': (0.0, 0.0),
+        'a': (1787.4 * AU_PER_KM, 0.0), 'e': (0.0, 0.0), 'M': (0.0, 4587.9372881),
+    },
+}
+MEAN_ELEMENTS.update(SATELLITE_ELEMENTS)
+
+# Small bodies on high-eccentricity and open orbits, from their osculating
+# elements at perihelion. M is measured from perihelion passage, and for
+# hyperbolic orbits a < 0 and M is the hyperbolic mean anomaly.
+# For a parabolic orbit (e == 1) the a column holds the perihelion distance q.
+SMALL_BODY_ELEMENTS = {
+    # 1P/Halley, perihelion 1986 Feb 9
+    'Halley': {
+        'N': (58.42, 0.0), 'i': (162.26, 0.0), 'w': (111.33, 0.0),
+        'a': (17.834, 0.0), 'e': (0.96714, 0.0), 'M': (66.4426, 0.0130867236),
+    },
+    # 1I/'Oumuamua, interstellar, perihelion 2017 Sep 9
+    'Oumuamua': {
+        'N': (24.5969, 0.0), 'i': (122.7417, 0.0), 'w': (241.8105, 0.0),
+        'a': (-1.272366, 0.0), 'e': (1.201134, 0.0), 'M': (-4437.3106, 0.6867299536),
+    },
+}
+MEAN_ELEMENTS.update(SMALL_BODY_ELEMENTS)
+
+PARENT_BODY = {
+    'Moon': 'Earth',
+    'Io': 'Jupiter',
+    'Europa': 'Jupiter',
+    'Ganymede': 'Jupiter',
+    'Callisto': 'Jupiter',
+    'Mimas': 'Saturn',
+    'Enceladus': 'Saturn',
+    'Tethys': 'Saturn',
+    'Dione': 'Saturn',
+    'Rhea': 'Saturn',
+    'Titan': 'Saturn',
+    'LRO': 'Moon',
+}
+
+# Display exaggeration of satellite distances, per parent system, so that
+# moons clear the (also exaggerated) planet spheres
+SYSTEM_EXAGGERATION = {
+    'Earth': 50.0,
+    'Jupiter': 60.0,
+    'Saturn': 100.0,
+    'Moon': 3000.0,
+}
+
+DEFAULT_PHYSICS = {
+    'sun_mass_scale': 1.0,
+    'G_multiplier': 1.0,
+    'ecc_multiplier': 1.0,
+    'inc_multiplier': 1.0,
+}
+
+# column indices into element arrays
+IDX_A, IDX_E, IDX_I, IDX_N, IDX_W, IDX_M = range(len(ELEMENT_KEYS))
+ANGLES = [IDX_I, IDX_N, IDX_W]  # M too, but only on bound orbits
+
+
+class BodyTree:
+    """Bodies ordered for level-by-level position composition.
+
+    Bodies without a parent (the Sun and planets) are heliocentric. Every
+    deeper level is placed on its parents in one vectorized pass, so the cost
+    depends on the depth of the tree, not on the number of satellites.
+    """
+
+    def __init__(self, names, parents=None):
+        self.names = list(names)
+        if parents is None:
+            parents = [PARENT_BODY.get(name) for name in self.names]
+        self.ids = {name: k for k, name in enumerate(self.names)}
+        n = len(self.names)
+
+        self.parent_index = np.array([self.ids[p] if p else -1 for p in parents], dtype=np.intp)
+        # identifies the tree's shape for ephemeris sources caching their rows; unlike id() never reused
+        self.key = (tuple(self.names), tuple(self.parent_index.tolist()))
+        self.heliocentric = self.parent_index < 0
+        self.exaggeration = np.array([SYSTEM_EXAGGERATION.get(p, 1.0) if p else 1.0 for p in parents])
+
+        depth = np.zeros(n, dtype=np.intp)
+        for k in range(n):
+            parent = self.parent_index[k]
+            seen = 0
+            while parent >= 0:
+                depth[k] += 1
+                parent = self.parent_index[parent]
+                seen += 1
+                if seen > n:
+                    raise ValueError(f"Cycle in body tree at {self.names[k]}")
+        self.depth = depth
+        self.levels = []
+        for level in range(1, int(depth.max(initial=0)) + 1):
+            idx = np.flatnonzero(depth == level)
+            self.levels.append((idx, self.parent_index[idx]))
+
+        self.base = np.zeros((n, len(ELEMENT_KEYS)))
+        self.rate = np.zeros((n, len(ELEMENT_KEYS)))
+        for k, name in enumerate(self.names):
+            table = MEAN_ELEMENTS.get(name)
+            if table is None:
+                # Sun
+                continue
+            for col, key in enumerate(ELEMENT_KEYS):
+                self.base[k, col], self.rate[k, col] = table[key]
+        # the mean anomaly of an open orbit grows without wrapping
+        self.bound = self.base[:, IDX_E] < 1.0
+
+    def body_ids(self, bodies):
+        """Indices for a list of names and/or ids"""
+        return np.array([self.ids[b] if isinstance(b, str) else b for b in bodies], dtype=np.intp)
+
+    def elements_at(self, d, out=None):
+        """(n, 6) elements at day number d, angles normalized to 0-360"""
+        if out is None:
+            out = np.empty_like(self.base)
+        np.multiply(self.rate, d, out=out)
+        out += self.base
+        out[:, ANGLES] %= 360
+        out[self.bound, IDX_M] %= 360
+        return out
+
+    def elements_at_epochs(self, days, idx=slice(None)):
+        """(m, k, 6) elements of bodies idx at days, an (m, k) or (k,) array"""
+        days = np.asarray(days, dtype=float)
+        if days.ndim == 1:
+            days = days[None, :]
+        out = self.base[idx][:, None, :] + self.rate[idx][:, None, :] * days[..., None]
+        out[..., ANGLES] %= 360
+        out[self.bound[idx], :, IDX_M] %= 360
+        return out
+
+    def a_scale(self, sun_mass_scale):
+        """Semi-major axis factor from the Sun's mass (heliocentric bodies only)"""
+        return np.where(self.heliocentric, 1.0 / (sun_mass_scale ** (1.0 / 3.0)), 1.0)
+
+    def compose(self, relative, out=None):
+        """Absolute positions from parent-relative ones, one pass per depth"""
+        if out is None:
+            out = np.empty_like(relative)
+        out[...] = relative
+        for idx, parent_idx in self.levels:
+            out[idx] += out[parent_idx]
+        return out
+
+    def true_positions(self, displayed, out=None):
+        """Positions with the display exaggeration of satellite offsets taken out"""
+        relative = np.array(displayed, dtype=float)
+        satellite = ~self.heliocentric
+        relative[satellite] -= displayed[self.parent_index[satellite]]
+        relative /= self.exaggeration[:, None]
+        return self.compose(relative, out=out)
+
+
+def apply_physics(elements, physics):
+    """Apply the G/eccentricity/inclination multipliers in place"""
+    G_multiplier = physics['G_multiplier']
+    ecc_multiplier = physics['ecc_multiplier']
+    inc_multiplier = physics['inc_multiplier']
+
+    if G_multiplier != 1.0:
+        elements[..., IDX_A] /= G_multiplier
+    if ecc_multiplier != 1.0:
+        e = elements[..., IDX_E]
+        elements[..., IDX_E] = np.where(e < 1.0, np.minimum(ECC_LIMIT, e * ecc_multiplier), e)
+    if inc_multiplier != 1.0:
+        elements[..., IDX_I] *= inc_multiplier
+    return elements
+
+
+def physics_rates(rates, elements, physics):
+    """Element rates matching elements after apply_physics, as a new array"""
+    rates = np.array(np.broadcast_to(rates, elements.shape))
+    if physics['G_multiplier'] != 1.0:
+        rates[..., IDX_A] /= physics['G_multiplier']
+    if physics['ecc_multiplier'] != 1.0:
+        # open orbits are not scaled, and clamped eccentricities do not drift
+        e = elements[..., IDX_E]
+        rates[..., IDX_E] *= np.select([e >= 1.0, e >= ECC_LIMIT], [1.0, 0.0], physics['ecc_multiplier'])
+    if physics['inc_multiplier'] != 1.0:
+        rates[..., IDX_I] *= physics['inc_multiplier']
+    return rates
+
+
+def positions_from_elements(elements, a_scale=1.0, rates=None):
+    """Positions in meters from (..., 6) element arrays.
+
+    Elliptic, parabolic and hyperbolic orbits all go through the universal
+    variable solver in propagator. With element rates in degrees per day the
+    velocity in meters per day is returned as well, from the same solve.
+    """
+    a, e = np.broadcast_arrays(elements[..., IDX_A] * a_scale, elements[..., IDX_E])
+    i = np.radians(elements[..., IDX_I])
+    N = np.radians(elements[..., IDX_N])
+    w = np.radians(elements[..., IDX_W])
+    M = np.radians(elements[..., IDX_M])
+
+    # perihelion distance, and the length that sets the mean motion n = sqrt(mu / length^3)
+    parabolic = e == 1.0
+    q = np.where(parabolic, a, a * (1 - e))
+    length = np.where(parabolic, a, np.abs(a))
+
+    x, y, vx, vy, dx_de, dy_de = (np.zeros(a.shape) for _ in range(6))
+    moving = q > 0
+    # time since perihelion in units where mu = 1
+    tau = np.broadcast_to(M, a.shape)[moving] * length[moving] ** 1.5
+    x[moving], y[moving], vx[moving], vy[moving] = propagator.perifocal_state(q[moving], e[moving], tau)
+
+    position = _rotate(x, y, w, i, N)
+    if rates is None:
+        return position * AU
+
+    # sqrt(mu) = n length^1.5, in AU^1.5 per day
+    sqrt_mu = np.radians(rates[..., IDX_M]) * length ** 1.5
+    e_dot = rates[..., IDX_E]
+
+    # drift of a bound orbit's shape at fixed M, through E: dE/de = sin E / (1 - e cos E)
+    drifting = moving & (e < 1.0) & (e_dot != 0)
+    if drifting.any():
+        ad, ed = a[drifting], e[drifting]
+        root = np.sqrt(1 - ed * ed)
+        cos_E = x[drifting] / ad + ed
+        sin_E = y[drifting] / (ad * root)
+        dE_de = sin_E / (1 - ed * cos_E)
+        dx_de[drifting] = -ad * (sin_E * dE_de + 1)
+        dy_de[drifting] = ad * (root * cos_E * dE_de - ed * sin_E / root)
+    velocity = _rotate(vx * sqrt_mu + dx_de * e_dot, vy * sqrt_mu + dy_de * e_dot, w, i, N)
+
+    # apsidal and nodal precession turn the orbit about its normal and the
+    # ecliptic pole, and a changing inclination turns it about the line of nodes
+    w_dot = np.radians(rates[..., IDX_W])[..., None]
+    N_dot = np.radians(rates[..., IDX_N])[..., None]
+    i_dot = np.radians(rates[..., IDX_I])[..., None]
+    normal = np.stack((np.sin(i) * np.sin(N), -np.sin(i) * np.cos(N), np.cos(i)), axis=-1)
+    node = np.stack((np.cos(N), np.sin(N), np.zeros(np.shape(N))), axis=-1)
+    velocity += w_dot * np.cross(normal, position)
+    velocity += i_dot * np.cross(node, position)
+    velocity[..., 0] -= N_dot[..., 0] * position[..., 1]
+    velocity[..., 1] += N_dot[..., 0] * position[..., 0]
+    return position * AU, velocity * AU
+
+
+def elements_from_states(position, velocity, mu):
+    """Osculating elements (..., 6) from states in m and m/s about a mass with mu in m^3/s^2.
+
+    The inverse of positions_from_elements: a in AU (negative for open
+    orbits), angles in degrees, M the mean anomaly (hyperbolic for e > 1).
+    Orbits in the ecliptic get N = 0, circular ones w = 0.
+    """
+    position = np.asarray(position, dtype=float)
+    velocity = np.asarray(velocity, dtype=float)
+    r = np.sqrt((position * position).sum(axis=-1))
+    v2 = (velocity * velocity).sum(axis=-1)
+    rv = (position * velocity).sum(axis=-1)
+    h = np.cross(position, velocity)
+    h_norm = np.sqrt((h * h).sum(axis=-1))
+
+    mu = np.asarray(mu, dtype=float)
+    e_vector = np.cross(velocity, h) / mu[..., None] - position / r[..., None]
+    e = np.sqrt((e_vector * e_vector).sum(axis=-1))
+    with np.errstate(divide='ignore'):
+        a = 1.0 / (2 / r - v2 / mu)
+    i = np.arccos(np.clip(h[..., 2] / h_norm, -1.0, 1.0))
+
+    # line of nodes, along x for orbits in the ecliptic
+    in_plane = np.hypot(h[..., 0], h[..., 1]) <= 1e-12 * h_norm
+    N = np.where(in_plane, 0.0, np.arctan2(h[..., 0], -h[..., 1]))
+    node = np.stack((np.cos(N), np.sin(N), np.zeros(np.shape(N))), axis=-1)
+    across = np.cross(h, node) / h_norm[..., None]
+    latitude = np.arctan2((position * across).sum(axis=-1), (position * node).sum(axis=-1))
+
+    p = h_norm ** 2 / mu
+    nu = np.arctan2(np.sqrt(p / mu) * rv, p - r)
+    w = latitude - nu
+
+    M = np.empty_like(e)
+    ellipse = e < 1.0
+    E = 2 * np.arctan(np.sqrt((1 - e[ellipse]) / (1 + e[ellipse])) * np.tan(nu[ellipse] / 2))
+    M[ellipse] = E - e[ellipse] * np.sin(E)
+    eo = e[~ellipse]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        H = 2 * np.arctanh(np.sqrt((eo - 1) / (eo + 1)) * np.tan(nu[~ellipse] / 2))
+    M[~ellipse] = eo * np.sinh(H) - H
+
+    elements = np.stack((a / AU, e, np.degrees(i), np.degrees(N), np.degrees(w), np.degrees(M)), axis=-1)
+    elements[..., ANGLES] %= 360
+    elements[ellipse, IDX_M] %= 360
+    return elements
+
+
+def _rotate(x_orbit, y_orbit, w, i, N):
+    """Orbital-plane coordinates to ecliptic by w, i, N"""
+    x_temp = x_orbit * np.cos(w) - y_orbit * np.sin(w)
+    y_temp = x_orbit * np.sin(w) + y_orbit * np.cos(w)
+
+    y_temp2 = y_temp * np.cos(i)
+    z_temp2 = y_temp * np.sin(i)
+
+    result = np.empty(np.shape(x_temp) + (3,))
+    result[..., 0] = x_temp * np.cos(N) - y_temp2 * np.sin(N)
+    result[..., 1] = x_temp * np.sin(N) + y_temp2 * np.cos(N)
+    result[..., 2] = z_temp2
+    return result
+
+
+def compute_orbits(tree, elements, a_scale, out):
+    """(ORBIT_POINTS + 1)-point orbit paths relative to the parent, for all bodies.
+
+    Bound orbits are closed loops sampled evenly in eccentric anomaly. Open
+    orbits are arcs out to OPEN_ORBIT_EXTENT, with the last point repeated.
+    """
+    a = (elements[:, IDX_A] * a_scale)[:, None]
+    e = elements[:, IDX_E][:, None]
+    i, N, w = (np.radians(elements[:, k])[:, None] for k in (IDX_I, IDX_N, IDX_W))
+    bound = e < 1.0
+
+    E = (np.arange(ORBIT_POINTS + 1) % ORBIT_POINTS) * 2 * np.pi / ORBIT_POINTS
+    x = np.where(bound, a * (np.cos(E) - e), 0.0)
+    y = np.where(bound, a * np.sqrt(np.abs(1 - e * e)) * np.sin(E), 0.0)
+
+    open_rows = np.flatnonzero(~bound[:, 0])
+    if open_rows.size:
+        eo, ao = e[open_rows], a[open_rows]
+        p = np.where(eo == 1.0, ao, ao * (1 - eo)) * (1 + eo)  # semi-latus rectum
+        r_max = np.maximum(OPEN_ORBIT_EXTENT, 2 * p)
+        nu_max = np.arccos(np.clip((p / r_max - 1) / eo, -1.0, 1.0))
+        nu = np.append(np.linspace(-1.0, 1.0, ORBIT_POINTS), 1.0) * nu_max
+        r = p / (1 + eo * np.cos(nu))
+        x[open_rows] = r * np.cos(nu)
+        y[open_rows] = r * np.sin(nu)
+
+    out[...] = _rotate(x, y, w, i, N) * AU
+    out *= tree.exaggeration[:, None, None]
+    return out
+
+
+def state_vectors(tree, epochs, physics=None, bodies=None, exaggerate=False):
+    """Heliocentric state vectors of many bodies at many epochs.
+
+    Returns positions in meters and velocities in m/s, both shaped
+    (bodies, epochs, 3). Velocities come analytically from the same Kepler
+    solve as the positions. They are the rate of change of the modeled
+    trajectory, so they follow the semi-major axes scaled by the Sun mass and
+    G multipliers. With exaggerate=True satellite offsets are scaled as on
+    screen.
+    """
+    physics = DEFAULT_PHYSICS if physics is None else physics
+    epochs = np.atleast_1d(np.asarray(epochs, dtype=float))
+
+    elements = apply_physics(tree.elements_at_epochs(epochs), physics)
+    a_scale = tree.a_scale(physics['sun_mass_scale'])[:, None]
+    rates = physics_rates(tree.rate[:, None, :], elements, physics)
+    position, velocity = positions_from_elements(elements, a_scale, rates)
+    velocity /= SECONDS_PER_DAY
+    if exaggerate:
+        position *= tree.exaggeration[:, None, None]
+        velocity *= tree.exaggeration[:, None, None]
+
+    tree.compose(position, out=position)
+    tree.compose(velocity, out=velocity)
+    if bodies is not None:
+        idx = tree.body_ids(bodies)
+        return position[idx], velocity[idx]
+    return position, velocity
+
+
+def compute_frame(tree, d, physics, positions, elements, orbits=None, is_stale=None, velocities=None,
+                  sources=()):
+    """Fill positions (n, 3), elements (n, 6) and optionally orbits in place.
+
+    Positions are the displayed ones (satellite offsets exaggerated),
+    velocities the true heliocentric ones in m/s. Orbits are
+    (ORBIT_POINTS + 1)-point paths relative to the parent. Bodies covered by
+    one of the sources (chebyshev.py, spk.py, integrator.py) are taken from
+    the first one that covers them, the rest are solved here. Sources with a
+    fill_elements method also supply the elements of the bodies they cover.
+    Returns False as soon as is_stale() reports that the result is no longer
+    wanted.
+    """
+    tree.elements_at(d, out=elements)
+    apply_physics(elements, physics)
+    a_scale = tree.a_scale(physics['sun_mass_scale'])
+
+    relative = np.zeros_like(positions)
+    relative_velocity = np.zeros_like(positions)
+    solve = np.ones(len(tree.names), dtype=bool)
+    for source in sources:
+        covered = source.fill(tree, d, physics, relative, relative_velocity, solve)
+        if covered.any() and hasattr(source, 'fill_elements'):
+            source.fill_elements(tree, d, elements, covered, a_scale)
+        solve &= ~covered
+    if solve.any():
+        rates = physics_rates(tree.rate[solve], elements[solve], physics)
+        relative[solve], relative_velocity[solve] = positions_from_elements(elements[solve], a_scale[solve], rates)
+    relative *= tree.exaggeration[:, None]
+    tree.compose(relative, out=positions)
+    if velocities is not None:
+        relative_velocity /= SECONDS_PER_DAY
+        tree.compose(relative_velocity, out=velocities)
+
+    if orbits is not None:
+        if is_stale is not None and is_stale():
+            return False
+        compute_orbits(tree, elements, a_scale, orbits)
+
+    return True
@@ -0,0 +1,211 @@
+"""Search the timeline for conjunctions, oppositions and closest approaches.
+
+Every event is a local minimum of some quantity seen from the observer
+(Earth): the angle between a planet and the Sun, between two planets, or
+the distance to a body. The whole window is sampled coarsely in one
+vectorized ephemeris call. Each sign change of the quantity's time
+derivative, which comes analytically from the state vectors, is refined by
+bisection on that derivative, with all brackets advanced together.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import ephemeris
+
+PLANETS = ('Mercury', 'Venus', 'Mars', 'Jupiter', 'Saturn', 'Uranus', 'Neptune')
+INNER_PLANETS = ('Mercury', 'Venus')
+OBSERVER = 'Earth'
+
+STEP = 1.0  # days between coarse samples; shorter than half of any synodic period
+MAX_SEPARATION = 3.0  # degrees, planet-planet conjunctions wider than this are skipped
+TOLERANCE = 1e-5  # days, about a second
+
+KINDS = ('conjunction', 'opposition', 'closest approach')
+
+EVENT_DTYPE = np.dtype([
+    ('day', '<f8'), ('kind', 'U24'), ('body', 'U16'), ('other', 'U16'),
+    ('value', '<f8'),  # separation in degrees or distance in AU; eclipses.py documents its own
+])
+
+
+def _measure(u, du, v, dv, angle):
+    """Quantity and its rate: cos of the angle between u and v, or the length of u"""
+    uu = np.einsum('...i,...i->...', u, u)
+    length_u = np.sqrt(uu)
+    if not angle:
+        return length_u, np.einsum('...i,...i->...', u, du) / length_u
+    vv = np.einsum('...i,...i->...', v, v)
+    length_v = np.sqrt(vv)
+    cos = np.einsum('...i,...i->...', u, v) / (length_u * length_v)
+    rate = ((np.einsum('...i,...i->...', du, v) + np.einsum('...i,...i->...', u, dv)) / (length_u * length_v)
+            - cos * (np.einsum('...i,...i->...', u, du) / uu + np.einsum('...i,...i->...', v, dv) / vv))
+    return cos, rate
+
+
+class _Searches:
+    """One row per quantity to minimize: bodies a, b and observer o in the tree"""
+
+    def __init__(self, tree, bodies, observer):
+        rows = []
+        sun = 'Sun'
+        for body in bodies:
+            # the Sun and the planet close up: -cos(elongation) is smallest
+            rows.append((body, sun, True, -1.0, 'conjunction'))
+            if body not in INNER_PLANETS:
+                rows.append((body, sun, True, 1.0, 'opposition'))
+            rows.append((body, observer, False, 1.0, 'closest approach'))
+        for k, body in enumerate(bodies):
+            for other in bodies[k + 1:]:
+                rows.append((body, other, True, -1.0, 'conjunction'))
+
+        self.body = [row[0] for row in rows]
+        self.other = [row[1] for row in rows]
+        self.a = tree.body_ids(self.body)
+        self.b = tree.body_ids(self.other)
+        self.o = np.full(len(rows), tree.ids[observer])
+        self.angle = np.array([row[2] for row in rows])
+        self.sign = np.array([row[3] for row in rows])
+        self.kind = [row[4] for row in rows]
+
+    def evaluate(self, position, velocity, rows, columns=None):
+        """Signed quantity and rate for rows; one epoch per row if columns is given"""
+        def pick(ids):
+            if columns is None:
+                return position[ids], velocity[ids]
+            return position[ids, columns], velocity[ids, columns]
+
+        pa, va = pick(self.a[rows])
+        pb, vb = pick(self.b[rows])
+        po, vo = pick(self.o[rows])
+        value = np.empty(pa.shape[:-1])
+        rate = np.empty(pa.shape[:-1])
+        for angle in (True, False):
+            use = self.angle[rows] == angle
+            if use.any():
+                value[use], rate[use] = _measure(pa[use] - po[use], va[use] - vo[use],
+                                                 pb[use] - po[use], vb[use] - vo[use], angle)
+        sign = self.sign[rows].reshape((-1,) + (1,) * (value.ndim - 1))
+        return value * sign, rate * sign
+
+
+def tree_for(names):
+    """A BodyTree holding names and all their parents"""
+    wanted = []
+    for name in names:
+        chain = []
+        while name and name not in wanted and name not in chain:
+            chain.append(name)
+            name = ephemeris.PARENT_BODY.get(name)
+        wanted.extend(reversed(chain))
+    return ephemeris.BodyTree(wanted)
+
+
+def find_events(start, stop, physics=None, bodies=PLANETS, observer=OBSERVER, step=STEP,
+                max_separation=MAX_SEPARATION, tolerance=TOLERANCE):
+    """All events between day numbers start and stop, as an EventIndex"""
+    physics = ephemeris.DEFAULT_PHYSICS if physics is None else physics
+    bodies = [body for body in bodies if body != observer]
+    tree = tree_for(['Sun', observer] + bodies)
+    searches = _Searches(tree, bodies, observer)
+    every = np.arange(len(searches.kind))
+
+    # coarse scan: a minimum lies wherever the rate turns from negative to positive
+    days = start + step * np.arange(int(np.ceil((stop - start) / step)) + 1)
+    position, velocity = ephemeris.state_vectors(tree, days, physics)
+    coarse, rate = searches.evaluate(position, velocity, every)
+    rows, j = np.nonzero((rate[:, :-1] < 0) & (rate[:, 1:] >= 0))
+    lo, hi = days[j], days[j + 1]
+
+    # bisection on the rate, every bracket at once
+    columns = np.arange(len(rows))
+    for _ in range(int(np.ceil(np.log2(step / tolerance)))):
+        middle = 0.5 * (lo + hi)
+        position, velocity = ephemeris.state_vectors(tree, middle, physics)
+        _, rate = searches.evaluate(position, velocity, rows, columns)
+        falling = rate < 0
+        lo = np.where(falling, middle, lo)
+        hi = np.where(falling, hi, middle)
+
+    day = 0.5 * (lo + hi)
+    position, velocity = ephemeris.state_vectors(tree, day, physics)
+    value, _ = searches.evaluate(position, velocity, rows, columns)
+    # a rate that crosses zero without the quantity dipping below both coarse ends is no minimum
+    minimum = value <= np.minimum(coarse[rows, j], coarse[rows, j + 1])
+    # undo the sign to get back cos; arccos of it is the true angle, near 180 for oppositions
+    angle = searches.angle[rows]
+    value = np.where(angle, np.degrees(np.arccos(np.clip(value * searches.sign[rows], -1.0, 1.0))),
+                     value / ephemeris.AU)
+
+    events = np.zeros(len(rows), dtype=EVENT_DTYPE)
+    events['day'] = day
+    events['kind'] = [searches.kind[row] for row in rows]
+    events['body'] = [searches.body[row] for row in rows]
+    events['other'] = [searches.other[row] for row in rows]
+    events['value'] = value
+
+    # inferior or superior: is the planet nearer than the Sun at conjunction?
+    observer_id = tree.ids[observer]
+    sun_conjunction = (events['kind'] == 'conjunction') & (events['other'] == 'Sun')
+    for k in np.flatnonzero(sun_conjunction & np.isin(events['body'], INNER_PLANETS)):
+        body = tree.ids[events['body'][k]]
+        near = (np.linalg.norm(position[body, k] - position[observer_id, k])
+                < np.linalg.norm(position[tree.ids['Sun'], k] - position[observer_id, k]))
+        events['kind'][k] = ('inferior ' if near else 'superior ') + 'conjunction'
+
+    keep = ~((events['kind'] == 'conjunction') & (events['other'] != 'Sun') & (events['value'] > max_separation))
+    return EventIndex(events[keep & minimum & (day >= start) & (day <= stop)])
+
+
+class EventIndex:
+    """Events sorted by day, with lookups by time and kind"""
+
+    def __init__(self, events):
+        self.events = np.sort(np.asarray(events, dtype=EVENT_DTYPE), order='day')
+
+    def __len__(self):
+        return len(self.events)
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def select(self, kind=None):
+        """Events whose kind contains kind (e.g. 'conjunction'), or all of them"""
+        if kind is None:
+            return self.events
+        return self.events[np.char.find(self.events['kind'], kind) >= 0]
+
+    def between(self, start, stop, kind=None):
+        events = self.select(kind)
+        lo, hi = np.searchsorted(events['day'], [start, stop], side='left')
+        return events[lo:hi]
+
+    def next_after(self, day, kind=None, margin=1e-3):
+        """First event later than day (by more than margin days), or None"""
+        events = self.select(kind)
+        k = np.searchsorted(events['day'], day + margin, side='right')
+        return events[k] if k < len(events) else None
+
+    def previous_before(self, day, kind=None, margin=1e-3):
+        events = self.select(kind)
+        k = np.searchsorted(events['day'], day - margin, side='left')
+        return events[k - 1] if k > 0 else None
+
+
+def describe(event):
+    """One line for an event, e.g. '2027-02-19 14:02  Mars opposition, 180.0 deg'"""
+    when = datetime(2000, 1, 1) + timedelta(days=float(event['day']))
+    kind = event['kind']
+    if kind == 'closest approach':
+        what = f"{event['body']} closest approach, {event['value']:.3f} AU"
+    elif kind.endswith('solar eclipse'):
+        what = f"{kind.capitalize()}, gamma {event['value']:.3f}"
+    elif kind.endswith('lunar eclipse'):
+        what = f"{kind.capitalize()}, umbral magnitude {event['value']:.3f}"
+    elif kind == 'transit':
+        what = f"{event['body']} transit, {event['value'] * 60:.1f}' from the Sun's center"
+    elif event['other'] == 'Sun':
+        what = f"{event['body']} {kind}, {event['value']:.2f} deg from the Sun"
+    else:
+        what = f"{event['body']}-{event['other']} {kind}, {event['value']:.2f} deg apart"
+    return f"{when:%Y-%m-%d %H:%M}  {what}"
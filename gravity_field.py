@@ -0,0 +1,155 @@
+"""Summed gravitational acceleration of all bodies on a structured grid.
+
+The field lives on a vtkImageData whose vector array is the NumPy buffer
+itself. Each body's contribution is kept separately, so when bodies move
+only the cells near their new position are recomputed. Beyond the near
+radius a body that drifted by s changes the field by at most about
+3 s GM / r^3, so its far contribution is refreshed as a whole only once that
+exceeds `tolerance` times the weakest total field on the grid, away from
+the bodies themselves.
+"""
+import numpy as np
+from vtkmodules.util.numpy_support import numpy_to_vtk
+from vtkmodules.vtkCommonDataModel import vtkImageData
+
+G = 6.67430e-11
+
+
+class GravityField:
+    """Acceleration from point masses on an nx x ny x nz grid centered on the Sun.
+
+    Lengths are meters; `scale` converts them to display units for the image.
+    Accelerations are softened over one grid spacing so cells next to a body
+    stay finite.
+    """
+
+    def __init__(self, masses, half_width, half_height, shape=(41, 41, 5), scale=1.0,
+                 near_cells=4, tolerance=1e-3):
+        self.masses = np.asarray(masses, dtype=float)
+        self.scale = scale
+        nx, ny, nz = shape
+        self.shape = shape
+        self.spacing = np.array([2.0 * half_width / (nx - 1), 2.0 * half_width / (ny - 1),
+                                 2.0 * half_height / max(nz - 1, 1)])
+        self.origin = np.array([-half_width, -half_width, -half_height if nz > 1 else 0.0])
+        self.near_cells = near_cells
+        self.near_radius = near_cells * self.spacing[:2].min()
+        self.tolerance = tolerance
+        self.softening = self.spacing[:2].min()
+
+        # cell centers in VTK point order (x fastest), shaped (nz, ny, nx, 3)
+        axes = [self.origin[k] + self.spacing[k] * np.arange(shape[k]) for k in range(3)]
+        z, y, x = np.meshgrid(axes[2], axes[1], axes[0], indexing='ij')
+        self.points = np.stack((x, y, z), axis=-1)
+
+        n = len(self.masses)
+        self.gm = G * self.masses
+        self.contribution = np.zeros((n,) + self.points.shape)
+        self.acceleration = np.zeros(self.points.shape)
+        self.near_position = np.full((n, 3), np.nan)  # where each near box was last solved
+        self.far_position = np.full((n, 3), np.nan)  # where each whole contribution was solved
+        self.weakest = np.nan  # smallest |acceleration| on the grid at the last full refresh
+        self.cells_updated = 0  # body-cell evaluations, for diagnostics
+
+        # what VTK sees: one arrow per cell, length on a log scale
+        self.vectors = np.zeros((self.points[..., 0].size, 3))
+        self.magnitude = np.zeros(len(self.vectors))
+        self.image = vtkImageData()
+        self.image.SetDimensions(*shape)
+        self.image.SetOrigin(*(self.origin / scale))
+        self.image.SetSpacing(*(self.spacing / scale))
+        self._vtk_vectors = numpy_to_vtk(self.vectors, deep=False)
+        self._vtk_vectors.SetName("GravityField")
+        self._vtk_magnitude = numpy_to_vtk(self.magnitude, deep=False)
+        self._vtk_magnitude.SetName("LogAcceleration")
+        self.image.GetPointData().SetVectors(self._vtk_vectors)
+        self.image.GetPointData().SetScalars(self._vtk_magnitude)
+
+    def set_physics(self, sun_mass_scale, G_multiplier, sun_index=0):
+        """Rescale the masses; every contribution is recomputed on the next update"""
+        self.gm = G * G_multiplier * self.masses
+        self.gm[sun_index] *= sun_mass_scale
+        self.far_position[:] = np.nan
+
+    def update(self, positions):
+        """Bring the field up to date with body positions (n, 3) in meters; True if it changed"""
+        positions = np.asarray(positions, dtype=float)
+        # distance from each body to the cells outside its near box
+        lower = self.points[0, 0, 0]
+        upper = self.points[-1, -1, -1]
+        outside = np.linalg.norm(np.maximum(lower - positions, 0) + np.maximum(positions - upper, 0), axis=1)
+        r_far = np.maximum(outside, self.near_radius)
+        drift = np.linalg.norm(positions - self.far_position, axis=1)
+        far = ~(3 * drift * self.gm / r_far ** 3 <= self.tolerance * self.weakest)
+        near = ~far & ~np.all(positions == self.near_position, axis=1)
+        if not (far.any() or near.any()):
+            return False
+
+        boxes = []
+        for body in np.flatnonzero(near):
+            # cells around both the old and the new position, as one box
+            box = self._box(np.stack((self.near_position[body], positions[body])))
+            self.near_position[body] = positions[body]
+            if box is None:
+                continue
+            self.contribution[(body,) + box] = self._accelerations(
+                positions[body, None], self.gm[body, None], self.points[box])[0]
+            self.cells_updated += self.points[box][..., 0].size
+            boxes.append(box)
+
+        if far.any():
+            idx = np.flatnonzero(far)
+            self.contribution[idx] = self._accelerations(positions[idx], self.gm[idx], self.points)
+            self.far_position[idx] = positions[idx]
+            self.near_position[idx] = positions[idx]
+            self.cells_updated += idx.size * self.points[..., 0].size
+            boxes = [(slice(None),) * 3]
+            self.acceleration[...] = self.contribution.sum(axis=0)
+            self.weakest = self._weakest(positions)
+
+        for box in boxes:
+            self.acceleration[box] = self.contribution[(slice(None),) + box].sum(axis=0)
+            self._refresh_display(box)
+        self._vtk_vectors.Modified()
+        self._vtk_magnitude.Modified()
+        self.image.Modified()
+        return True
+
+    def _accelerations(self, sources, gm, targets):
+        """Acceleration (m/s^2) at targets (..., 3) towards each source (k, 3), shaped (k, ..., 3)"""
+        extra = (1,) * (targets.ndim - 1)
+        offset = sources.reshape((len(sources),) + extra + (3,)) - targets[None]
+        r2 = np.einsum('...i,...i->...', offset, offset) + self.softening ** 2
+        return offset * (gm.reshape((len(gm),) + extra) / (r2 * np.sqrt(r2)))[..., None]
+
+    def _weakest(self, positions):
+        # the softened field vanishes at a body's own position, so leave out
+        # cells next to any body
+        offset = positions[:, None, None, None, :] - self.points[None]
+        clear = np.all(np.einsum('...i,...i->...', offset, offset) > (2 * self.softening) ** 2, axis=0)
+        magnitude = np.linalg.norm(self.acceleration, axis=-1)
+        return magnitude[clear].min() if clear.any() else magnitude.max()
+
+    def _box(self, positions):
+        """Index slices (z, y, x) of the cells within near_radius of any of positions, or None"""
+        lo = np.floor((positions.min(axis=0) - self.near_radius - self.origin) / self.spacing)
+        hi = np.ceil((positions.max(axis=0) + self.near_radius - self.origin) / self.spacing) + 1
+        size = np.array(self.shape)
+        lo = np.clip(lo, 0, size).astype(int)
+        hi = np.clip(hi, 0, size).astype(int)
+        if np.any(hi <= lo):
+            return None
+        return tuple(slice(lo[k], hi[k]) for k in (2, 1, 0))
+
+    def _refresh_display(self, box):
+        magnitude = np.linalg.norm(self.acceleration[box], axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_magnitude = np.log10(magnitude)
+            direction = self.acceleration[box] / magnitude[..., None]
+        direction[magnitude == 0] = 0.0
+        # arrows of at most one cell, scaled over six decades
+        top = np.log10(self.gm.max() / self.softening ** 2)
+        length = np.clip((log_magnitude - (top - 6.0)) / 6.0, 0.05, 1.0) * self.spacing[:2].min() / self.scale
+        vectors = self.vectors.reshape(self.points.shape)
+        vectors[box] = direction * length[..., None]
+        self.magnitude.reshape(self.points.shape[:-1])[box] = np.where(np.isfinite(log_magnitude), log_magnitude, 0.0)
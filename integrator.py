@@ -0,0 +1,314 @@
+"""Long-horizon N-body integration jobs, resumable and loadable into the app.
+
+    python integrator.py runs --years 100000 --bodies Jupiter Saturn Uranus Neptune \
+        --step 40 --every 3652.5 --sun-mass 1.0 1.2 1.5 --jobs 3
+
+Each combination of the Sun mass and G multipliers is one scenario, run in its
+own process into runs/<name>/. The Sun and planets start from the app's model
+at the start date: positions as displayed, velocities rescaled so every
+heliocentric orbit keeps its shape under the modified G (M_sun + m). From there
+the bodies attract each other, so the orbits precess and exchange eccentricity
+and inclination on secular time scales, which the analytic model cannot show.
+
+The integrator is the Wisdom-Holman map in democratic heliocentric
+coordinates: each step drifts every body along its Kepler orbit about the Sun
+(propagator.propagate_states) between half-step kicks from the other bodies
+and half-step shifts for the Sun's motion. It is symplectic, so energy errors
+stay bounded over millions of steps. Steps of about a twentieth of the
+shortest period keep it accurate; leave Mercury out for runs of 10^5 years
+or more.
+
+Every scenario writes states.npy, one record per output epoch in the layout of
+trajectory_export.py (day, heliocentric position in m and velocity in m/s of
+every body), and job.ckpt, a checkpoint of the integrator state saved after
+each chunk of output. Running the same command again resumes unfinished jobs
+where their last checkpoint left them. A run directory can be opened in the
+app with
+
+    python orbital_fw.py runs/sun_mass_1.2_g_1
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import get_context
+
+import numpy as np
+
+import ephemeris
+import propagator
+from checkpoint import Checkpoint
+from trajectory_export import state_dtype
+
+G = 6.67430e-11
+DAYS_PER_YEAR = 365.25
+CHUNK = 256  # output epochs between checkpoints
+STATES_FILE = 'states.npy'
+CHECKPOINT_FILE = 'job.ckpt'
+
+# masses in kg, as in SolarSystemScene.initialize_planets
+MASSES = {
+    'Sun': 1.989e30,
+    'Mercury': 0.330e24,
+    'Venus': 4.87e24,
+    'Earth': 5.97e24,
+    'Mars': 0.642e24,
+    'Jupiter': 1898e24,
+    'Saturn': 568e24,
+    'Uranus': 86.8e24,
+    'Neptune': 102e24,
+    'Halley': 2.2e14,
+    'Oumuamua': 8e9,
+}
+PLANETS = ('Mercury', 'Venus', 'Earth', 'Mars', 'Jupiter', 'Saturn', 'Uranus', 'Neptune')
+
+
+def gravitational_parameters(bodies, physics):
+    """(G M_sun, G m of each body) in m^3/s^2 under the Sun mass and G multipliers"""
+    g = G * physics['G_multiplier']
+    return g * MASSES['Sun'] * physics['sun_mass_scale'], g * np.array([MASSES[body] for body in bodies])
+
+
+def initial_state(bodies, start, physics):
+    """Heliocentric positions (m) and velocities (m/s) of bodies at day start"""
+    tree = ephemeris.BodyTree(['Sun'] + list(bodies))
+    position, velocity = ephemeris.state_vectors(tree, [start], physics)
+    idx = tree.body_ids(bodies)
+    position, velocity = position[idx, 0], velocity[idx, 0]
+
+    # the model's orbits obey n^2 a^3 = mu for its own mu; rescale to G (M_sun + m)
+    elements = ephemeris.apply_physics(tree.elements_at(start), physics)[idx]
+    a = np.abs(elements[:, ephemeris.IDX_A]) * tree.a_scale(physics['sun_mass_scale'])[idx] * ephemeris.AU
+    n = np.radians(tree.rate[idx, ephemeris.IDX_M]) / ephemeris.SECONDS_PER_DAY
+    gm_sun, gm = gravitational_parameters(bodies, physics)
+    velocity *= np.sqrt((gm_sun + gm) / (n * n * a ** 3))[:, None]
+    return position, velocity
+
+
+class WisdomHolman:
+    """Symplectic map in democratic heliocentric coordinates.
+
+    x holds heliocentric positions and u barycentric velocities, both (n, 3)
+    in m and m/s, and are advanced in place.
+    """
+
+    def __init__(self, gm_sun, gm, step):
+        self.gm_sun = gm_sun
+        self.gm = np.asarray(gm, dtype=float)
+        self.step = step  # seconds
+        self.pairs = np.triu_indices(len(self.gm), 1)
+
+    def from_heliocentric(self, position, velocity):
+        u = velocity - (self.gm[:, None] * velocity).sum(axis=0) / (self.gm_sun + self.gm.sum())
+        return np.array(position, dtype=float), u
+
+    def to_heliocentric(self, x, u):
+        sun_velocity = -(self.gm[:, None] * u).sum(axis=0) / self.gm_sun
+        return x.copy(), u - sun_velocity
+
+    def _jump(self, x, u, dt):
+        x += dt * (self.gm[:, None] * u).sum(axis=0) / self.gm_sun
+
+    def _kick(self, x, u, dt):
+        i, j = self.pairs
+        d = x[j] - x[i]
+        r2 = (d * d).sum(axis=1)
+        d /= (r2 * np.sqrt(r2))[:, None]
+        np.add.at(u, i, dt * self.gm[j, None] * d)
+        np.subtract.at(u, j, dt * self.gm[i, None] * d)
+
+    def advance(self, x, u, steps):
+        """steps steps of jump-kick-drift-kick-jump; the inner jumps are merged"""
+        h = self.step
+        self._jump(x, u, h / 2)
+        for k in range(steps):
+            self._kick(x, u, h / 2)
+            x[...], u[...] = propagator.propagate_states(x, u, self.gm_sun, h)
+            self._kick(x, u, h / 2)
+            self._jump(x, u, h if k < steps - 1 else h / 2)
+
+    def energy(self, x, u):
+        """Total energy times G, for checking conservation"""
+        kinetic = 0.5 * (self.gm * (u * u).sum(axis=1)).sum()
+        momentum = (self.gm[:, None] * u).sum(axis=0)
+        kinetic += 0.5 * (momentum * momentum).sum() / self.gm_sun
+        r = np.sqrt((x * x).sum(axis=1))
+        potential = -(self.gm_sun * self.gm / r).sum()
+        i, j = self.pairs
+        potential -= (self.gm[i] * self.gm[j] / np.sqrt(((x[j] - x[i]) ** 2).sum(axis=1))).sum()
+        return kinetic + potential
+
+
+def scenario(name, bodies, start, days, step, every, physics):
+    """A job description; plain data, saved in the job's checkpoint"""
+    bodies = list(bodies)
+    unknown = [body for body in bodies if body not in MASSES or body == 'Sun']
+    if unknown:
+        raise ValueError(f"Cannot integrate {', '.join(unknown)}; choose from {', '.join(list(MASSES)[1:])}")
+    stride = max(1, int(round(every / step)))
+    steps = int(round(days / step))
+    return {'name': name, 'bodies': bodies, 'start': float(start), 'step': float(step), 'stride': stride,
+            'samples': steps // stride + 1, 'physics': dict(physics)}
+
+
+def run_job(job, directory):
+    """Run or resume one scenario into directory; returns (name, samples, seconds)"""
+    os.makedirs(directory, exist_ok=True)
+    states_path = os.path.join(directory, STATES_FILE)
+    checkpoint_path = os.path.join(directory, CHECKPOINT_FILE)
+    gm_sun, gm = gravitational_parameters(job['bodies'], job['physics'])
+    integrator = WisdomHolman(gm_sun, gm, job['step'] * ephemeris.SECONDS_PER_DAY)
+    dtype = state_dtype(len(job['bodies']))
+
+    written = 0
+    if os.path.exists(checkpoint_path):
+        saved = Checkpoint.load(checkpoint_path)
+        if saved.state['job'] != job:
+            raise ValueError(f"{directory} holds a different job; remove it or choose another directory")
+        written, energy = saved.state['written'], saved.state['energy']
+        x, u = np.array(saved['x']), np.array(saved['u'])
+        del saved  # the checkpoint file is replaced below
+        states = np.lib.format.open_memmap(states_path, mode='r+')
+    else:
+        x, u = integrator.from_heliocentric(*initial_state(job['bodies'], job['start'], job['physics']))
+        energy = integrator.energy(x, u)
+        states = np.lib.format.open_memmap(states_path, mode='w+', dtype=dtype, shape=(job['samples'],))
+
+    started = time.perf_counter()
+    sample_days = job['step'] * job['stride']
+    block = np.empty(CHUNK, dtype=dtype)
+    while written < job['samples']:
+        count = min(CHUNK, job['samples'] - written)
+        for k in range(count):
+            if written + k > 0:
+                integrator.advance(x, u, job['stride'])
+            block['day'][k] = job['start'] + (written + k) * sample_days
+            block['position'][k], block['velocity'][k] = integrator.to_heliocentric(x, u)
+        states[written:written + count] = block[:count]
+        states.flush()
+        written += count
+
+        # save() swaps the new file in whole, so a kill never leaves half a checkpoint
+        state = {'job': job, 'written': written, 'energy': energy,
+                 'energy_error': abs(integrator.energy(x, u) / energy - 1)}
+        Checkpoint(state, {'x': x, 'u': u}).save(checkpoint_path)
+    del states
+    return job['name'], written, time.perf_counter() - started
+
+
+class IntegratedEphemeris:
+    """A finished or partial run as an ephemeris source for the app.
+
+    Between output epochs each body follows the Kepler arc through its
+    nearest sample, and its osculating elements there replace the mean
+    elements, so orbit paths show the integrated orbits.
+    """
+
+    def __init__(self, job, states, written):
+        self.job = job
+        self.states = states
+        self.written = written
+        self.names = list(job['bodies'])
+        self.ids = {name: k for k, name in enumerate(self.names)}
+        self.physics = dict(job['physics'])
+        self.start = job['start']
+        self.sample_days = job['step'] * job['stride']
+        self.stop = self.start + (written - 1) * self.sample_days
+        gm_sun, gm = gravitational_parameters(self.names, self.physics)
+        self.mu = gm_sun + gm
+        self._rows = {}
+
+    @classmethod
+    def load(cls, directory):
+        """Open a run directory; the states are memory-mapped"""
+        saved = Checkpoint.load(os.path.join(directory, CHECKPOINT_FILE))
+        states = np.load(os.path.join(directory, STATES_FILE), mmap_mode='r')
+        written = saved.state['written']
+        if written < 1:
+            raise ValueError(f"{directory} has no output yet")
+        return cls(saved.state['job'], states, written)
+
+    def covers(self, d, physics):
+        return self.start <= d <= self.stop and physics == self.physics
+
+    def _states_at(self, d, idx):
+        k = int(np.clip(np.rint((d - self.start) / self.sample_days), 0, self.written - 1))
+        sample = self.states[k]
+        dt = (d - sample['day']) * ephemeris.SECONDS_PER_DAY
+        return propagator.propagate_states(sample['position'][idx], sample['velocity'][idx], self.mu[idx], dt)
+
+    def fill(self, tree, d, physics, relative, relative_velocity, wanted):
+        """Write relative states (m, m/day) of the wanted tree rows covered at day d; returns their mask"""
+        covered = np.zeros(len(tree.names), dtype=bool)
+        if not self.covers(d, physics):
+            return covered
+        rows, idx = self._bind(tree)
+        keep = wanted[rows]
+        rows, idx = rows[keep], idx[keep]
+        if rows.size:
+            position, velocity = self._states_at(d, idx)
+            relative[rows] = position
+            relative_velocity[rows] = velocity * ephemeris.SECONDS_PER_DAY
+            covered[rows] = True
+        return covered
+
+    def fill_elements(self, tree, d, elements, covered, a_scale):
+        """Osculating elements of the covered rows, with a in the units compute_orbits scales"""
+        rows, idx = self._bind(tree)
+        keep = covered[rows]
+        rows, idx = rows[keep], idx[keep]
+        if rows.size:
+            position, velocity = self._states_at(d, idx)
+            elements[rows] = ephemeris.elements_from_states(position, velocity, self.mu[idx])
+            elements[rows, ephemeris.IDX_A] /= a_scale[rows]
+
+    def _bind(self, tree):
+        key = tree.key
+        if key not in self._rows:
+            pairs = [(row, self.ids[name]) for row, name in enumerate(tree.names)
+                     if name in self.ids and tree.heliocentric[row]]
+            rows = np.array([row for row, _ in pairs], dtype=np.intp)
+            idx = np.array([k for _, k in pairs], dtype=np.intp)
+            self._rows[key] = (rows, idx)
+        return self._rows[key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Integrate the solar system over long spans, resumably")
+    parser.add_argument("output", help="directory for one subdirectory per scenario")
+    parser.add_argument("--bodies", nargs="+", default=list(PLANETS), help="bodies besides the Sun")
+    parser.add_argument("--start", help="first date, YYYY-MM-DD (default today)")
+    parser.add_argument("--years", type=float, default=10000.0, help="length of the run")
+    parser.add_argument("--step", type=float, default=4.0, help="integration step in days")
+    parser.add_argument("--every", type=float, default=DAYS_PER_YEAR, help="days between output epochs")
+    parser.add_argument("--sun-mass", type=float, nargs="+", default=[1.0], help="Sun mass multipliers")
+    parser.add_argument("--g", type=float, nargs="+", default=[1.0], help="G multipliers")
+    parser.add_argument("--eccentricity", type=float, default=1.0, help="eccentricity multiplier")
+    parser.add_argument("--inclination", type=float, default=1.0, help="inclination multiplier")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    start_date = datetime.strptime(args.start, "%Y-%m-%d") if args.start else datetime.now()
+    start = float((start_date.date() - datetime(2000, 1, 1).date()).days)
+    jobs = []
+    for sun_mass in args.sun_mass:
+        for g in args.g:
+            physics = dict(sun_mass_scale=sun_mass, G_multiplier=g, ecc_multiplier=args.eccentricity,
+                           inc_multiplier=args.inclination)
+            name = f"sun_mass_{sun_mass:g}_g_{g:g}"
+            jobs.append(scenario(name, args.bodies, start, args.years * DAYS_PER_YEAR, args.step, args.every,
+                                 physics))
+
+    started = time.perf_counter()
+    # spawn, like render_frames: workers start clean and only import what they need
+    with ProcessPoolExecutor(max_workers=args.jobs, mp_context=get_context('spawn')) as pool:
+        futures = [pool.submit(run_job, job, os.path.join(args.output, job['name'])) for job in jobs]
+        for future in as_completed(futures):
+            name, samples, seconds = future.result()
+            print(f"{name}: {samples} epochs, {seconds:.1f} s")
+    print(f"{len(jobs)} scenarios in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""Lambert's problem on whole grids of departure and arrival dates, and porkchop plots.
+
+    python lambert.py Earth Mars --start 2028-06-01 --days 600 --min-tof 100 --max-tof 450 -o porkchop.png
+
+Given two positions and the time of flight between them, the universal-
+variable formulation (Bate, Mueller & White) reduces the transfer orbit to
+one unknown z = alpha chi^2, with
+
+    y(z) = r1 + r2 + A (z S(z) - 1) / sqrt(C(z))
+    sqrt(mu) t(z) = (y / C)^1.5 S(z) + A sqrt(y)
+
+The time of flight t(z) increases with z up to the single-revolution limit
+4 pi^2, and y < 0 only below the solution, so bisection on z converges for
+every cell at once. The grid can be split by departure date over a process pool.
+Only prograde, single-revolution transfers are considered.
+"""
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+
+import numpy as np
+
+import ephemeris
+from propagator import stumpff
+
+GM_SUN = 1.32712440018e20  # m^3/s^2
+Z_MIN = -400.0  # far into the hyperbolic range; shorter flights are left unsolved
+Z_MAX = 4 * np.pi ** 2  # one full revolution
+ITERATIONS = 64
+
+
+def _flight_time(z, r1, r2, A, sqrt_mu):
+    """Time of flight at z, and y; where y < 0 the time is -inf (z is too small)"""
+    C, S = stumpff(z)
+    y = r1 + r2 + A * (z * S - 1) / np.sqrt(C)
+    with np.errstate(invalid='ignore'):
+        t = ((y / C) ** 1.5 * S + A * np.sqrt(y)) / sqrt_mu
+    return np.where(y > 0, t, -np.inf), y
+
+
+def solve_lambert(r1, r2, tof, mu=GM_SUN):
+    """Velocities (v1, v2) of the prograde transfers from r1 to r2 in tof seconds.
+
+    r1 and r2 are (..., 3) arrays in meters and broadcast against tof. Cells
+    without a single-revolution solution are NaN.
+    """
+    r1, r2 = np.asarray(r1, dtype=float), np.asarray(r2, dtype=float)
+    tof = np.asarray(tof, dtype=float)
+    norm1 = np.linalg.norm(r1, axis=-1)
+    norm2 = np.linalg.norm(r2, axis=-1)
+    cos_angle = np.clip(np.einsum('...i,...i->...', r1, r2) / (norm1 * norm2), -1.0, 1.0)
+    angle = np.arccos(cos_angle)
+    # prograde: the transfer goes the long way when r1 x r2 points south
+    angle = np.where(np.cross(r1, r2)[..., 2] < 0, 2 * np.pi - angle, angle)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        A = np.sin(angle) * np.sqrt(norm1 * norm2 / (1 - cos_angle))
+
+    shape = np.broadcast_shapes(norm1.shape, norm2.shape, tof.shape)
+    norm1, norm2, A, tof = (np.broadcast_to(x, shape) for x in (norm1, norm2, A, tof))
+    sqrt_mu = np.sqrt(mu)
+    lo = np.full(shape, Z_MIN)
+    hi = np.full(shape, Z_MAX)
+    for _ in range(ITERATIONS):
+        z = 0.5 * (lo + hi)
+        t, _ = _flight_time(z, norm1, norm2, A, sqrt_mu)
+        short = t < tof
+        lo = np.where(short, z, lo)
+        hi = np.where(short, hi, z)
+
+    z = 0.5 * (lo + hi)
+    t, y = _flight_time(z, norm1, norm2, A, sqrt_mu)
+    # the bracket ends mean no solution inside it
+    solved = (np.abs(t - tof) <= 1e-6 * tof) & (y > 0) & np.isfinite(A) & (tof > 0)
+
+    f = 1 - y / norm1
+    g = A * np.sqrt(np.where(solved, y, 1.0) / mu)
+    g_dot = 1 - y / norm2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        v1 = (r2 - f[..., None] * r1) / g[..., None]
+        v2 = (g_dot[..., None] * r2 - r1) / g[..., None]
+    v1[~solved] = np.nan
+    v2[~solved] = np.nan
+    return v1, v2
+
+
+def _porkchop_rows(r1, v1, r2, v2, tof, mu):
+    """C3 at departure and v_inf at arrival for a block of departure rows"""
+    transfer1, transfer2 = solve_lambert(r1[:, None], r2[None, :], tof, mu)
+    c3 = np.sum((transfer1 - v1[:, None]) ** 2, axis=-1)
+    v_inf = np.linalg.norm(transfer2 - v2[None, :], axis=-1)
+    return c3, v_inf
+
+
+class Porkchop:
+    """C3 (m^2/s^2), arrival v_inf (m/s) and total v_inf over departure x arrival days"""
+
+    def __init__(self, origin, target, departure, arrival, c3, v_inf):
+        self.origin = origin
+        self.target = target
+        self.departure = departure
+        self.arrival = arrival
+        self.c3 = c3
+        self.v_inf = v_inf
+        self.delta_v = np.sqrt(c3) + v_inf
+
+    @property
+    def time_of_flight(self):
+        return self.arrival[None, :] - self.departure[:, None]
+
+    def best(self):
+        """(departure day, arrival day, total v_inf) of the cheapest transfer"""
+        if np.all(np.isnan(self.delta_v)):
+            return None
+        i, j = np.unravel_index(np.nanargmin(self.delta_v), self.delta_v.shape)
+        return self.departure[i], self.arrival[j], self.delta_v[i, j]
+
+    def save(self, path):
+        np.savez(path, origin=self.origin, target=self.target, departure=self.departure, arrival=self.arrival,
+                 c3=self.c3, v_inf=self.v_inf)
+
+    def plot(self, path, levels=(8, 10, 12, 15, 20, 25, 30, 40, 50, 70, 100)):
+        """Contours of C3 in km^2/s^2 with arrival v_inf, written to an image file (needs matplotlib)"""
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+
+        epoch = datetime(2000, 1, 1)
+        departure = [epoch + timedelta(days=float(d)) for d in self.departure]
+        arrival = [epoch + timedelta(days=float(d)) for d in self.arrival]
+        figure, axes = plt.subplots(figsize=(10, 8))
+        c3 = axes.contour(departure, arrival, (self.c3 / 1e6).T, levels=levels, cmap='viridis')
+        axes.clabel(c3, fmt='%g', fontsize=8)
+        v_inf = axes.contour(departure, arrival, (self.v_inf / 1e3).T, levels=np.arange(2, 12),
+                             colors='tab:red', linewidths=0.6, linestyles='dashed')
+        axes.clabel(v_inf, fmt='%g km/s', fontsize=7)
+        tof = axes.contour(departure, arrival, self.time_of_flight.T, levels=np.arange(50, 1000, 50),
+                           colors='gray', linewidths=0.4)
+        axes.clabel(tof, fmt='%g d', fontsize=7)
+        best = self.best()
+        if best is not None:
+            axes.plot(epoch + timedelta(days=float(best[0])), epoch + timedelta(days=float(best[1])),
+                      'k*', markersize=10)
+        axes.set_xlabel("Departure")
+        axes.set_ylabel("Arrival")
+        axes.set_title(f"{self.origin} to {self.target}: C3 (km²/s²), arrival v∞ (km/s, red), "
+                       f"time of flight (days, gray)")
+        figure.autofmt_xdate()
+        figure.tight_layout()
+        figure.savefig(path, dpi=120)
+        plt.close(figure)
+
+
+def porkchop(origin, target, departure, arrival, physics=None, jobs=None):
+    """Porkchop grid between two bodies for arrays of departure and arrival day numbers"""
+    physics = ephemeris.DEFAULT_PHYSICS if physics is None else physics
+    departure = np.asarray(departure, dtype=float)
+    arrival = np.asarray(arrival, dtype=float)
+    tree = ephemeris.BodyTree(['Sun', origin, target] if origin != target else ['Sun', origin])
+    # the ephemeris keeps mean motions and scales semi-major axes, so mu goes with the cube of that scale
+    a_scale = tree.a_scale(physics['sun_mass_scale'])[tree.ids[origin]] / physics['G_multiplier']
+    mu = GM_SUN * a_scale ** 3
+    r1, v1 = ephemeris.state_vectors(tree, departure, physics, bodies=[origin])
+    r2, v2 = ephemeris.state_vectors(tree, arrival, physics, bodies=[target])
+    r1, v1, r2, v2 = r1[0], v1[0], r2[0], v2[0]
+    tof = (arrival[None, :] - departure[:, None]) * ephemeris.SECONDS_PER_DAY
+
+    jobs = jobs or 1
+    if jobs == 1:
+        c3, v_inf = _porkchop_rows(r1, v1, r2, v2, tof, mu)
+    else:
+        blocks = np.array_split(np.arange(len(departure)), jobs)
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=get_context('spawn')) as pool:
+            results = list(pool.map(_porkchop_rows, *zip(*[(r1[b], v1[b], r2, v2, tof[b], mu) for b in blocks])))
+        c3 = np.concatenate([result[0] for result in results])
+        v_inf = np.concatenate([result[1] for result in results])
+    return Porkchop(origin, target, departure, arrival, c3, v_inf)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Porkchop plot of transfers between two bodies")
+    parser.add_argument("origin")
+    parser.add_argument("target")
+    parser.add_argument("--start", help="first departure date, YYYY-MM-DD (default today)")
+    parser.add_argument("--days", type=float, default=800.0, help="length of the departure window")
+    parser.add_argument("--min-tof", type=float, default=80.0, help="shortest flight in days")
+    parser.add_argument("--max-tof", type=float, default=500.0, help="longest flight in days")
+    parser.add_argument("--grid", type=int, default=500, help="dates along each axis")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="worker processes; pickling the grid to them usually costs more than it saves")
+    parser.add_argument("-o", "--output", default="porkchop.png", help="plot file; the grid goes next to it as .npz")
+    args = parser.parse_args()
+
+    for body in (args.origin, args.target):
+        if body not in ephemeris.MEAN_ELEMENTS or ephemeris.PARENT_BODY.get(body):
+            parser.error(f"{body} is not a body orbiting the Sun")
+    start_date = datetime.strptime(args.start, "%Y-%m-%d") if args.start else datetime.now()
+    start = float((start_date.date() - datetime(2000, 1, 1).date()).days)
+    departure = np.linspace(start, start + args.days, args.grid)
+    arrival = np.linspace(start + args.min_tof, start + args.days + args.max_tof, args.grid)
+
+    started = time.perf_counter()
+    result = porkchop(args.origin, args.target, departure, arrival, jobs=args.jobs)
+    elapsed = time.perf_counter() - started
+    print(f"Solved {result.c3.size} transfers in {elapsed:.2f} s")
+
+    best = result.best()
+    if best is not None:
+        epoch = datetime(2000, 1, 1)
+        leave, arrive, delta_v = best
+        print(f"Cheapest: depart {epoch + timedelta(days=float(leave)):%Y-%m-%d}, "
+              f"arrive {epoch + timedelta(days=float(arrive)):%Y-%m-%d} ({arrive - leave:.0f} days), "
+              f"v_inf {delta_v / 1e3:.2f} km/s")
+    result.save(args.output.rsplit('.', 1)[0] + '.npz')
+    result.plot(args.output)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""Memory and VTK object-leak diagnostics for the app.
+
+Python allocations are traced with tracemalloc and attributed to a subsystem,
+the innermost module of this project on each allocation's traceback (numpy
+and VTK calls count against the module that made them). Live VTK objects are
+counted by class: those held by Python, plus everything reachable from the
+renderer's props (mappers, their input data, textures and properties).
+
+    python leak_profiler.py repeat --times 50 --headless
+    python leak_profiler.py watch --interval 10
+
+repeat runs each rebuild path (orbit paths, physics changes, trails, ...)
+once to warm up and then the given number of times, and reports the growth
+per operation. An operation leaks if the traced memory grows by more than
+LEAK_BYTES per run, or some VTK class gains at least one object per run. The
+exit status is 1 when any operation leaks. watch samples the running app and
+prints the growth since it started.
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+from PyQt5.QtCore import QEventLoop, QTimer
+from PyQt5.QtWidgets import QApplication
+from vtkmodules.vtkCommonCore import vtkObjectBase
+
+from orbital_fw import SolarSystemApp
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+TRACEBACK_FRAMES = 25
+LEAK_BYTES = 4096  # per run of an operation
+FRAME_TIMEOUT = 10.0  # seconds to wait for the compute worker
+
+
+def subsystem(traceback):
+    """Module of the innermost frame in this project, or 'other'"""
+    for frame in reversed(traceback):
+        if os.path.dirname(os.path.abspath(frame.filename)) == PROJECT_DIR:
+            return os.path.splitext(os.path.basename(frame.filename))[0]
+    return 'other'
+
+
+def python_bytes(snapshot):
+    """Traced bytes per subsystem"""
+    sizes = Counter()
+    for stat in snapshot.statistics('traceback'):
+        sizes[subsystem(stat.traceback)] += stat.size
+    return sizes
+
+
+def vtk_object_counts(renderer=None):
+    """Live VTK objects by class name, each counted once"""
+    found = {}
+
+    def add(obj):
+        if obj is not None and isinstance(obj, vtkObjectBase):
+            found.setdefault(obj.__this__, obj)
+
+    for obj in gc.get_objects():
+        if isinstance(obj, vtkObjectBase):
+            add(obj)
+    if renderer is not None:
+        props = renderer.GetViewProps()
+        props.InitTraversal()
+        for _ in range(props.GetNumberOfItems()):
+            prop = props.GetNextProp()
+            add(prop)
+            for getter in ('GetMapper', 'GetProperty', 'GetTexture', 'GetTextProperty'):
+                if hasattr(prop, getter):
+                    add(getattr(prop, getter)())
+            # the upstream pipeline: each algorithm and the data it feeds on
+            algorithm = prop.GetMapper() if hasattr(prop, 'GetMapper') else None
+            while algorithm is not None and algorithm.GetNumberOfInputPorts() \
+                    and algorithm.GetNumberOfInputConnections(0):
+                add(algorithm.GetInputDataObject(0, 0))
+                algorithm = algorithm.GetInputAlgorithm()
+                add(algorithm)
+    return Counter(obj.GetClassName() for obj in found.values())
+
+
+class Sample:
+    __slots__ = ('label', 'time', 'traced', 'peak', 'python', 'vtk')
+
+    def __init__(self, label, renderer=None):
+        gc.collect()
+        self.label = label
+        self.time = time.perf_counter()
+        self.traced, self.peak = tracemalloc.get_traced_memory()
+        self.python = python_bytes(tracemalloc.take_snapshot())
+        self.vtk = vtk_object_counts(renderer)
+
+
+def growth(before, after):
+    """Per-key differences, without the zero ones"""
+    return {key: after.get(key, 0) - before.get(key, 0) for key in set(before) | set(after)
+            if after.get(key, 0) != before.get(key, 0)}
+
+
+class LeakProfiler:
+    """Samples of Python and VTK memory, and growth over repeated operations"""
+
+    def __init__(self, renderer=None, frames=TRACEBACK_FRAMES):
+        self.renderer = renderer
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.samples = []
+
+    def sample(self, label=''):
+        sample = Sample(label, self.renderer)
+        self.samples.append(sample)
+        return sample
+
+    def repeat(self, operation, times, label=''):
+        """Growth per run of operation, after one warm-up run"""
+        operation()
+        before = self.sample(f"{label} before")
+        tracemalloc.reset_peak()
+        for _ in range(times):
+            operation()
+        after = self.sample(f"{label} after")
+        python = growth(before.python, after.python)
+        vtk = growth(before.vtk, after.vtk)
+        per_run = (after.traced - before.traced) / times
+        return {
+            'operation': label,
+            'times': times,
+            'bytes_per_run': per_run,
+            # peak above the starting point: memory allocated and freed within the runs
+            'churn_bytes': after.peak - before.traced,
+            'python': python,
+            'vtk': vtk,
+            'leaks': per_run > LEAK_BYTES or any(count >= times for count in vtk.values()),
+        }
+
+
+def wait_for_frame(app, timeout=FRAME_TIMEOUT):
+    """Run the event loop until the compute worker publishes a frame"""
+    loop = QEventLoop()
+    app.compute_worker.frame_ready.connect(loop.quit)
+    QTimer.singleShot(int(timeout * 1000), loop.quit)
+    loop.exec_()
+    app.compute_worker.frame_ready.disconnect(loop.quit)
+
+
+def operations(app):
+    """The app's rebuild paths, each as a function of no arguments"""
+    names = [name for name in app.bodies.names if name != 'Sun']
+    cycle = {'body': 0, 'day': 0}
+
+    def orbits():
+        with app.compute_worker.buffers.lock:
+            paths = app.compute_worker.buffers.front.orbits.copy()
+        app.remove_orbit_paths()
+        app.create_orbit_paths(paths)
+
+    def physics():
+        app.g_spin.setValue(1.1 if app.g_spin.value() == 1.0 else 1.0)
+        app.apply_physics_changes()
+        wait_for_frame(app)
+
+    def sun_mass():
+        app.mass_spin.setValue(1.05 if app.mass_spin.value() == 1.0 else 1.0)
+        wait_for_frame(app)
+
+    def trails():
+        app.on_trail_length_change(app.trail_spin.value())
+
+    def slider():
+        cycle['day'] = (cycle['day'] + 1) % 2
+        app.slider.setValue(app.slider.value() + (1 if cycle['day'] else -1))
+        wait_for_frame(app)
+
+    def select():
+        cycle['body'] = (cycle['body'] + 1) % len(names)
+        app.display_planet_info(names[cycle['body']])
+
+    def labels():
+        app.show_labels_checkbox.toggle()
+
+    return {'orbits': orbits, 'physics': physics, 'sun_mass': sun_mass, 'trails': trails,
+            'slider': slider, 'select': select, 'labels': labels}
+
+
+def print_growth(result):
+    status = "LEAK" if result['leaks'] else "ok"
+    print(f"{result['operation']:>10} x{result['times']}: {status:4}  "
+          f"{result['bytes_per_run'] / 1024:8.1f} KiB per run, churn {result['churn_bytes'] / 1024:8.1f} KiB")
+    for name, size in sorted(result['python'].items(), key=lambda item: -abs(item[1]))[:5]:
+        print(f"{'':>14}{name:>20}: {size / 1024:+10.1f} KiB")
+    for name, count in sorted(result['vtk'].items(), key=lambda item: -abs(item[1]))[:5]:
+        print(f"{'':>14}{name:>20}: {count:+6d} objects")
+
+
+def print_sample(first, sample):
+    print(f"[{sample.time - first.time:7.0f} s] traced {sample.traced / 2 ** 20:.1f} MiB "
+          f"({(sample.traced - first.traced) / 1024:+.1f} KiB), "
+          f"{sum(sample.vtk.values())} VTK objects ({sum(sample.vtk.values()) - sum(first.vtk.values()):+d})")
+    for name, size in sorted(growth(first.python, sample.python).items(), key=lambda item: -abs(item[1]))[:3]:
+        print(f"{'':>12}{name:>20}: {size / 1024:+10.1f} KiB")
+    for name, count in sorted(growth(first.vtk, sample.vtk).items(), key=lambda item: -abs(item[1]))[:3]:
+        print(f"{'':>12}{name:>20}: {count:+6d} objects")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Track Python memory and live VTK objects of the app")
+    sub = parser.add_subparsers(dest='command', required=True)
+    repeat = sub.add_parser('repeat', help="run rebuild paths repeatedly and report growth")
+    repeat.add_argument("--times", type=int, default=50)
+    repeat.add_argument("--operations", help="comma-separated subset of the operations")
+    repeat.add_argument("--headless", action="store_true", help="no window, render offscreen")
+    watch = sub.add_parser('watch', help="sample the running app periodically")
+    watch.add_argument("--interval", type=float, default=10.0, help="seconds between samples")
+    args = parser.parse_args()
+
+    headless = args.command == 'repeat' and args.headless
+    if headless:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    # start tracing before the app exists so its allocations are attributed
+    tracemalloc.start(TRACEBACK_FRAMES)
+    qt_app = QApplication(sys.argv[:1])
+    window = SolarSystemApp()
+    if headless:
+        window.render_window.SetOffScreenRendering(1)
+    window.resize(1200, 800)
+    profiler = LeakProfiler(window.renderer)
+    status = {'code': 0}
+
+    if args.command == 'watch':
+        timer = QTimer()
+
+        def tick():
+            print_sample(profiler.samples[0], profiler.sample())
+
+        def start():
+            profiler.sample('start')
+            timer.timeout.connect(tick)
+            timer.start(int(args.interval * 1000))
+
+        window.deferred_steps.append(start)
+        window.show()
+        sys.exit(qt_app.exec_())
+
+    def run():
+        available = operations(window)
+        wanted = args.operations.split(',') if args.operations else list(available)
+        for name in wanted:
+            result = profiler.repeat(available[name], args.times, name)
+            print_growth(result)
+            if result['leaks']:
+                status['code'] = 1
+        window.close()
+        qt_app.quit()
+
+    window.deferred_steps.append(run)
+    window.show()
+    qt_app.exec_()
+    sys.exit(status['code'])
+
+
+if __name__ == '__main__':
+    main()
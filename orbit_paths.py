@@ -0,0 +1,76 @@
+"""All orbit paths as one polydata shared zero-copy with VTK."""
+import numpy as np
+from vtkmodules.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkCellArray, vtkDataSetAttributes, vtkPolyData
+
+
+class OrbitPaths:
+    """One polyline per body, packed into a single vtkPolyData.
+
+    `points` is the vtkPoints storage itself, shaped (bodies, points per
+    orbit, 3) in display units; the connectivity is fixed, so orbit i is cell
+    i and owns rows i of every array. Paths are stored relative to the parent
+    and satellites are shifted onto their parent with one array write per
+    frame. Per-orbit RGBA colors are the cell scalars, and hidden orbits are
+    flagged HIDDENCELL in the cell ghost array, which the mapper skips, so
+    any number of orbits is drawn by one actor in one draw call.
+    """
+
+    def __init__(self, parents, colors, points_per_orbit, scale=1.0, opacity=0.5):
+        self.parents = np.array(parents, dtype=np.intp)
+        self.count = len(self.parents)
+        self.scale = scale
+        self.children = np.flatnonzero(self.parents >= 0)
+
+        self.relative = np.zeros((self.count, points_per_orbit, 3))
+        self.points = np.zeros((self.count, points_per_orbit, 3))
+        self._connectivity = np.arange(self.count * points_per_orbit, dtype=np.int64)
+        self._offsets = np.arange(self.count + 1, dtype=np.int64) * points_per_orbit
+        self.colors = np.zeros((self.count, 4), dtype=np.uint8)
+        self.colors[:, :3] = np.clip(np.round(np.asarray(colors) * 255), 0, 255)
+        self.colors[:, 3] = round(opacity * 255)
+        self.hidden = np.zeros(self.count, dtype=np.uint8)
+
+        self._vtk_points = vtkPoints()
+        self._vtk_points.SetData(numpy_to_vtk(self.points.reshape(-1, 3), deep=False))
+        self._cells = vtkCellArray()
+        self._cells.SetData(numpy_to_vtkIdTypeArray(self._offsets, deep=False),
+                            numpy_to_vtkIdTypeArray(self._connectivity, deep=False))
+        self._vtk_colors = numpy_to_vtk(self.colors, deep=False)
+        self._vtk_colors.SetName("OrbitColors")
+        self._vtk_hidden = numpy_to_vtk(self.hidden, deep=False)
+        self._vtk_hidden.SetName(vtkDataSetAttributes.GhostArrayName())
+
+        self.polydata = vtkPolyData()
+        self.polydata.SetPoints(self._vtk_points)
+        self.polydata.SetLines(self._cells)
+        self.polydata.GetCellData().SetScalars(self._vtk_colors)
+        self.polydata.GetCellData().AddArray(self._vtk_hidden)
+
+    def set_orbits(self, orbits, positions):
+        """Take new paths (bodies, points per orbit, 3) in meters relative to the parents"""
+        np.divide(orbits, self.scale, out=self.relative)
+        self.points[...] = self.relative
+        self.follow(positions)
+
+    def follow(self, positions):
+        """Move satellite orbits onto their parents' positions (bodies, 3) in meters"""
+        children = self.children
+        if len(children):
+            offset = np.asarray(positions)[self.parents[children]] / self.scale
+            self.points[children] = self.relative[children] + offset[:, None, :]
+        self._vtk_points.GetData().Modified()
+        self._vtk_points.Modified()
+
+    def set_visible(self, body_ids, visible):
+        self.hidden[body_ids] = 0 if visible else vtkDataSetAttributes.HIDDENCELL
+        self._vtk_hidden.Modified()
+        self.polydata.Modified()
+
+    def set_color(self, body_ids, color, opacity=None):
+        """RGB in 0..1 for the given orbits, and optionally their opacity"""
+        self.colors[body_ids, :3] = np.clip(np.round(np.asarray(color) * 255), 0, 255)
+        if opacity is not None:
+            self.colors[body_ids, 3] = round(opacity * 255)
+        self._vtk_colors.Modified()
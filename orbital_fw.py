@@ -1,33 +1,116 @@
-import vtk
+import time
+
+_START_TIME = time.perf_counter()
+
 import numpy as np
-import math
 from datetime import datetime, timedelta
 import os
-from PyQt5.QtWidgets import QApplication, QMainWindow, QSlider, QWidget, QVBoxLayout, QLabel, QPushButton, QHBoxLayout, QComboBox, QTextEdit, QGroupBox, QFormLayout, QDoubleSpinBox, QCheckBox, QGridLayout
+import glob
+# Only the VTK modules the app uses; `import vtk` would load all of them
+from vtkmodules.vtkFiltersCore import vtkGlyph3D
+from vtkmodules.vtkFiltersSources import vtkArrowSource
+from vtkmodules.vtkInteractionStyle import vtkInteractorStyleTrackballCamera
+from vtkmodules.vtkRenderingCore import vtkActor, vtkPolyDataMapper, vtkRenderer
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401 (render window backend)
+from PyQt5.QtWidgets import QApplication, QMainWindow, QSlider, QWidget, QVBoxLayout, QLabel, QPushButton, QHBoxLayout, QComboBox, QTextEdit, QGroupBox, QDoubleSpinBox, QSpinBox, QCheckBox, QGridLayout, QStyle, QStyleOptionSlider, QToolTip, QFileDialog
 from PyQt5.QtCore import Qt, QDate, QTimer
+from PyQt5.QtGui import QColor, QCursor, QPainter
 from vtkmodules.qt.QVTKRenderWindowInteractor import QVTKRenderWindowInteractor
 import sys
 
-class SolarSystemApp(QMainWindow):
+import ephemeris
+import propagator
+from chebyshev import ChebyshevEphemeris, DEFAULT_FILE as CHEBYSHEV_FILE
+from spk import SPKKernel
+from integrator import IntegratedEphemeris
+from compute_worker import ComputeWorker, EventSearch, EventWorker, FrameRequest
+from trails import TrailBuffer
+from scene import SolarSystemScene
+from body_registry import BodyRegistry, FLOAT_COLUMNS
+from checkpoint import Checkpoint, DEFAULT_FILE as CHECKPOINT_FILE
+from gravity_field import GravityField
+import events
+from picking import ScreenIndex
+from encounters import EncounterDetector, describe as describe_encounter
+
+EVENT_COLORS = {
+    'conjunction': QColor(255, 200, 60),
+    'opposition': QColor(255, 90, 60),
+    'closest approach': QColor(90, 180, 255),
+    'eclipse': QColor(200, 110, 255),
+    'transit': QColor(110, 230, 130),
+}
+
+
+class EventSlider(QSlider):
+    """Horizontal slider with a tick below the groove for every event day"""
+
+    def __init__(self, orientation, parent=None):
+        super().__init__(orientation, parent)
+        self.event_days = []
+        self.event_kinds = []
+        # room for the ticks below the groove
+        self.setMinimumHeight(self.sizeHint().height() + 6)
+
+    def set_events(self, days, kinds):
+        self.event_days = list(days)
+        self.event_kinds = list(kinds)
+        self.update()
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.event_days:
+            return
+        option = QStyleOptionSlider()
+        self.initStyleOption(option)
+        groove = self.style().subControlRect(QStyle.CC_Slider, option, QStyle.SC_SliderGroove, self)
+        handle = self.style().subControlRect(QStyle.CC_Slider, option, QStyle.SC_SliderHandle, self)
+        # the handle center travels over the groove minus one handle width
+        left = groove.left() + handle.width() / 2
+        span = groove.width() - handle.width()
+        scale = span / max(self.maximum() - self.minimum(), 1)
+
+        painter = QPainter(self)
+        bottom = self.height() - 1
+        for day, kind in zip(self.event_days, self.event_kinds):
+            if self.minimum() <= day <= self.maximum():
+                x = int(round(left + (day - self.minimum()) * scale))
+                color = next((c for base, c in EVENT_COLORS.items() if kind.endswith(base)), QColor(200, 200, 200))
+                painter.setPen(color)
+                painter.drawLine(x, bottom - 4, x, bottom)
+        painter.end()
+
+
+class SolarSystemApp(QMainWindow, SolarSystemScene):
     def __init__(self, parent=None):
         super().__init__(parent)
         
-        self.AU = 149.6e9  # in meters
+        self.AU = ephemeris.AU  # in meters
         self.G = 6.67430e-11  # Gravitational constant
         self.G_multiplier = 1.0
         self.ecc_multiplier = 1.0
         self.inc_multiplier = 1.0
         self.scale_factor = 1e10
         self.sun_mass_scale = 1.0
-        self.bodies = {}
+        self.bodies = BodyRegistry()
+        # multipliers last applied with "Apply Physics Changes"
+        self.physics = dict(ephemeris.DEFAULT_PHYSICS)
+        self.gravity_field = None
+        self.gravity_field_actor = None
+        # screen-space index for picking, rebuilt when the frame or the view changed
+        self.pick_index = ScreenIndex()
+        self.pick_stamp = None
+        self.frame_serial = 0
+        self.press_position = None
+        self.hovered_body = None
         
-        # Store original orbit
-        self.original_orbital_elements = {}
         self.current_date = datetime.now()
         self.day_number = self.calculate_day_number(self.current_date)
         
 
         self.selected_planet = "Sun"
+        # planet whose details are shown in the info panel
+        self.info_planet = None
         
         # 
         self.setup_ui()
@@ -35,13 +118,63 @@ class SolarSystemApp(QMainWindow):
         self.setup_vtk()
         
         self.initialize_planets()
-        self.update_orbital_elements()
-        self.store_original_orbital_elements()
-        self.calculate_planet_positions()
-        self.create_orbit_paths()
-        self.add_labels()
-        #self.add_gravity_field_glyphs()
+        self.off_table = set()
+        self.table_bodies = []
+        self.trajectories = self.add_tabulated_bodies()
+        bodies = self.bodies
+        self.encounter_detector = EncounterDetector(bodies.names, bodies.parent, bodies.mass, bodies.radius,
+                                                    sun=bodies.ids["Sun"])
+        self.encounter_bodies = set()
+
+        # heavy work runs on the compute worker; the first frame is computed inline
+        self.compute_worker = ComputeWorker(self.bodies.names, self.bodies.parent_names(), self)
+        self.compute_worker.frame_ready.connect(self.on_frame_ready)
+        # event searches run on their own thread so frames keep coming meanwhile
+        self.event_worker = EventWorker(self)
+        self.event_worker.events_ready.connect(self.on_events_ready)
+        self.event_search_start = None
+        self.load_spk_kernels()
+        self.load_chebyshev_ephemeris()
+        # local tables take precedence over every other source
+        for trajectory in self.trajectories:
+            self.compute_worker.add_source(trajectory, first=True)
+        self.integration = None
+        self.applied_orbit_version = 0
+        self.orbit_paths = None
+        self.orbit_actor = None
+        self.last_trail_day = None
+        self.compute_worker.compute_now(self.frame_request())
+        self.apply_frame()
+
+        # the rest of the scene is built progressively after the first paint
+        self.first_frame_time = None
+        self.deferred_steps = self.deferred_scene_steps()
+        self.first_render_observer = self.render_window.AddObserver('EndEvent', self.on_first_render)
+
+    def deferred_scene_steps(self):
+        steps = [self.add_labels, lambda: self.request_frame(orbits=True), self.create_trails,
+                 self.add_stars_background, self.find_events]
+        for body in self.bodies:
+            steps.append(lambda body=body: self.load_body_texture(body))
+        return steps
+
+    def on_first_render(self, caller, event):
+        caller.RemoveObserver(self.first_render_observer)
+        self.first_frame_time = time.perf_counter() - _START_TIME
+        print(f"First frame after {self.first_frame_time * 1000:.0f} ms")
+        QTimer.singleShot(0, self.run_deferred_step)
+
+    def run_deferred_step(self):
+        """Build one piece of the remaining scene per event loop turn"""
+        if not self.deferred_steps:
+            elapsed = time.perf_counter() - _START_TIME
+            print(f"Scene complete after {elapsed * 1000:.0f} ms")
+            return
+
+        step = self.deferred_steps.pop(0)
+        step()
         self.vtk_widget.GetRenderWindow().Render()
+        QTimer.singleShot(0, self.run_deferred_step)
     
     def setup_ui(self):
       self.setWindowTitle("Solar System_Yuseong_Choi")
@@ -57,7 +190,7 @@ class SolarSystemApp(QMainWindow):
       self.layout.addWidget(self.date_label)
       
       # Time 
-      self.slider = QSlider(Qt.Horizontal)
+      self.slider = EventSlider(Qt.Horizontal)
       today_days = self.compute_initial_days()
       self.slider.setMinimum(today_days)
       self.slider.setMaximum(today_days + 10000)
@@ -146,6 +279,27 @@ class SolarSystemApp(QMainWindow):
       self.show_labels_checkbox.setChecked(True) 
       self.show_labels_checkbox.stateChanged.connect(self.toggle_label_visibility)
       display_layout.addWidget(self.show_labels_checkbox, 0, 2)
+
+      # Motion trails
+      self.show_trails_checkbox = QCheckBox("Motion Trails")
+      self.show_trails_checkbox.setChecked(True)
+      self.show_trails_checkbox.stateChanged.connect(self.toggle_trail_visibility)
+      display_layout.addWidget(self.show_trails_checkbox, 0, 3)
+
+      # Gravity field arrows, built on first use
+      self.show_gravity_checkbox = QCheckBox("Gravity Field")
+      self.show_gravity_checkbox.setChecked(False)
+      self.show_gravity_checkbox.stateChanged.connect(self.toggle_gravity_field)
+      display_layout.addWidget(self.show_gravity_checkbox, 1, 2)
+
+      display_layout.addWidget(QLabel("Trail Length:"), 1, 0)
+      self.trail_spin = QSpinBox()
+      self.trail_spin.setRange(10, 5000)
+      self.trail_spin.setValue(365)
+      self.trail_spin.setSingleStep(10)
+      self.trail_spin.setSuffix(" frames")
+      self.trail_spin.valueChanged.connect(self.on_trail_length_change)
+      display_layout.addWidget(self.trail_spin, 1, 1)
       
       display_box.setLayout(display_layout)
       self.layout.addWidget(display_box)
@@ -176,40 +330,195 @@ class SolarSystemApp(QMainWindow):
 
         self.sun_mass_scale = value
         self.update_sun_size()
-        self.calculate_planet_positions()
+        self.update_gravity_physics()
+        self.event_timer.start()
 
         # Rebuild orbit paths new semi‑major axes
-        self.remove_orbit_paths()
-        self.create_orbit_paths()
+        self.request_frame(orbits=True)
 
         self.vtk_widget.GetRenderWindow().Render()
     
-    def update_sun_size(self):
-        if "Sun" in self.bodies:
-            sun = self.bodies["Sun"]
-            original_scale = 3.0
-            
-            new_scale = original_scale * (self.sun_mass_scale ** 0.33)
-            if sun['actor']:
-                sun['actor'].SetScale(new_scale / original_scale)
-
-                if 'axis_actor' in sun:
-                    axis = sun['axis_actor']
-                    if axis:
-                        axis.SetScale(new_scale / original_scale)
-    
+    def update_gravity_physics(self):
+        """Rescale the gravity field masses; it is recomputed with the next frame"""
+        if self.gravity_field is not None:
+            self.gravity_field.set_physics(self.sun_mass_scale, self.physics['G_multiplier'],
+                                           self.bodies.ids['Sun'])
+
     def on_slider_change(self, days):
         new_date = datetime(2000, 1, 1) + timedelta(days=days)
         self.date_label.setText(f"Date: {new_date:%Y-%m-%d}")
         self.current_date = new_date
         self.day_number = self.calculate_day_number(new_date)
-        self.update_orbital_elements()
-        self.calculate_planet_positions()
-        
-        if self.selected_planet and self.selected_planet != "Sun":
+        self.event_label.setText("")
+        self.request_frame()
+
+    def frame_request(self, orbits=False):
+        physics = dict(self.physics, sun_mass_scale=self.sun_mass_scale)
+        interpolate = self.animation_active and self.interpolate_checkbox.isChecked()
+        return FrameRequest(self.day_number, physics, orbits, interpolate)
+
+    def request_frame(self, orbits=False):
+        """Hand the next frame to the compute worker without waiting for it"""
+        self.compute_worker.request(self.frame_request(orbits))
+
+    def on_frame_ready(self, request):
+        orbits_rebuilt = self.apply_frame()
+
+        if orbits_rebuilt and self.info_planet:
+            # refresh the info panel but keep the current view
+            camera = self.renderer.GetActiveCamera()
+            old_position = camera.GetPosition()
+            old_focal_point = camera.GetFocalPoint()
+            self.display_planet_info(self.info_planet)
+            camera.SetPosition(old_position)
+            camera.SetFocalPoint(old_focal_point)
+        elif self.selected_planet and self.selected_planet != "Sun":
             self.focus_camera_on_planet(self.selected_planet)
-        
+
         self.vtk_widget.GetRenderWindow().Render()
+
+    def apply_frame(self):
+        """Copy the front buffer into the scene, returns True if orbits were rebuilt"""
+        buffers = self.compute_worker.buffers
+        orbits = None
+        with buffers.lock:
+            front = buffers.front
+            day = front.day
+            self.bodies.elements[...] = front.elements
+            self.bodies.position[...] = front.positions
+            self.bodies.velocity[...] = front.velocities
+            if front.orbit_version != self.applied_orbit_version:
+                self.applied_orbit_version = front.orbit_version
+                orbits = front.orbits.copy()
+
+        for body in self.bodies:
+            self.update_actor_position(body)
+        self.frame_serial += 1
+        self.update_table_visibility(day)
+        self.update_trails(day)
+        self.check_encounters(day)
+        if self.gravity_field_actor is not None and self.gravity_field_actor.GetVisibility():
+            self.gravity_field.update(self.bodies.position)
+
+        if orbits is not None:
+            self.create_orbit_paths(orbits)
+        elif self.orbit_paths is not None:
+            # satellite orbits follow their parent
+            self.orbit_paths.follow(self.bodies.position)
+
+        return orbits is not None
+
+    def check_encounters(self, day):
+        """Report encounters that began or ended, and tint the labels of the bodies involved"""
+        detector = self.encounter_detector
+        detector.set_physics(self.sun_mass_scale)
+        true_positions = self.compute_worker.tree.true_positions(self.bodies.position)
+        began, _ = detector.step(day, true_positions)
+        if len(began):
+            self.event_label.setText(describe_encounter(began[-1]))
+
+        involved = detector.bodies_in_encounter()
+        if involved != self.encounter_bodies:
+            self.encounter_bodies = involved
+            for body in self.bodies:
+                if body.label is not None:
+                    color = (1.0, 0.35, 0.35) if body.id in involved else (1.0, 1.0, 1.0)
+                    body.label.GetTextProperty().SetColor(color)
+
+    def load_spk_kernels(self):
+        """Use JPL kernels (*.bsp) in the working directory; they take precedence"""
+        self.spk_kernels = []
+        for path in sorted(glob.glob("*.bsp")):
+            try:
+                kernel = SPKKernel(path)
+            except (OSError, ValueError) as e:
+                print(f"Could not load {path}: {e}")
+                continue
+            self.spk_kernels.append(kernel)
+            self.compute_worker.add_source(kernel)
+            print(f"Loaded {path}: {len(kernel.segments)} NAIF bodies")
+
+    def add_tabulated_bodies(self):
+        trajectories = super().add_tabulated_bodies()
+        for body_id, _ in self.table_bodies:
+            self.planet_combo.addItem(self.bodies.names[body_id])
+        return trajectories
+
+    def update_table_visibility(self, day):
+        """Hide bodies known only from their tables where the tables do not cover the frame"""
+        physics = dict(self.physics, sun_mass_scale=self.sun_mass_scale)
+        bodies = self.bodies
+        for body_id, trajectory in self.table_bodies:
+            shown = trajectory.covers(day, physics)
+            if shown:
+                self.off_table.discard(body_id)
+            else:
+                self.off_table.add(body_id)
+            self.encounter_detector.absent[body_id] = not shown
+            bodies.actor[body_id].SetVisibility(shown)
+            bodies.axis_actor[body_id].SetVisibility(shown)
+            label = bodies.label[body_id]
+            if label is not None:
+                label.SetVisibility(shown and self.show_labels_checkbox.isChecked())
+            trail_actor = bodies.trail_actor[body_id]
+            if trail_actor is not None:
+                trail_actor.SetVisibility(shown and self.show_trails_checkbox.isChecked())
+            # a change of the hidden flags rebuilds the mapper's index buffer, so only write changes
+            if self.orbit_paths is not None and bool(self.orbit_paths.hidden[body_id]) == shown:
+                self.orbit_paths.set_visible(body_id, shown)
+
+    def load_chebyshev_ephemeris(self):
+        """Use precomputed segments (python chebyshev.py) if they are present"""
+        if not os.path.exists(CHEBYSHEV_FILE):
+            return
+        try:
+            table = ChebyshevEphemeris.load(CHEBYSHEV_FILE)
+        except (OSError, ValueError) as e:
+            print(f"Could not load {CHEBYSHEV_FILE}: {e}")
+            return
+        self.compute_worker.add_source(table)
+        print(f"Loaded {CHEBYSHEV_FILE}: {len(table.names)} bodies, "
+              f"days {table.start:.0f} to {table.stop:.0f}")
+
+    def load_integration(self, path):
+        """Show an integrator.py run: its physics, its date range on the slider and its orbits"""
+        try:
+            run = IntegratedEphemeris.load(path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Could not load {path}: {e}")
+            return
+        self.integration = run
+        self.compute_worker.add_source(run, first=True)
+
+        physics = run.physics
+        for spin, key in ((self.mass_spin, 'sun_mass_scale'), (self.g_spin, 'G_multiplier'),
+                          (self.ecc_spin, 'ecc_multiplier'), (self.inc_spin, 'inc_multiplier')):
+            spin.blockSignals(True)
+            spin.setValue(physics[key])
+            spin.blockSignals(False)
+        # exactly the run's values, which the spin boxes may round
+        self.sun_mass_scale = physics['sun_mass_scale']
+        self.G_multiplier = physics['G_multiplier']
+        self.ecc_multiplier = physics['ecc_multiplier']
+        self.inc_multiplier = physics['inc_multiplier']
+
+        # the event search uses the analytic model, which the run departs from
+        self.event_worker.cancel()
+        self.event_index = None
+        self.slider.set_events([], [])
+        self.slider.blockSignals(True)
+        self.slider.setRange(int(np.ceil(run.start)), int(np.floor(run.stop)))
+        self.slider.blockSignals(False)
+        self.on_slider_change(self.slider.value())
+        self.apply_physics_changes()
+        print(f"Loaded {path}: {len(run.names)} bodies over {(run.stop - run.start) / 365.25:,.0f} years")
+
+    def closeEvent(self, event):
+        self.compute_worker.shutdown()
+        self.event_worker.shutdown()
+        for kernel in self.spk_kernels:
+            kernel.close()
+        super().closeEvent(event)
     
     def calculate_day_number(self, date):
         jan_2000 = datetime(2000, 1, 1)
@@ -218,219 +527,96 @@ class SolarSystemApp(QMainWindow):
     
     def setup_vtk(self):
 
-        self.renderer = vtk.vtkRenderer()
+        self.renderer = vtkRenderer()
         self.renderer.SetBackground(0.0, 0.0, 0.0)
         self.render_window = self.vtk_widget.GetRenderWindow()
         self.render_window.AddRenderer(self.renderer)
         self.interactor = self.vtk_widget
-        style = vtk.vtkInteractorStyleTrackballCamera()
+        style = vtkInteractorStyleTrackballCamera()
         self.interactor.SetInteractorStyle(style)
-        
-        self.add_stars_background()
-        
-        # Add light for sun
-        self.sun_light = vtk.vtkLight()
-        self.sun_light.SetPosition(0, 0, 0)
-        self.sun_light.SetColor(1.0, 1.0, 1.0)
-        self.sun_light.SetIntensity(3.0)
-        self.renderer.AddLight(self.sun_light)
-        ambient_light = vtk.vtkLight()
-        ambient_light.SetColor(1.0, 1.0, 1.0)
-        ambient_light.SetIntensity(0.8)
-        ambient_light.SetPositional(False)
-        self.renderer.AddLight(ambient_light)
-
-        headlight = vtk.vtkLight()
-        headlight.SetLightTypeToHeadlight()
-        headlight.SetIntensity(0.6)
-        headlight.SetColor(1.0, 1.0, 1.0)
-        self.renderer.AddLight(headlight)
-
-        camera = self.renderer.GetActiveCamera()
-        camera.SetPosition(40, -60, 40)
-        camera.SetFocalPoint(0, 0, 0)
-        camera.SetViewUp(0, 0, 1)
-        camera.Azimuth(30)
-        camera.Elevation(20)
+        # observers only; the style still rotates and zooms as before
+        self.interactor.AddObserver('LeftButtonPressEvent', self.on_left_press)
+        self.interactor.AddObserver('LeftButtonReleaseEvent', self.on_left_release)
+        self.interactor.AddObserver('MouseMoveEvent', self.on_mouse_move)
+        self.add_lights()
+        self.set_default_view()
         self.renderer.ResetCameraClippingRange()
         self.vtk_widget.Initialize()
-    
-    
-    def add_stars_background(self):
-        try:
-            stars_reader = vtk.vtkJPEGReader()
-            stars_reader.SetFileName("background_stars.jpg")
-            stars_reader.Update()
-
-            sphere = vtk.vtkSphereSource()
-            sphere.SetThetaResolution(32)
-            sphere.SetPhiResolution(32)
-            sphere.SetRadius(5000)
-            sphere.Update()
-            
-            sphere_texture = vtk.vtkTextureMapToSphere()
-            sphere_texture.SetInputConnection(sphere.GetOutputPort())
-            sphere_texture.PreventSeamOn()
-            
-            #map
-            sphere_mapper = vtk.vtkPolyDataMapper()
-            sphere_mapper.SetInputConnection(sphere_texture.GetOutputPort())
-            #actor
-            sphere_actor = vtk.vtkActor()
-            sphere_actor.SetMapper(sphere_mapper)
-            # texture
-            texture = vtk.vtkTexture()
-            texture.SetInputConnection(stars_reader.GetOutputPort())
-            texture.InterpolateOn()
-            sphere_actor.SetTexture(texture)
-
-            sphere_actor.GetProperty().SetOpacity(1.0)
-            sphere_actor.GetProperty().SetAmbient(1.0)
-            sphere_actor.GetProperty().BackfaceCullingOff()
-            sphere_actor.GetProperty().FrontfaceCullingOn()
-            
-            # Add to renderer
-            self.renderer.AddActor(sphere_actor)
-            print("Stars background added")
-        except Exception as e:
-            print(f"Error stars background: {e}")
-    
-    def initialize_planets(self):
-      self.add_celestial_body(
-          name="Sun",
-          mass=1.989e30,
-          radius=696340000,
-          color=(1.0, 1.0, 0.7),
-          visual_scale=3.0,
-          texture_path="sun_texture.jpg",
-          rotation_period=609.6,  #  ~25.4 day
-          axial_tilt=7.25
-      )
-      
-      # Mercury
-      self.add_celestial_body(
-          name="Mercury",
-          mass=0.330e24,
-          radius=4879000/2,
-          color=(0.8, 0.8, 0.8),
-          visual_scale=3.0,
-          texture_path="mercury_texture.jpg",
-          rotation_period=1407.6,
-          axial_tilt=0.03
-      )
-      
-      # Venus
-      self.add_celestial_body(
-          name="Venus",
-          mass=4.87e24,
-          radius=12104000/2,
-          color=(0.9, 0.8, 0.6),
-          visual_scale=3.0,
-          texture_path="venus_texture.jpg",
-          rotation_period=-5832.5,
-          axial_tilt=2.64
-      )
-      
-      # Earth
-      self.add_celestial_body(
-          name="Earth",
-          mass=5.97e24,
-          radius=12756000/2,
-          color=(0.2, 0.4, 0.8),
-          visual_scale=3.0,
-          texture_path="earth_texture.jpg",
-          rotation_period=23.9,
-          axial_tilt=23.44
-      )
-      
-      self.add_celestial_body(
-        name="Moon",
-        mass=7.34767309e22,
-        radius=3476000/2,
-        color=(0.8, 0.8, 0.8),
-        visual_scale=3.0,
-        texture_path="moon_texture.jpg",
-        rotation_period=655.7,
-        axial_tilt=6.68,
-        parent_body="Earth"
-    )
-      
-      # Mars
-      self.add_celestial_body(
-          name="Mars",
-          mass=0.642e24,
-          radius=6792000/2,
-          color=(0.9, 0.3, 0.2),
-          visual_scale=3.0,
-          texture_path="mars_texture.jpg",
-          rotation_period=24.6,
-          axial_tilt=25.19
-      )
-      
-      # Jupiter
-      self.add_celestial_body(
-          name="Jupiter",
-          mass=1898e24,  # From fact sheet
-          radius=142984000/2,  # From fact sheet
-          color=(0.9, 0.75, 0.6),
-          visual_scale=3.0,
-          texture_path="jupiter_texture.jpg",
-          rotation_period=9.9,  # Very fast rotation
-          axial_tilt=3.13
-      )
-      
-      # Saturn
-      self.add_celestial_body(
-          name="Saturn",
-          mass=568e24,  # From fact sheet
-          radius=120536000/2,  # From fact sheet
-          color=(0.9, 0.8, 0.6),
-          visual_scale=3.0,
-          texture_path="saturn_texture.jpg",
-          rotation_period=10.7,  # Also fast rotation
-          axial_tilt=26.73
-      )
-      
-      
-      # Uranus
-      self.add_celestial_body(
-          name="Uranus",
-          mass=86.8e24,  # From fact sheet
-          radius=51118000/2,  # From fact sheet
-          color=(0.6, 0.8, 0.9),
-          visual_scale=3.0,
-          texture_path="uranus_texture.jpg",
-          rotation_period=-17.2,  # Negative indicates retrograde rotation
-          axial_tilt=82.23
-      )
-      
-      # Neptune
-      self.add_celestial_body(
-          name="Neptune",
-          mass=102e24,  # From fact sheet
-          radius=49528000/2,  # From fact sheet
-          color=(0.2, 0.3, 0.9),
-          visual_scale=3.0,
-          texture_path="neptune_texture.jpg",
-          rotation_period=16.1,
-          axial_tilt=28.32
-      )
-      
-      # After adding all planets, populate the selection dropdown
-      self.populate_planet_dropdown()
-    
+
     def populate_planet_dropdown(self):
         """Populate the planet selection dropdown"""
         # Clear the dropdown first
         self.planet_combo.clear()
         
         # Add all bodies to the dropdown
-        for name in self.bodies.keys():
+        for name in self.bodies.names:
             self.planet_combo.addItem(name)
             
         # Connect the selection change signal
         self.planet_combo.currentTextChanged.connect(self.display_planet_info)
     
+    def update_pick_index(self):
+        """Project the bodies to the screen, unless nothing moved since the last time"""
+        camera = self.renderer.GetActiveCamera()
+        width, height = self.renderer.GetSize()
+        stamp = (self.frame_serial, camera.GetMTime(), width, height, self.sun_mass_scale)
+        if stamp == self.pick_stamp or width == 0 or height == 0:
+            return
+        self.pick_stamp = stamp
+
+        def to_array(matrix):
+            return np.array([[matrix.GetElement(i, j) for j in range(4)] for i in range(4)])
+
+        aspect = width / height
+        matrix = to_array(camera.GetCompositeProjectionTransformMatrix(aspect, -1, 1))
+        projection = to_array(camera.GetProjectionTransformMatrix(aspect, -1, 1))
+        radii = self.bodies.visual_radius.copy()
+        if "Sun" in self.bodies:
+            # update_sun_size scales the Sun's actor
+            radii[self.bodies.ids["Sun"]] *= self.sun_mass_scale ** 0.33
+        self.pick_index.build(self.bodies.position / self.scale_factor, radii, matrix, projection[1, 1],
+                              width, height)
+
+    def pick_body(self, x, y):
+        """Name of the body drawn at display position (x, y), or None"""
+        self.update_pick_index()
+        body_id = self.pick_index.query(x, y)
+        return None if body_id is None else self.bodies.names[body_id]
+
+    def on_left_press(self, caller, event):
+        self.press_position = caller.GetEventPosition()
+
+    def on_left_release(self, caller, event):
+        """A click that did not drag the camera selects the body under the cursor"""
+        if self.press_position is None:
+            return
+        x, y = caller.GetEventPosition()
+        x0, y0 = self.press_position
+        self.press_position = None
+        if abs(x - x0) > 3 or abs(y - y0) > 3:
+            return
+        name = self.pick_body(x, y)
+        if name is None:
+            return
+        if self.planet_combo.currentText() == name:
+            self.display_planet_info(name)
+        else:
+            # routes through display_planet_info like a selection in the list
+            self.planet_combo.setCurrentText(name)
+
+    def on_mouse_move(self, caller, event):
+        """Name the body under the cursor while no button is held"""
+        if self.press_position is not None:
+            return
+        name = self.pick_body(*caller.GetEventPosition())
+        if name == self.hovered_body:
+            return
+        self.hovered_body = name
+        if name is None:
+            QToolTip.hideText()
+        else:
+            QToolTip.showText(QCursor.pos(), name, self.vtk_widget)
+
     def display_planet_info(self, planet_name):
         """Display detailed information about the selected planet"""
         if not planet_name or planet_name not in self.bodies:
@@ -438,30 +624,30 @@ class SolarSystemApp(QMainWindow):
             return
 
         self.selected_planet = planet_name
+        self.info_planet = planet_name
             
         body = self.bodies[planet_name]
         
         # Format 
         info = f"<h3>{planet_name}</h3>"
         info += f"<b>Physical Properties:</b><br>"
-        info += f"Mass: {body['mass']:.3e} kg<br>"
-        info += f"Radius: {body['radius']:.0f} m<br>"
-        if 'rotation_period' in body:
-            info += f"Rotation Period: {abs(body['rotation_period']):.1f} hours"
-            if body['rotation_period'] < 0:
-                info += " (retrograde)<br>"
-            else:
-                info += "<br>"
-        info += f"Axial Tilt: {body['axial_tilt']:.2f}°<br>"
+        info += f"Mass: {body.mass:.3e} kg<br>"
+        info += f"Radius: {body.radius:.0f} m<br>"
+        info += f"Rotation Period: {abs(body.rotation_period):.1f} hours"
+        if body.rotation_period < 0:
+            info += " (retrograde)<br>"
+        else:
+            info += "<br>"
+        info += f"Axial Tilt: {body.axial_tilt:.2f}°<br>"
 
         if planet_name != "Sun":
             info += f"<br><b>Orbital Elements:</b><br>"
-            info += f"Semi-major Axis (a): {body['a']:.6f} AU<br>"
-            info += f"Eccentricity (e): {body['e']:.6f}<br>"
-            info += f"Inclination (i): {body['i']:.4f}°<br>"
-            info += f"Longitude of Ascending Node (N): {body['N']:.4f}°<br>"
-            info += f"Argument of Perihelion (w): {body['w']:.4f}°<br>"
-            info += f"Mean Anomaly (M): {body['M']:.4f}°<br>"
+            info += f"Semi-major Axis (a): {body.a:.6f} AU<br>"
+            info += f"Eccentricity (e): {body.e:.6f}<br>"
+            info += f"Inclination (i): {body.i:.4f}°<br>"
+            info += f"Longitude of Ascending Node (N): {body.N:.4f}°<br>"
+            info += f"Argument of Perihelion (w): {body.w:.4f}°<br>"
+            info += f"Mean Anomaly (M): {body.M:.4f}°<br>"
             
             # Physics modifier
             info += f"<br><b>Physics Modifiers:</b><br>"
@@ -472,20 +658,31 @@ class SolarSystemApp(QMainWindow):
             
             # Position calculation 
             info += f"<br><b>Position Calculation:</b><br>"
-            info += "1. Calculate Eccentric Anomaly (E) from Mean Anomaly (M)<br>"
+            info += "1. Solve Kepler's equation in the universal anomaly (any conic)<br>"
             info += "2. Calculate coordinates in orbital plane<br>"
             info += "3. Apply 3D rotations (w, i, N)<br>"
+            stats = propagator.stats
+            if stats.solves:
+                info += (f"Solver: {stats.iterations / stats.solves:.2f} iterations on average, "
+                         f"max {stats.max_iterations}, residual {stats.max_residual:.1e}<br>")
             
             # Current 
-            if 'position' in body:
-                pos = body['position']
-                info += f"<br><b>Current Position (m):</b><br>"
-                info += f"X: {pos[0]:.3e}<br>Y: {pos[1]:.3e}<br>Z: {pos[2]:.3e}<br>"
-                
-                # Add scaled position
-                scaled = pos / self.scale_factor
-                info += f"<br><b>Scaled Position (display units):</b><br>"
-                info += f"X: {scaled[0]:.3f}<br>Y: {scaled[1]:.3f}<br>Z: {scaled[2]:.3f}<br>"
+            pos = body.position
+            info += f"<br><b>Current Position (m):</b><br>"
+            info += f"X: {pos[0]:.3e}<br>Y: {pos[1]:.3e}<br>Z: {pos[2]:.3e}<br>"
+            
+            # Add scaled position
+            scaled = pos / self.scale_factor
+            info += f"<br><b>Scaled Position (display units):</b><br>"
+            info += f"X: {scaled[0]:.3f}<br>Y: {scaled[1]:.3f}<br>Z: {scaled[2]:.3f}<br>"
+
+            vel = body.velocity / 1000.0
+            info += f"<br><b>Heliocentric Velocity (km/s):</b><br>"
+            info += f"X: {vel[0]:.3f}<br>Y: {vel[1]:.3f}<br>Z: {vel[2]:.3f}<br>"
+            info += f"Speed: {np.linalg.norm(vel):.3f}<br>"
+            if body.parent_body is not None:
+                rel = vel - self.bodies[body.parent_body].velocity / 1000.0
+                info += f"Speed relative to {body.parent_body}: {np.linalg.norm(rel):.3f}<br>"
  
         self.planet_info.setHtml(info)
         self.focus_camera_on_planet(planet_name)
@@ -496,7 +693,7 @@ class SolarSystemApp(QMainWindow):
             
         body = self.bodies[planet_name]
 
-        scaled_position = body['position'] / self.scale_factor
+        scaled_position = body.position / self.scale_factor
         
         camera = self.renderer.GetActiveCamera()
         
@@ -510,7 +707,7 @@ class SolarSystemApp(QMainWindow):
             distance = np.linalg.norm(pos)
             direction = pos / (distance + 1e-10)
             
-            mercury_semimajor = self.bodies['Mercury']['a'] * self.AU / self.scale_factor
+            mercury_semimajor = self.bodies['Mercury'].a * self.AU / self.scale_factor
             
             camera_distance = mercury_semimajor * 6.0
             
@@ -562,102 +759,6 @@ class SolarSystemApp(QMainWindow):
         
         self.vtk_widget.GetRenderWindow().Render()
     
-    def add_celestial_body(self, name, mass, radius, color, visual_scale=1.0, texture_path=None, rotation_period=24.0, axial_tilt=0.0,parent_body=None):
-
-        body = {
-            'name': name,
-            'mass': mass,
-            'radius': radius,
-            'color': color,
-            'texture_path': texture_path,
-            'rotation_period': rotation_period,  # Add rotat
-            'rotation_angle': 0.0,
-            'axial_tilt': axial_tilt,
-            'parent_body': parent_body,
-            'a': 0.0,  # Semi-major axis (AU)
-            'e': 0.0,  # Eccentricity
-            'i': 0.0,  # Inclination (degrees)
-            'N': 0.0,  # Longitude of ascending node (degrees)
-            'w': 0.0,  # Argument of perihelion (degrees)
-            'M': 0.0,  # Mean anomaly (degrees)
-            'actor': None,
-            'orbit_actor': None
-        }
-        
-        sphere = vtk.vtkSphereSource()
-        
-        visual_radius = 0.3 * math.log10(1 + radius / 1e6) * visual_scale
-        if name == "Moon":
-          visual_radius *= 1.0
-        sphere.SetRadius(visual_radius)
-        sphere.SetThetaResolution(30)
-        sphere.SetPhiResolution(30)
-        sphere.Update()
-        
-        text_map = vtk.vtkTextureMapToSphere()
-        text_map.SetInputConnection(sphere.GetOutputPort())
-        text_map.PreventSeamOn()
-        
-        mapper = vtk.vtkPolyDataMapper()
-        mapper.SetInputConnection(text_map.GetOutputPort())
-        
-        actor = vtk.vtkActor()
-        actor.SetMapper(mapper)
-
-        if texture_path and os.path.exists(texture_path):
-            try:
-                extension = texture_path.split('.')[-1].lower()
-                if extension == 'jpg' or extension == 'jpeg':
-                    reader = vtk.vtkJPEGReader()
-                elif extension == 'png':
-                    reader = vtk.vtkPNGReader()
-                else:
-                    raise ValueError(f"Unsupported texture format: {extension}")
-                
-                reader.SetFileName(texture_path)
-                reader.Update()
-                
-                texture = vtk.vtkTexture()
-                texture.SetInputConnection(reader.GetOutputPort())
-                texture.InterpolateOn()
-                
-                actor.SetTexture(texture)
-                
-                #print(f"Texture applied to {name} successfully")
-            except Exception as e:
-                #print(f"Error loading texture for {name}: {e}. Using color instead.")
-                actor.GetProperty().SetColor(color)
-        else:
-            print(f"Texture file for {name} not found at {texture_path}. Using color.")
-            actor.GetProperty().SetColor(color)
-        
-        actor.GetProperty().SetAmbient(0.3)
-        actor.GetProperty().SetDiffuse(0.8)
-        actor.GetProperty().SetSpecular(0.2)
-        actor.GetProperty().SetSpecularPower(10)
-        self.renderer.AddActor(actor)
-        body['actor'] = actor
-
-        vis = visual_radius
-        axis_mapper = vtk.vtkPolyDataMapper()
-        cyl = vtk.vtkCylinderSource()
-        cyl.SetRadius(vis * 0.02)
-        cyl.SetHeight(vis * 3.0)
-        cyl.SetResolution(12)
-        cyl.Update()
-        axis_mapper.SetInputConnection(cyl.GetOutputPort())
-        axis_actor = vtk.vtkActor()
-        axis_actor.SetMapper(axis_mapper)
-        axis_actor.GetProperty().SetColor(1.0, 0.2, 0.2)
-        axis_actor.GetProperty().SetAmbient(1.0)
-        axis_actor.RotateX(90)
-        self.renderer.AddActor(axis_actor)
-        body['axis_actor'] = axis_actor
-        
-        self.bodies[name] = body
-        
-        print(f"Added {name}")
-        return body
     def setup_time_controls(self):
       time_controls = QHBoxLayout()
       
@@ -673,17 +774,111 @@ class SolarSystemApp(QMainWindow):
       self.speed_combo.currentTextChanged.connect(self.change_speed)
       time_controls.addWidget(self.speed_combo)
       
-      reset_button = QPushButton("Reset")
-      reset_button.clicked.connect(self.reset_time)
-      time_controls.addWidget(reset_button)
+      self.reset_button = QPushButton("Reset")
+      self.reset_button.clicked.connect(self.reset_time)
+      time_controls.addWidget(self.reset_button)
+
+      # interpolate between coarse Kepler solves while playing
+      self.interpolate_checkbox = QCheckBox("Interpolated Playback")
+      self.interpolate_checkbox.setChecked(True)
+      time_controls.addWidget(self.interpolate_checkbox)
+
+      save_state_button = QPushButton("Save State")
+      save_state_button.clicked.connect(lambda: self.save_checkpoint())
+      time_controls.addWidget(save_state_button)
+      load_state_button = QPushButton("Load State")
+      load_state_button.clicked.connect(lambda: self.load_checkpoint())
+      time_controls.addWidget(load_state_button)
       
       self.layout.addLayout(time_controls)
+
+      # events found along the slider window
+      event_controls = QHBoxLayout()
+      event_controls.addWidget(QLabel("Events:"))
+      self.event_kind_combo = QComboBox()
+      self.event_kind_combo.addItems(["All", "Conjunctions", "Oppositions", "Closest Approaches",
+                                      "Eclipses", "Transits"])
+      self.event_kind_combo.currentTextChanged.connect(self.show_events)
+      event_controls.addWidget(self.event_kind_combo)
+
+      self.previous_event_button = QPushButton("◀ Previous Event")
+      self.previous_event_button.clicked.connect(lambda: self.jump_to_event(forward=False))
+      event_controls.addWidget(self.previous_event_button)
+      self.next_event_button = QPushButton("Next Event ▶")
+      self.next_event_button.clicked.connect(lambda: self.jump_to_event(forward=True))
+      event_controls.addWidget(self.next_event_button)
+
+      self.event_label = QLabel("")
+      event_controls.addWidget(self.event_label, 1)
+      self.layout.addLayout(event_controls)
+
+      self.event_index = None
+      # physics changes re-run the search once the spin boxes settle
+      self.event_timer = QTimer()
+      self.event_timer.setSingleShot(True)
+      self.event_timer.setInterval(500)
+      self.event_timer.timeout.connect(self.find_events)
       
       self.animation_timer = QTimer()
       self.animation_timer.timeout.connect(self.advance_time)
       self.animation_speed = 1  # days per step
       self.animation_active = False
 
+    def find_events(self):
+        """Hand the search for events and eclipses in the slider window to the event worker"""
+        if self.integration is not None:
+            return
+        self.event_search_start = time.perf_counter()
+        physics = dict(self.physics, sun_mass_scale=self.sun_mass_scale)
+        radii = dict(zip(self.bodies.names, self.bodies.radius))
+        self.event_worker.request(EventSearch(self.slider.minimum(), self.slider.maximum(), physics, radii))
+
+    def on_events_ready(self, search):
+        """Show a finished search unless the physics or the window changed since it was asked for"""
+        physics = dict(self.physics, sun_mass_scale=self.sun_mass_scale)
+        if (self.integration is not None or search.physics != physics
+                or (search.start, search.stop) != (self.slider.minimum(), self.slider.maximum())):
+            return
+        self.event_index = search.index
+        print(f"Found {len(self.event_index)} events in "
+              f"{(time.perf_counter() - self.event_search_start) * 1000:.0f} ms")
+        self.show_events()
+
+    def selected_event_kind(self):
+        return {"Conjunctions": "conjunction", "Oppositions": "opposition",
+                "Closest Approaches": "closest approach", "Eclipses": "eclipse",
+                "Transits": "transit"}.get(self.event_kind_combo.currentText())
+
+    def show_events(self):
+        if self.event_index is None:
+            return
+        selected = self.event_index.select(self.selected_event_kind())
+        self.slider.set_events(selected['day'], selected['kind'])
+
+    def jump_to_event(self, forward=True):
+        if self.event_index is None:
+            return
+        kind = self.selected_event_kind()
+        if forward:
+            event = self.event_index.next_after(self.day_number, kind)
+        else:
+            event = self.event_index.previous_before(self.day_number, kind)
+        if event is None:
+            self.event_label.setText("No more events in this direction")
+            return
+
+        if self.animation_active:
+            self.toggle_animation()
+        day = float(event['day'])
+        self.slider.blockSignals(True)
+        self.slider.setValue(int(round(day)))
+        self.slider.blockSignals(False)
+        self.current_date = datetime(2000, 1, 1) + timedelta(days=day)
+        self.date_label.setText(f"Date: {self.current_date:%Y-%m-%d %H:%M}")
+        self.day_number = day
+        self.event_label.setText(events.describe(event))
+        self.request_frame()
+
     def toggle_animation(self):
         if self.animation_active:
             self.animation_timer.stop()
@@ -714,481 +909,269 @@ class SolarSystemApp(QMainWindow):
         if self.animation_active:
             self.toggle_animation()
             
-    def update_planet_rotations(self, time_step=1.0):
-      for name, body in self.bodies.items():
-          if 'rotation_period' in body and body['rotation_period'] != 0:
-              if abs(body['rotation_period']) < 0.001:
-                  continue
-                  
-              rotation_per_day = 24.0 / abs(body['rotation_period'])
-              
-              rotation_increment = rotation_per_day * 360.0 * time_step
-              
-              if body['rotation_period'] < 0:
-                  rotation_increment = -rotation_increment
-              
-              if 'rotation_angle' not in body:
-                  body['rotation_angle'] = 0.0
-              
-              body['rotation_angle'] = (body['rotation_angle'] + rotation_increment) % 360.0
-              
-                  
-    def update_orbital_elements(self):
-        d = self.day_number
-        
-        self.bodies['Mercury']['N'] = 48.3313 + 3.24587e-5 * d
-        # Mercury
-        self.bodies['Mercury']['N'] = 48.3313 + 3.24587e-5 * d
-        self.bodies['Mercury']['i'] = 7.0047 + 5.00e-8 * d
-        self.bodies['Mercury']['w'] = 29.1241 + 1.01444e-5 * d
-        self.bodies['Mercury']['a'] = 0.387098
-        self.bodies['Mercury']['e'] = 0.205635 + 5.59e-10 * d
-        self.bodies['Mercury']['M'] = 168.6562 + 4.0923344368 * d
-        
-        # Venus
-        self.bodies['Venus']['N'] = 76.6799 + 2.46590e-5 * d
-        self.bodies['Venus']['i'] = 3.3946 + 2.75e-8 * d
-        self.bodies['Venus']['w'] = 54.8910 + 1.38374e-5 * d
-        self.bodies['Venus']['a'] = 0.723330
-        self.bodies['Venus']['e'] = 0.006773 - 1.302e-9 * d
-        self.bodies['Venus']['M'] = 48.0052 + 1.6021302244 * d
-        
-        # Earth
-        self.bodies['Earth']['N'] = 0.0
-        self.bodies['Earth']['i'] = 0.0
-        self.bodies['Earth']['w'] = 282.9404 + 4.70935e-5 * d
-        self.bodies['Earth']['a'] = 1.000000
-        self.bodies['Earth']['e'] = 0.016709 - 1.151e-9 * d
-        self.bodies['Earth']['M'] = 356.0470 + 0.9856002585 * d
-        
-        # Mars
-        self.bodies['Mars']['N'] = 49.5574 + 2.11081e-5 * d
-        self.bodies['Mars']['i'] = 1.8497 - 1.78e-8 * d
-        self.bodies['Mars']['w'] = 286.5016 + 2.92961e-5 * d
-        self.bodies['Mars']['a'] = 1.523688
-        self.bodies['Mars']['e'] = 0.093405 + 2.516e-9 * d
-        self.bodies['Mars']['M'] = 18.6021 + 0.5240207766 * d
-        
-        # Jupiter
-        self.bodies['Jupiter']['N'] = 100.4542 + 2.76854e-5 * d
-        self.bodies['Jupiter']['i'] = 1.3030 - 1.557e-7 * d
-        self.bodies['Jupiter']['w'] = 273.8777 + 1.64505e-5 * d
-        self.bodies['Jupiter']['a'] = 5.20256
-        self.bodies['Jupiter']['e'] = 0.048498 + 4.469e-9 * d
-        self.bodies['Jupiter']['M'] = 19.8950 + 0.0830853001 * d
-        
-        # Saturn
-        self.bodies['Saturn']['N'] = 113.6634 + 2.38980e-5 * d
-        self.bodies['Saturn']['i'] = 2.4886 - 1.081e-7 * d
-        self.bodies['Saturn']['w'] = 339.3939 + 2.97661e-5 * d
-        self.bodies['Saturn']['a'] = 9.55475
-        self.bodies['Saturn']['e'] = 0.055546 - 9.499e-9 * d
-        self.bodies['Saturn']['M'] = 316.9670 + 0.0334442282 * d
-        
-        # Uranus
-        self.bodies['Uranus']['N'] = 74.0005 + 1.3978e-5 * d
-        self.bodies['Uranus']['i'] = 0.7733 + 1.9e-8 * d
-        self.bodies['Uranus']['w'] = 96.6612 + 3.0565e-5 * d
-        self.bodies['Uranus']['a'] = 19.18171 - 1.55e-8 * d
-        self.bodies['Uranus']['e'] = 0.047318 + 7.45e-9 * d
-        self.bodies['Uranus']['M'] = 142.5905 + 0.011725806 * d
-        
-        # Neptune
-        self.bodies['Neptune']['N'] = 131.7806 + 3.0173e-5 * d
-        self.bodies['Neptune']['i'] = 1.7700 - 2.55e-7 * d
-        self.bodies['Neptune']['w'] = 272.8461 - 6.027e-6 * d
-        self.bodies['Neptune']['a'] = 30.05826 + 3.313e-8 * d
-        self.bodies['Neptune']['e'] = 0.008606 + 2.15e-9 * d
-        self.bodies['Neptune']['M'] = 260.2471 + 0.005995147 * d
-        
-        # Normalize all angles to 0-360 degrees
-        for body in self.bodies.values():
-            if body['name'] != 'Sun':
-                body['N'] = body['N'] % 360
-                body['i'] = body['i'] % 360
-                body['w'] = body['w'] % 360
-                body['M'] = body['M'] % 360
-        self.update_moon_orbital_elements()
-    
-    def calculate_planet_positions(self):
-        for name, body in self.bodies.items():
-            if body.get('parent_body') is None:
-                body['position'] = self.calculate_position_from_elements(body)
-
-        for name, body in self.bodies.items():
-            parent_name = body.get('parent_body')
-            if parent_name:
-                parent_body = self.bodies[parent_name]
-                rel_pos = self.calculate_position_from_elements(body)
-                if body['name'] == 'Moon':
-                    rel_pos = rel_pos * 50.0
-                body['position'] = parent_body['position'] + rel_pos
-
-        for name, body in self.bodies.items():
-            self.update_actor_position(body)
+    def capture_checkpoint(self):
+        """The complete scenario: registry columns, physics, date, camera, orbits, trails and events"""
+        bodies = self.bodies
+        # unicode sized to the longest name; tabulated bodies can have long or non-ASCII names
+        arrays = {'names': np.array(bodies.names, dtype=str), 'parent': bodies.parent}
+        for column in FLOAT_COLUMNS:
+            arrays[column] = getattr(bodies, column)
+        buffers = self.compute_worker.buffers
+        with buffers.lock:
+            arrays['orbits'] = buffers.front.orbits.copy()
 
-        #Reposition 
-        for name, body in self.bodies.items():
-            orbit_actor = body.get('orbit_actor')
-            parent = body.get('parent_body')
-            if orbit_actor is not None and parent is not None:
-                parent_scaled = self.bodies[parent]['position'] / self.scale_factor
-                orbit_actor.SetPosition(parent_scaled)
-    def calculate_position_from_elements(self, body):
-        a = body['a']
-        if body.get('parent_body') is None:
-            a = a / (self.sun_mass_scale ** (1.0 / 3.0))
-        e = body['e']
-        i = np.radians(body['i'])
-        N = np.radians(body['N'])
-        w = np.radians(body['w'])
-        M = np.radians(body['M'])
-        
-        if e < 0.8:
-            E = M
+        trails = [trail for trail in bodies.trail if trail is not None]
+        if trails:
+            capacity = trails[0].capacity
+            arrays['trail_points'] = np.zeros((len(bodies), capacity, 3))
+            arrays['trail_count'] = np.zeros(len(bodies), dtype=np.int64)
+            arrays['trail_head'] = np.zeros(len(bodies), dtype=np.int64)
+            for body_id, trail in enumerate(bodies.trail):
+                if trail is not None:
+                    arrays['trail_points'][body_id] = trail.points
+                    arrays['trail_count'][body_id] = trail.count
+                    arrays['trail_head'][body_id] = trail.head
+        if self.event_index is not None:
+            arrays['events'] = self.event_index.events
+
+        camera = self.renderer.GetActiveCamera()
+        state = {
+            'day': self.day_number,
+            'physics': self.physics,
+            'multipliers': {'sun_mass_scale': self.sun_mass_scale, 'G_multiplier': self.G_multiplier,
+                            'ecc_multiplier': self.ecc_multiplier, 'inc_multiplier': self.inc_multiplier},
+            'camera': {'position': camera.GetPosition(), 'focal_point': camera.GetFocalPoint(),
+                       'view_up': camera.GetViewUp(), 'view_angle': camera.GetViewAngle(),
+                       'clipping_range': camera.GetClippingRange()},
+            'selected_planet': self.selected_planet,
+            'info_planet': self.info_planet,
+            'trail_length': self.trail_spin.value(),
+            'last_trail_day': self.last_trail_day,
+            'animation_speed': self.speed_combo.currentText(),
+            'event_kind': self.event_kind_combo.currentText(),
+        }
+        return Checkpoint(state, arrays)
+
+    def restore_checkpoint(self, checkpoint):
+        """Put the scene back as captured, without recomputing anything the checkpoint holds"""
+        bodies = self.bodies
+        # checkpoints written before names were unicode hold 16-byte strings
+        names = [name.decode() if isinstance(name, bytes) else str(name) for name in checkpoint['names']]
+        if names != bodies.names or not np.array_equal(checkpoint['parent'], bodies.parent):
+            raise ValueError("The checkpoint was saved with a different set of bodies")
+        state = checkpoint.state
+        if self.animation_active:
+            self.toggle_animation()
+        self.event_timer.stop()
+
+        multipliers = state['multipliers']
+        for spin, key in ((self.mass_spin, 'sun_mass_scale'), (self.g_spin, 'G_multiplier'),
+                          (self.ecc_spin, 'ecc_multiplier'), (self.inc_spin, 'inc_multiplier')):
+            spin.blockSignals(True)
+            spin.setValue(multipliers[key])
+            spin.blockSignals(False)
+            setattr(self, key, multipliers[key])
+        self.physics = dict(state['physics'])
+        self.update_sun_size()
+        self.update_gravity_physics()
+
+        day = state['day']
+        self.slider.blockSignals(True)
+        self.slider.setValue(int(round(day)))
+        self.slider.blockSignals(False)
+        self.day_number = day
+        self.current_date = datetime(2000, 1, 1) + timedelta(days=day)
+        self.date_label.setText(f"Date: {self.current_date:%Y-%m-%d %H:%M}")
+        self.event_label.setText("")
+        for widget, key in ((self.speed_combo, 'animation_speed'), (self.event_kind_combo, 'event_kind')):
+            widget.blockSignals(True)
+            widget.setCurrentText(state[key])
+            widget.blockSignals(False)
+        self.change_speed(state['animation_speed'])
+
+        for column in FLOAT_COLUMNS:
+            getattr(bodies, column)[...] = checkpoint[column]
+        self.compute_worker.restore(day, checkpoint['position'], checkpoint['velocity'],
+                                    checkpoint['elements'], checkpoint['orbits'])
+
+        self.apply_frame()
+        if 'trail_points' in checkpoint:
+            # the saved trails replace the sample apply_frame just pushed
+            if any(trail is not None for trail in bodies.trail):
+                self.remove_trails()
+            self.trail_spin.blockSignals(True)
+            self.trail_spin.setValue(state['trail_length'])
+            self.trail_spin.blockSignals(False)
+            self.create_trails()
+            for body_id, trail in enumerate(bodies.trail):
+                if trail is not None:
+                    trail.restore(checkpoint['trail_points'][body_id], checkpoint['trail_count'][body_id],
+                                  checkpoint['trail_head'][body_id])
+            self.last_trail_day = state['last_trail_day']
+
+        if 'events' in checkpoint:
+            self.event_timer.stop()
+            self.event_worker.cancel()
+            self.event_index = events.EventIndex(checkpoint['events'])
+            self.show_events()
         else:
-            E = np.pi
-        
-        # Iterat Kepler's equation
-        for _ in range(10):
-            E_next = M + e * np.sin(E)
-            if abs(E_next - E) < 1e-8:
-                break
-            E = E_next
-        
-        x_orbit = a * (np.cos(E) - e)
-        y_orbit = a * np.sqrt(1 - e*e) * np.sin(E)
-        z_orbit = 0.0
-        
-        # Rotate
-        x_temp = x_orbit * np.cos(w) - y_orbit * np.sin(w)
-        y_temp = x_orbit * np.sin(w) + y_orbit * np.cos(w)
-        z_temp = z_orbit
-        
-        x_temp2 = x_temp
-        y_temp2 = y_temp * np.cos(i) - z_temp * np.sin(i)
-        z_temp2 = y_temp * np.sin(i) + z_temp * np.cos(i)
-        
-        # rotate
-        x = x_temp2 * np.cos(N) - y_temp2 * np.sin(N)
-        y = x_temp2 * np.sin(N) + y_temp2 * np.cos(N)
-        z = z_temp2
-        
-        #to meters
-        position = np.array([x, y, z]) * self.AU
-        
-        return position
-    
-    def update_actor_position(self, body):
-      if body['actor'] is not None:
-          scaled_position = body['position'] / self.scale_factor
-          body['actor'].SetPosition(0, 0, 0)
-          body['actor'].SetOrientation(0, 0, 0)
-          
-          # Apply rotation
-          if 'rotation_angle' in body:
-              body['actor'].RotateZ(body['rotation_angle'])
-              
-          # Apply axial tilt
-          if 'axial_tilt' in body:
-              body['actor'].RotateY(body['axial_tilt'])
-
-          #set pos
-          body['actor'].SetPosition(scaled_position)
-
-      if 'axis_actor' in body:
-          ax = body['axis_actor']
-          ax.SetPosition(scaled_position)
-          # Orient axis Y to Z, then apply tilt
-          tilt = body.get('axial_tilt', 0.0)
-          ax.SetOrientation(90 + tilt, 0.0, 0.0)
-
-    def create_orbit_paths(self):
-        for name, body in self.bodies.items():
-            if name == 'Sun':
+            self.event_timer.start()
+
+        self.selected_planet = state['selected_planet']
+        self.info_planet = None
+        self.planet_combo.blockSignals(True)
+        self.planet_combo.setCurrentText(state['info_planet'] or self.selected_planet)
+        self.planet_combo.blockSignals(False)
+        if state['info_planet']:
+            # the info panel moves the camera, which is restored below
+            self.display_planet_info(state['info_planet'])
+
+        camera = self.renderer.GetActiveCamera()
+        view = state['camera']
+        camera.SetPosition(view['position'])
+        camera.SetFocalPoint(view['focal_point'])
+        camera.SetViewUp(view['view_up'])
+        camera.SetViewAngle(view['view_angle'])
+        camera.SetClippingRange(view['clipping_range'])
+        self.vtk_widget.GetRenderWindow().Render()
+
+    def save_checkpoint(self, path=None):
+        if path is None:
+            path, _ = QFileDialog.getSaveFileName(self, "Save State", CHECKPOINT_FILE, "Checkpoints (*.ckpt)")
+            if not path:
+                return
+        start = time.perf_counter()
+        try:
+            self.capture_checkpoint().save(path)
+        except OSError as e:
+            self.event_label.setText(f"Could not save {path}: {e}")
+            return
+        print(f"Saved {path} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def load_checkpoint(self, path=None):
+        if path is None:
+            path, _ = QFileDialog.getOpenFileName(self, "Load State", "", "Checkpoints (*.ckpt)")
+            if not path:
+                return
+        start = time.perf_counter()
+        try:
+            checkpoint = Checkpoint.load(path)
+            if self.deferred_steps:
+                # the scene is still being built: restore at the end, and skip
+                # the event search if the checkpoint holds the events
+                if 'events' in checkpoint and self.find_events in self.deferred_steps:
+                    self.deferred_steps.remove(self.find_events)
+                self.deferred_steps.append(lambda: self.load_checkpoint(path))
+                return
+            self.restore_checkpoint(checkpoint)
+        except (OSError, ValueError) as e:
+            self.event_label.setText(f"Could not load {path}: {e}")
+            if self.event_index is None:
+                self.event_timer.start()
+            return
+        print(f"Restored {path} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    def create_trails(self):
+        length = self.trail_spin.value()
+        for body in self.bodies:
+            if body.name == 'Sun':
                 continue
-            
-            num_points = 100
-            
-            current_M = body['M']
-            
-            points = vtk.vtkPoints()
-            
-            if body.get('parent_body') is None:
-                reference_pos = np.array([0, 0, 0])
-            else:
-                parent_name = body['parent_body']
-                parent_pos = self.bodies[parent_name]['position']
-                reference_pos = parent_pos / self.scale_factor
-            
-            for i in range(num_points):
-                body['M'] = i * 360.0 / num_points
-                
-                if body.get('parent_body') is None:
-                    position = self.calculate_position_from_elements(body)
-                    scaled_position = position / self.scale_factor
-                else:
-                    relative_position = self.calculate_position_from_elements(body)
-                    if body['name'] == 'Moon':
-                        relative_position = relative_position * 50.0
-                    scaled_position = relative_position / self.scale_factor
-                
-                points.InsertNextPoint(scaled_position)
-            
-            # loop close
-            body['M'] = 0
-            if body.get('parent_body') is None:
-                position = self.calculate_position_from_elements(body)
-                scaled_position = position / self.scale_factor
-            else:
-                relative_position = self.calculate_position_from_elements(body)
-                if body['name'] == 'Moon':
-                    relative_position = relative_position * 50.0
-                scaled_position = relative_position / self.scale_factor
-            points.InsertNextPoint(scaled_position)
-            
-            #  mean anomaly restore
-            body['M'] = current_M
-            
-            line = vtk.vtkPolyLine()
-            line.GetPointIds().SetNumberOfIds(num_points + 1)
-            for i in range(num_points + 1):
-                line.GetPointIds().SetId(i, i)
 
-            cells = vtk.vtkCellArray()
-            cells.InsertNextCell(line)
+            trail = TrailBuffer(length)
+            mapper = vtkPolyDataMapper()
+            mapper.SetInputData(trail.polydata)
 
-            polydata = vtk.vtkPolyData()
-            polydata.SetPoints(points)
-            polydata.SetLines(cells)
-            
-            mapper = vtk.vtkPolyDataMapper()
-            mapper.SetInputData(polydata)
-            
-            orbit_actor = vtk.vtkActor()
-            orbit_actor.SetMapper(mapper)
-            
-            # Set color
-            r, g, b = body['color']
-            orbit_actor.GetProperty().SetColor(r, g, b)
-            orbit_actor.GetProperty().SetOpacity(0.5)
-            orbit_actor.GetProperty().SetLineWidth(2.0)
-            
-            # parent  orbit 
-            if body.get('parent_body') is not None:
-                parent_scaled = self.bodies[body['parent_body']]['position'] / self.scale_factor
-                orbit_actor.SetPosition(parent_scaled)
-
-            if hasattr(self, 'show_orbits_checkbox'):
-                if self.show_orbits_checkbox.isChecked():
-                    orbit_actor.VisibilityOn()
-                else:
-                    orbit_actor.VisibilityOff()
+            trail_actor = vtkActor()
+            trail_actor.SetMapper(mapper)
+            r, g, b = body.color
+            trail_actor.GetProperty().SetColor(r, g, b)
+            trail_actor.GetProperty().SetOpacity(0.9)
+            trail_actor.GetProperty().SetLineWidth(1.5)
+            if not self.show_trails_checkbox.isChecked():
+                trail_actor.VisibilityOff()
 
-            self.renderer.AddActor(orbit_actor)
+            self.renderer.AddActor(trail_actor)
+            body.trail = trail
+            body.trail_actor = trail_actor
 
-            body['orbit_actor'] = orbit_actor
+    def remove_trails(self):
+        for body in self.bodies:
+            if body.trail_actor is not None:
+                self.renderer.RemoveActor(body.trail_actor)
+            body.trail_actor = None
+            body.trail = None
 
-    def remove_orbit_paths(self):
-        for body in self.bodies.values():
-            actor = body.get('orbit_actor')
-            if actor is not None:
-                self.renderer.RemoveActor(actor)
-                body['orbit_actor'] = None
-            
-    # def add_gravity_field_glyphs(self):
-    #   print("Adding balanced gravity field visualization...")
-    #   import vtk
-    #   import numpy as np
-      
-    #   # Create points in spherical shells with reduced density
-    #   points = vtk.vtkPoints()
-    #   vectors = vtk.vtkDoubleArray()
-    #   vectors.SetNumberOfComponents(3)
-    #   vectors.SetName("GravityField")
-      
-    #   # Use fewer points and larger spacing between shells
-    #   total_points = 150  # Significantly reduced from 600
-      
-    #   # Use specific radii for better visual organization
-    #   radii = [2.0, 4.0, 7.0]  # Fewer shells, at strategic distances
-      
-    #   for radius in radii:
-    #       # Calculate points per shell - more for outer shells
-    #       points_this_shell = int(total_points * radius / 15)
-          
-    #       # Generate evenly distributed points on this shell
-    #       # Using Fibonacci sphere algorithm for even distribution
-    #       golden_ratio = (1 + 5**0.5) / 2
-    #       for i in range(points_this_shell):
-    #           # Generate even distribution on sphere
-    #           i_float = float(i)
-    #           theta = 2 * np.pi * i_float / golden_ratio
-    #           phi = np.arccos(1 - 2 * (i_float + 0.5) / points_this_shell)
-              
-    #           # Calculate position, compressing z-axis slightly
-    #           pos_x = radius * np.sin(phi) * np.cos(theta)
-    #           pos_y = radius * np.sin(phi) * np.sin(theta)
-    #           pos_z = radius * np.cos(phi) * 0.6  # Compress z-axis
-              
-    #           # Skip points too close to planets (with larger threshold)
-    #           too_close = False
-    #           for name, body in self.bodies.items():
-    #               if name != 'Sun' and 'position' in body:
-    #                   planet_pos = body['position'] / self.scale_factor
-    #                   dist = np.sqrt((pos_x-planet_pos[0])**2 + 
-    #                                 (pos_y-planet_pos[1])**2 + 
-    #                                 (pos_z-planet_pos[2])**2)
-    #                   # Use larger clearance radius around planets
-    #                   if dist < 1.0:  
-    #                       too_close = True
-    #                       break
-              
-    #           if too_close:
-    #               continue
-              
-    #           # Add point
-    #           points.InsertNextPoint(pos_x, pos_y, pos_z)
-              
-    #           # Calculate gravity vector
-    #           direction = np.array([-pos_x, -pos_y, -pos_z])
-    #           r = np.linalg.norm(direction)
-              
-    #           if r > 0:
-    #               # Normalize direction
-    #               direction = direction / r
-                  
-    #               # More reasonable magnitude scaling - gentler falloff
-    #               magnitude = 1.0 / (1.0 + 0.3 * r)
-    #               vector = direction * magnitude * 1.5  # Reduced scaling factor
-    #               vectors.InsertNextTuple(vector)
-      
-    #   # Create polydata
-    #   polydata = vtk.vtkPolyData()
-    #   polydata.SetPoints(points)
-    #   polydata.GetPointData().SetVectors(vectors)
-      
-    #   # Create arrow glyph with more reasonable dimensions
-    #   arrow = vtk.vtkArrowSource()
-    #   arrow.SetTipResolution(12)
-    #   arrow.SetShaftResolution(12)
-    #   arrow.SetTipLength(0.3)
-    #   arrow.SetTipRadius(0.1)
-    #   arrow.SetShaftRadius(0.03)
-      
-    #   # Create glyph with moderate scaling
-    #   glyph = vtk.vtkGlyph3D()
-    #   glyph.SetSourceConnection(arrow.GetOutputPort())
-    #   glyph.SetInputData(polydata)
-    #   glyph.SetVectorModeToUseVector()
-    #   glyph.SetScaleModeToScaleByVector()
-    #   glyph.SetScaleFactor(1.2)  # Moderate scale
-    #   glyph.OrientOn()
-    #   glyph.Update()
-      
-    #   # Create mapper and actor
-    #   mapper = vtk.vtkPolyDataMapper()
-    #   mapper.SetInputConnection(glyph.GetOutputPort())
-    #   mapper.ScalarVisibilityOff()
-      
-    #   actor = vtk.vtkActor()
-    #   actor.SetMapper(mapper)
-      
-    #   # Use a more subtle color
-    #   actor.GetProperty().SetColor(1.0, 0.7, 0.2)  # Less intense orange
-    #   actor.GetProperty().SetOpacity(0.7)  # More transparency
-      
-    #   # Add to renderer
-    #   self.renderer.AddActor(actor)
-    #   self.gravity_glyph_actor = actor
-      
-    #   print(f"Added balanced gravity field visualization")
-    #   self.vtk_widget.GetRenderWindow().Render()
-      
-    def add_labels(self):
-        for name, body in self.bodies.items():
-            text_actor = vtk.vtkTextActor()
-            text_actor.SetInput(name)
-            text_actor.GetTextProperty().SetColor(1.0, 1.0, 1.0)
-            text_actor.GetTextProperty().SetFontSize(14)
-            text_actor.GetTextProperty().SetJustificationToCentered()
-            text_actor.GetTextProperty().SetVerticalJustificationToCentered()
-            text_actor.GetTextProperty().SetBold(True)
-
-            pos = list(body['actor'].GetPosition())
-            pos[2] += 0.3
-            
-            follower = vtk.vtkBillboardTextActor3D()
-            follower.SetInput(name)
-            follower.SetPosition(pos)
-            follower.GetTextProperty().SetColor(1.0, 1.0, 1.0)
-            follower.GetTextProperty().SetFontSize(14)
-            follower.GetTextProperty().SetJustificationToCentered()
-            follower.GetTextProperty().SetVerticalJustificationToCentered()
-            follower.GetTextProperty().SetBold(True)
-            
-            if hasattr(self, 'show_labels_checkbox'):
-                if self.show_labels_checkbox.isChecked():
-                    follower.VisibilityOn()
-                else:
-                    follower.VisibilityOff()
-            
-            self.renderer.AddActor(follower)
-            body['label'] = follower
-            
-    def update_moon_orbital_elements(self):
-      d = self.day_number
-      
-      # from NASA fact sheets   
-      self.bodies['Moon']['N'] = 125.1228 - 0.0529538083 * d  # Longitude of ascending node 
-      self.bodies['Moon']['i'] = 5.1454  # Inclination to ecliptic  
-      self.bodies['Moon']['w'] = 318.0634 + 0.1643573223 * d  # Argument of perigee
-      self.bodies['Moon']['a'] = 384400000 / self.AU  # Convert meters to AU
-      
-      self.bodies['Moon']['e'] = 0.0549  # Eccentricity
-      self.bodies['Moon']['M'] = 115.3654 + 13.0649929509 * d  # Mean anomaly
+    def update_trails(self, day):
+        """Push the current positions, restarting the trails when time runs backwards"""
+        restart = self.last_trail_day is not None and day < self.last_trail_day
+        self.last_trail_day = day
+        for body in self.bodies:
+            trail = body.trail
+            if trail is None or body.id in self.off_table:
+                continue
+            if restart:
+                trail.clear()
+            trail.append(body.position / self.scale_factor)
 
-      for element in ['N', 'i', 'w', 'M']:
-          self.bodies['Moon'][element] = self.bodies['Moon'][element] % 360
+    def on_trail_length_change(self, value):
+        if not any(trail is not None for trail in self.bodies.trail):
+            return
+        self.remove_trails()
+        self.create_trails()
+        self.vtk_widget.GetRenderWindow().Render()
             
-    def store_original_orbital_elements(self):
-        for name, body in self.bodies.items():
-            if name != "Sun":
-                self.original_orbital_elements[name] = {
-                    'a': body['a'],
-                    'e': body['e'],
-                    'i': body['i'],
-                    'N': body['N'],
-                    'w': body['w'],
-                    'M': body['M']
-                }
-    
+    def add_gravity_field(self):
+        """Arrows of the summed acceleration of all bodies, out to 2 AU"""
+        half_width = 2 * self.AU
+        self.gravity_field = GravityField(self.bodies.mass, half_width, 0.2 * half_width,
+                                          scale=self.scale_factor)
+        self.gravity_field.set_physics(self.sun_mass_scale, self.physics['G_multiplier'],
+                                       self.bodies.ids['Sun'])
+        self.gravity_field.update(self.bodies.position)
+
+        arrow = vtkArrowSource()
+        arrow.SetTipLength(0.3)
+        arrow.SetTipRadius(0.1)
+        arrow.SetShaftRadius(0.03)
+
+        glyph = vtkGlyph3D()
+        glyph.SetSourceConnection(arrow.GetOutputPort())
+        glyph.SetInputData(self.gravity_field.image)
+        glyph.SetVectorModeToUseVector()
+        glyph.SetScaleModeToScaleByVector()
+        glyph.SetColorModeToColorByScalar()
+        glyph.OrientOn()
+
+        mapper = vtkPolyDataMapper()
+        mapper.SetInputConnection(glyph.GetOutputPort())
+        magnitude = self.gravity_field.magnitude
+        mapper.SetScalarRange(magnitude.min(), magnitude.max())
+
+        actor = vtkActor()
+        actor.SetMapper(mapper)
+        actor.GetProperty().SetOpacity(0.7)
+        self.renderer.AddActor(actor)
+        self.gravity_field_actor = actor
+
     def on_physics_change(self):
         self.G_multiplier = self.g_spin.value()
         self.ecc_multiplier = self.ecc_spin.value()
         self.inc_multiplier = self.inc_spin.value()
     
     def apply_physics_changes(self):
-        camera = self.renderer.GetActiveCamera()
-        old_position = camera.GetPosition()
-        old_focal_point = camera.GetFocalPoint()
-        
-        self.update_orbital_elements_phy()
+        self.physics = {
+            'sun_mass_scale': self.sun_mass_scale,
+            'G_multiplier': self.G_multiplier,
+            'ecc_multiplier': self.ecc_multiplier,
+            'inc_multiplier': self.inc_multiplier,
+        }
         
         self.update_sun_size()
+        self.update_gravity_physics()
+        self.event_timer.start()
         
-        self.calculate_planet_positions()
-        
-        self.remove_orbit_paths()
-        self.create_orbit_paths()
-        
-        if self.selected_planet:
-            self.display_planet_info(self.selected_planet)
-        
-        
-        # to origin
-        camera.SetPosition(old_position)
-        camera.SetFocalPoint(old_focal_point)
+        # info panel and orbits are refreshed when the frame arrives
+        self.request_frame(orbits=True)
         self.vtk_widget.GetRenderWindow().Render()
     
     def reset_physics(self):
@@ -1201,62 +1184,58 @@ class SolarSystemApp(QMainWindow):
         self.ecc_multiplier = 1.0
         self.inc_multiplier = 1.0
         self.sun_mass_scale = 1.0
+        self.physics = dict(ephemeris.DEFAULT_PHYSICS)
         self.update_sun_size()
-        self.reset_orbital_elements()
-
-        self.calculate_planet_positions()
-        self.remove_orbit_paths()
-        self.create_orbit_paths()
-        if self.selected_planet:
-            self.display_planet_info(self.selected_planet)
+        self.update_gravity_physics()
+        self.event_timer.start()
 
+        self.request_frame(orbits=True)
         self.vtk_widget.GetRenderWindow().Render()
     
-    def reset_orbital_elements(self):
-        for name, elements in self.original_orbital_elements.items():
-            if name in self.bodies:
-                for key, value in elements.items():
-                    self.bodies[name][key] = value
-    
-    def update_orbital_elements_phy(self):
-        self.update_orbital_elements()
-        
-        for name, body in self.bodies.items():
-            if name != "Sun":
-                if self.G_multiplier != 1.0:
-                    body['a'] = body['a'] / self.G_multiplier
-                
-                if self.ecc_multiplier != 1.0:
-                    original_e = self.original_orbital_elements[name]['e']
-                    body['e'] = min(0.95, original_e * self.ecc_multiplier)
-                
-                if self.inc_multiplier != 1.0:
-                    original_i = self.original_orbital_elements[name]['i']
-                    body['i'] = original_i * self.inc_multiplier
-    
     def toggle_orbit_visibility(self, state):
-        for name, body in self.bodies.items():
-            if 'orbit_actor' in body and body['orbit_actor'] is not None:
-                if state == Qt.Checked:
-                    body['orbit_actor'].VisibilityOn()
-                else:
-                    body['orbit_actor'].VisibilityOff()
+        if self.orbit_actor is not None:
+            self.orbit_actor.SetVisibility(state == Qt.Checked)
+
+        self.vtk_widget.GetRenderWindow().Render()
+
+    def toggle_trail_visibility(self, state):
+        for body_id, actor in enumerate(self.bodies.trail_actor):
+            if actor is not None:
+                actor.SetVisibility(state == Qt.Checked and body_id not in self.off_table)
+
+        self.vtk_widget.GetRenderWindow().Render()
+
+    def toggle_gravity_field(self, state):
+        if self.gravity_field_actor is None:
+            if state != Qt.Checked:
+                return
+            self.add_gravity_field()
+        else:
+            self.gravity_field_actor.SetVisibility(state == Qt.Checked)
+            if state == Qt.Checked:
+                self.gravity_field.update(self.bodies.position)
 
         self.vtk_widget.GetRenderWindow().Render()
 
     def toggle_label_visibility(self, state):
-        for name, body in self.bodies.items():
-            if 'label' in body and body['label'] is not None:
-                if state == Qt.Checked:
-                    body['label'].VisibilityOn()
+        for body_id, label in enumerate(self.bodies.label):
+            if label is not None:
+                # bodies outside their tables stay hidden, label included
+                if state == Qt.Checked and body_id not in self.off_table:
+                    label.VisibilityOn()
                 else:
-                    body['label'].VisibilityOff()
+                    label.VisibilityOff()
 
         self.vtk_widget.GetRenderWindow().Render()
 
 def main():
     app = QApplication(sys.argv)
     window = SolarSystemApp()
+    if len(sys.argv) > 1:
+        if os.path.isdir(sys.argv[1]):
+            window.load_integration(sys.argv[1])
+        else:
+            window.load_checkpoint(sys.argv[1])
     window.resize(1200, 800)
     window.show()
     sys.exit(app.exec_())
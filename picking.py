@@ -0,0 +1,89 @@
+"""Screen-space index of projected body positions, for click and hover picking.
+
+Bodies are projected to pixels in one matrix product and bucketed into a
+uniform grid of screen cells by sorting their cell keys. A pick looks only at
+the few cells around the cursor, so its cost does not depend on how many
+bodies there are, and nothing in the scene is ray-cast: the star sphere and
+orbit lines never take part. Bodies drawn larger than a cell are few and
+are checked separately.
+"""
+import numpy as np
+
+CELL_SIZE = 32  # pixels
+TOLERANCE = 6.0  # pixels around a body's disk that still count as a hit
+
+
+class ScreenIndex:
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.count = 0
+        self.x = self.y = self.depth = self.radius = np.zeros(0)
+        self.ids = np.zeros(0, dtype=np.intp)
+        self.order = np.zeros(0, dtype=np.intp)
+        self.starts = np.zeros(1, dtype=np.intp)
+        self.large = np.zeros(0, dtype=np.intp)
+        self.columns = self.rows = 0
+
+    def build(self, points, radii, matrix, projection_scale, width, height):
+        """Project world points (n, 3) with spheres of radii (n,) and bucket them.
+
+        matrix is the 4x4 world-to-clip transform, projection_scale the
+        (1, 1) element of the projection alone (cot of half the view angle).
+        """
+        points = np.asarray(points, dtype=float)
+        clip = points @ matrix[:3, :3].T + matrix[:3, 3]
+        w = points @ matrix[3, :3] + matrix[3, 3]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ndc = clip / w[:, None]
+            radius = np.asarray(radii, dtype=float) * projection_scale / w * (0.5 * height)
+        x = (ndc[:, 0] + 1) * (0.5 * width)
+        y = (ndc[:, 1] + 1) * (0.5 * height)
+        visible = ((w > 0) & (np.abs(ndc[:, 2]) <= 1) & (x + radius >= 0) & (x - radius <= width)
+                   & (y + radius >= 0) & (y - radius <= height))
+
+        self.ids = np.flatnonzero(visible)
+        self.x, self.y, self.depth, self.radius = x[visible], y[visible], ndc[visible, 2], radius[visible]
+        self.count = len(self.ids)
+
+        large = self.radius > self.cell_size
+        self.large = np.flatnonzero(large)
+        self.columns = int(width // self.cell_size) + 1
+        self.rows = int(height // self.cell_size) + 1
+        cx = np.clip((self.x // self.cell_size).astype(np.intp), 0, self.columns - 1)
+        cy = np.clip((self.y // self.cell_size).astype(np.intp), 0, self.rows - 1)
+        key = cy * self.columns + cx
+        key[large] = self.columns * self.rows  # past the last cell
+        self.order = np.argsort(key, kind='stable')
+        self.starts = np.searchsorted(key[self.order], np.arange(self.columns * self.rows + 1))
+
+    def query(self, x, y, tolerance=TOLERANCE):
+        """Id of the body under pixel (x, y), or None.
+
+        A body whose disk contains the point wins over one merely within
+        tolerance; among those the front-most, otherwise the nearest.
+        """
+        if self.count == 0:
+            return None
+        reach = self.cell_size + tolerance
+        c0 = max(int((x - reach) // self.cell_size), 0)
+        c1 = min(int((x + reach) // self.cell_size), self.columns - 1)
+        r0 = max(int((y - reach) // self.cell_size), 0)
+        r1 = min(int((y + reach) // self.cell_size), self.rows - 1)
+        slices = [self.order[self.starts[row * self.columns + c0]:self.starts[row * self.columns + c1 + 1]]
+                  for row in range(r0, r1 + 1)] if c0 <= c1 else []
+        candidates = np.concatenate(slices + [self.large])
+        if candidates.size == 0:
+            return None
+
+        distance = np.hypot(self.x[candidates] - x, self.y[candidates] - y)
+        radius = self.radius[candidates]
+        inside = distance <= radius
+        if inside.any():
+            k = candidates[inside][np.argmin(self.depth[candidates[inside]])]
+            return int(self.ids[k])
+        near = distance <= radius + tolerance
+        if near.any():
+            k = candidates[near][np.argmin(distance[near] - radius[near])]
+            return int(self.ids[k])
+        return None
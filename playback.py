@@ -0,0 +1,144 @@
+"""Playback positions from cubic Hermite interpolation between coarse Kepler solves.
+
+Each body gets knots spaced by its own orbital period, chosen so that the
+interpolation error stays below a tolerance. Knots are solved in batches for
+a window of time around the playback position, and in between a frame costs
+a few multiply-adds per body. Bodies whose knots would be closer together
+than the playback step are cheaper to solve directly and are not interpolated.
+"""
+import numpy as np
+
+import ephemeris
+
+KNOTS = 64  # knots per body and window
+MIN_KNOTS_PER_ORBIT = 8
+
+
+class HermitePlayback:
+
+    def __init__(self, tree, tolerance=1e7, knots=KNOTS):
+        self.tree = tree
+        self.tolerance = tolerance  # meters, in displayed (exaggerated) coordinates
+        self.knots = knots
+        n = len(tree.names)
+
+        self.physics = None
+        self.step = np.full(n, np.inf)  # knot spacing per body, days
+        self.error_bound = np.zeros(n)  # meters
+        self.start = np.full(n, np.nan)  # first knot of each body's window
+        self.knot_position = np.zeros((n, knots, 3))
+        self.knot_velocity = np.zeros((n, knots, 3))  # meters per day
+        self.last_day = None
+        self.solves = 0  # Kepler solves done, for comparison with direct playback
+
+    def reset(self, physics, d):
+        """Choose knot spacing for the given physics and drop all windows"""
+        tree = self.tree
+        self.physics = dict(physics)
+        elements = ephemeris.apply_physics(tree.elements_at(d), self.physics)
+        a = elements[:, ephemeris.IDX_A] * tree.a_scale(self.physics['sun_mass_scale'])
+        e = elements[:, ephemeris.IDX_E]
+        n = np.abs(np.radians(tree.rate[:, ephemeris.IDX_M]))
+
+        # the error of cubic Hermite interpolation is at most h^4/384 |x''''|;
+        # near perihelion |x''''| is of order r n^4 with the peak angular rate
+        # n, taken 4x larger to cover eccentric orbits. Open orbits have a < 0,
+        # and at e == 1 the bound is infinite, which leaves them to direct solves.
+        r_peak = np.abs(a) * (1 + e) * ephemeris.AU * tree.exaggeration
+        with np.errstate(divide='ignore', invalid='ignore'):
+            n_peak = n * np.sqrt((1 + e) / np.abs(1 - e) ** 3)
+            x4_bound = 4.0 * r_peak * n_peak ** 4
+            step = (384.0 * self.tolerance / x4_bound) ** 0.25
+            period = 2 * np.pi / n
+        step = np.fmin(step, period / MIN_KNOTS_PER_ORBIT)
+        step[~np.isfinite(step) | (r_peak == 0)] = np.inf
+
+        self.step = step
+        with np.errstate(invalid='ignore'):
+            self.error_bound = np.where(np.isfinite(step), x4_bound * step ** 4 / 384.0, 0.0)
+        self.start[:] = np.nan
+
+    def compute_frame(self, d, physics, positions, elements, orbits=None, is_stale=None, velocities=None):
+        """Same contract as ephemeris.compute_frame, states interpolated"""
+        tree = self.tree
+        if physics != self.physics:
+            self.reset(physics, d)
+
+        advance = abs(d - self.last_day) if self.last_day is not None else 0.0
+        self.last_day = d
+
+        tree.elements_at(d, out=elements)
+        ephemeris.apply_physics(elements, physics)
+        a_scale = tree.a_scale(physics['sun_mass_scale'])
+
+        # displayed positions and velocities, relative to the parent
+        relative = np.zeros_like(positions)
+        relative_velocity = np.zeros_like(positions)
+        direct = ~(self.step > advance)
+        static = ~np.isfinite(self.step)
+        direct &= ~static
+        if direct.any():
+            rates = ephemeris.physics_rates(tree.rate[direct], elements[direct], physics)
+            relative[direct], relative_velocity[direct] = ephemeris.positions_from_elements(
+                elements[direct], a_scale[direct], rates)
+            relative[direct] *= tree.exaggeration[direct, None]
+            relative_velocity[direct] *= tree.exaggeration[direct, None]
+            self.solves += int(direct.sum())
+
+        interpolated = ~direct & ~static
+        self.interpolate(d, interpolated, relative, relative_velocity)
+        tree.compose(relative, out=positions)
+        if velocities is not None:
+            relative_velocity /= tree.exaggeration[:, None] * ephemeris.SECONDS_PER_DAY
+            tree.compose(relative_velocity, out=velocities)
+
+        if orbits is not None:
+            if is_stale is not None and is_stale():
+                return False
+            ephemeris.compute_orbits(tree, elements, a_scale, orbits)
+        return True
+
+    def interpolate(self, d, mask, out, out_velocity):
+        knot = (d - self.start) / self.step
+        with np.errstate(invalid='ignore'):
+            outside = mask & ~((knot >= 0) & (knot < self.knots - 1))
+        if outside.any():
+            self.fill(d, np.flatnonzero(outside))
+            knot = (d - self.start) / self.step
+
+        idx = np.flatnonzero(mask)
+        if idx.size == 0:
+            return
+        j = np.floor(knot[idx]).astype(np.intp)
+        s = (knot[idx] - j)[:, None]
+        h = self.step[idx, None]
+
+        p0 = self.knot_position[idx, j]
+        p1 = self.knot_position[idx, j + 1]
+        v0 = self.knot_velocity[idx, j]
+        v1 = self.knot_velocity[idx, j + 1]
+
+        s2 = s * s
+        s3 = s2 * s
+        out[idx] = ((2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * h * v0
+                    + (3 * s2 - 2 * s3) * p1 + (s3 - s2) * h * v1)
+        out_velocity[idx] = ((6 * s2 - 6 * s) * (p0 - p1) / h + (3 * s2 - 4 * s + 1) * v0
+                             + (3 * s2 - 2 * s) * v1)
+
+    def fill(self, d, idx):
+        """Solve a new window of knots for bodies idx, mostly ahead of d"""
+        tree = self.tree
+        step = self.step[idx]
+        start = d - step * (self.knots // 4)
+        self.start[idx] = start
+        days = start[:, None] + step[:, None] * np.arange(self.knots)
+
+        elements = ephemeris.apply_physics(tree.elements_at_epochs(days, idx), self.physics)
+        a_scale = tree.a_scale(self.physics['sun_mass_scale'])[idx, None]
+        rates = ephemeris.physics_rates(tree.rate[idx, None, :], elements, self.physics)
+        position, velocity = ephemeris.positions_from_elements(elements, a_scale, rates)
+
+        exaggeration = tree.exaggeration[idx, None, None]
+        self.knot_position[idx] = position * exaggeration
+        self.knot_velocity[idx] = velocity * exaggeration
+        self.solves += days.size
@@ -0,0 +1,297 @@
+"""Universal-variable Kepler propagator for elliptic, parabolic and hyperbolic orbits.
+
+Orbits are described by periapsis distance q and eccentricity e. Time enters
+as tau = sqrt(mu) * (t - T), the time since periapsis scaled by the
+gravitational parameter. In the universal anomaly chi, Kepler's equation
+
+    F(chi) = e chi^3 S(alpha chi^2) + q chi - tau = 0,    alpha = (1 - e) / q
+
+is the same for every conic. Its derivative is the radius r = e chi^2 C + q > 0,
+so F is strictly increasing and the root is bracketed by [0, |tau| / q].
+Halley steps from a starter for each conic type converge in a few iterations.
+Any step that leaves the bracket is replaced by bisection, so every solve
+finishes within MAX_ITERATIONS.
+"""
+import numpy as np
+
+MAX_ITERATIONS = 60
+TOLERANCE = 1e-13  # relative, on chi
+
+_SERIES_TERMS = 7
+
+
+class SolverStats:
+    """Running counters over all solves, for diagnostics"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.solves = 0
+        self.iterations = 0
+        self.max_iterations = 0
+        self.bisections = 0
+        self.unconverged = 0
+        self.max_residual = 0.0  # |F| relative to |tau|
+
+    def record(self, iterations, bisections, unconverged, residual):
+        self.calls += 1
+        self.solves += iterations.size
+        if iterations.size:
+            self.iterations += int(iterations.sum())
+            self.max_iterations = max(self.max_iterations, int(iterations.max()))
+            self.max_residual = max(self.max_residual, float(residual.max()))
+        self.bisections += bisections
+        self.unconverged += unconverged
+
+    def __repr__(self):
+        mean = self.iterations / self.solves if self.solves else 0.0
+        return (f"SolverStats(solves={self.solves}, mean_iterations={mean:.2f}, "
+                f"max_iterations={self.max_iterations}, bisections={self.bisections}, "
+                f"unconverged={self.unconverged}, max_residual={self.max_residual:.1e})")
+
+
+stats = SolverStats()
+
+
+def stumpff(z):
+    """Stumpff functions C(z) and S(z), by series near z = 0"""
+    z = np.asarray(z, dtype=float)
+    C = np.empty_like(z)
+    S = np.empty_like(z)
+
+    small = np.abs(z) < 0.1
+    zs = z[small]
+    term_c = np.full_like(zs, 0.5)
+    term_s = np.full_like(zs, 1.0 / 6.0)
+    C[small] = term_c
+    S[small] = term_s
+    for k in range(1, _SERIES_TERMS):
+        term_c = -term_c * zs / ((2 * k + 1) * (2 * k + 2))
+        term_s = -term_s * zs / ((2 * k + 2) * (2 * k + 3))
+        C[small] += term_c
+        S[small] += term_s
+
+    positive = ~small & (z > 0)
+    x = np.sqrt(z[positive])
+    C[positive] = (1 - np.cos(x)) / z[positive]
+    S[positive] = (x - np.sin(x)) / (x * z[positive])
+
+    negative = ~small & (z < 0)
+    x = np.sqrt(-z[negative])
+    C[negative] = (np.cosh(x) - 1) / -z[negative]
+    S[negative] = (np.sinh(x) - x) / (x * -z[negative])
+    return C, S
+
+
+def _starter(q, e, alpha, tau):
+    """Initial chi for |tau|, by conic type"""
+    chi = np.empty_like(tau)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # ellipse: Danby's E0 = M + 0.85 e for 0 <= M <= pi
+        ellipse = (alpha > 0) & (e < 0.99)
+        M = tau[ellipse] * alpha[ellipse] ** 1.5
+        chi[ellipse] = (M + 0.85 * e[ellipse]) / np.sqrt(alpha[ellipse])
+
+        # hyperbola: H0 = ln(2 M / e + 1.8)
+        hyperbola = (alpha < 0) & (e > 1.01)
+        M = tau[hyperbola] * (-alpha[hyperbola]) ** 1.5
+        chi[hyperbola] = np.log(2 * M / e[hyperbola] + 1.8) / np.sqrt(-alpha[hyperbola])
+
+        # near-parabolic: Barker's equation, chi^3 / 6 + q chi = tau solved exactly
+        parabola = ~(ellipse | hyperbola)
+        p = 6 * q[parabola]
+        r = 6 * tau[parabola]
+        root = np.sqrt(r * r / 4 + p ** 3 / 27)
+        chi[parabola] = np.cbrt(r / 2 + root) + np.cbrt(r / 2 - root)
+    return chi
+
+
+def solve_universal(q, e, tau):
+    """Universal anomaly chi for arrays of q (> 0), e and tau"""
+    q, e, tau = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (q, e, tau)))
+    sign = np.sign(tau)
+    tau = np.abs(tau)
+    alpha = (1 - e) / q
+
+    lo = np.zeros_like(tau)
+    hi = tau / q
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # E <= M + e on an ellipse, and (e - 1) sinh H <= M on a hyperbola
+        ellipse_hi = (tau * alpha ** 1.5 + e) / np.sqrt(alpha)
+        hyperbola_hi = np.arcsinh(tau * (-alpha) ** 1.5 / (e - 1)) / np.sqrt(-alpha)
+    hi = np.where(alpha > 0, np.fmin(hi, ellipse_hi), hi)
+    hi = np.where(alpha < 0, np.fmin(hi, hyperbola_hi), hi)
+    chi = np.clip(_starter(q, e, alpha, tau), lo, hi)
+    chi[~np.isfinite(chi)] = 0.5 * hi[~np.isfinite(chi)]
+
+    iterations = np.zeros(tau.shape, dtype=np.intp)
+    active = tau > 0
+    bisections = 0
+    for _ in range(MAX_ITERATIONS):
+        if not active.any():
+            break
+        idx = np.nonzero(active)
+        x = chi[idx]
+        ei, qi, ti = e[idx], q[idx], tau[idx]
+        z = alpha[idx] * x * x
+        with np.errstate(over='ignore', invalid='ignore'):
+            C, S = stumpff(z)
+            F = ei * x ** 3 * S + qi * x - ti
+            dF = ei * x * x * C + qi
+            d2F = ei * x * (1 - z * S)
+
+        # shrink the bracket around the root; F only overflows above it
+        above = ~(F <= 0)
+        hi[idx] = np.where(above, x, hi[idx])
+        lo[idx] = np.where(above, lo[idx], x)
+
+        with np.errstate(over='ignore', invalid='ignore'):
+            newton = F / dF
+            step = newton / (1 - 0.5 * newton * d2F / dF)
+        x_next = x - step
+        outside = ~((x_next >= lo[idx]) & (x_next <= hi[idx]))
+        x_next = np.where(outside, 0.5 * (lo[idx] + hi[idx]), x_next)
+        bisections += int(outside.sum())
+
+        chi[idx] = x_next
+        iterations[idx] += 1
+        converged = np.abs(x_next - x) <= TOLERANCE * np.maximum(1.0, np.abs(x_next))
+        active[idx] = ~converged
+
+    z = alpha * chi * chi
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        C, S = stumpff(z)
+        residual = np.abs(e * chi ** 3 * S + q * chi - tau) / np.maximum(tau, 1e-300)
+    stats.record(iterations.ravel(), bisections, int(active.sum()), np.nan_to_num(residual).ravel())
+    return sign * chi
+
+
+def perifocal_state(q, e, tau):
+    """Position and velocity in the orbital plane, periapsis along +x.
+
+    Returns (x, y, vx, vy); the velocity is per unit sqrt(mu), so multiply by
+    sqrt(mu) for physical units.
+    """
+    q, e, tau = np.broadcast_arrays(*(np.asarray(x, dtype=float) for x in (q, e, tau)))
+    alpha = (1 - e) / q
+    # one revolution of a bound orbit takes tau = 2 pi alpha^-1.5; reduce to within half of it
+    bound = alpha > 0
+    period = 2 * np.pi / np.where(bound, alpha, 1.0) ** 1.5
+    tau = np.where(bound, tau - period * np.round(tau / period), tau)
+    chi = solve_universal(q, e, tau)
+    z = alpha * chi * chi
+    C, S = stumpff(z)
+
+    # Lagrange coefficients from the periapsis state r0 = (q, 0), v0 = (0, v_peri)
+    v_peri = np.sqrt((1 + e) / q)
+    r = e * chi * chi * C + q
+    f = 1 - chi * chi * C / q
+    g = tau - chi ** 3 * S
+    f_dot = chi * (z * S - 1) / (r * q)
+    g_dot = 1 - chi * chi * C / r
+    return f * q, g * v_peri, f_dot * q, g_dot * v_peri
+
+
+def propagate_states(position, velocity, mu, dt):
+    """Positions and velocities after dt along Kepler orbits, from any states.
+
+    position and velocity are (..., 3) arrays, mu and dt broadcast against
+    their leading shape, all in consistent units. Kepler's equation in chi
+    measured from the starting point,
+
+        F(chi) = sigma chi^2 C + (1 - alpha r0) chi^3 S + r0 chi - sqrt(mu) dt,
+
+    again has F' = r >= q, so the root lies between 0 and sqrt(mu) dt / q. As
+    in solve_universal the bracket is tightened by conic type: a bound orbit
+    first drops whole periods from dt, after which E changes by at most
+    M + 2e; on a hyperbola 2 (e - 1) sinh(H / 2) <= M. The same Halley steps
+    with bisection fallback apply, and a ValueError is raised for any state
+    that still has not converged.
+    """
+    position = np.asarray(position, dtype=float)
+    velocity = np.asarray(velocity, dtype=float)
+    if position.ndim == 1:
+        position, velocity = propagate_states(position[None], velocity[None], np.ravel(mu), np.ravel(dt))
+        return position[0], velocity[0]
+    shape = position.shape[:-1]
+    mu = np.broadcast_to(np.asarray(mu, dtype=float), shape)
+    dt = np.broadcast_to(np.asarray(dt, dtype=float), shape)
+
+    r0 = np.sqrt((position * position).sum(axis=-1))
+    v2 = (velocity * velocity).sum(axis=-1)
+    sqrt_mu = np.sqrt(mu)
+    sigma = (position * velocity).sum(axis=-1) / sqrt_mu
+    alpha = 2 / r0 - v2 / mu
+    h2 = (np.cross(position, velocity) ** 2).sum(axis=-1)
+    e = np.sqrt(np.maximum(0.0, 1 - h2 * alpha / mu))
+    q = np.maximum(h2 / (mu * (1 + e)), 1e-300)
+    # whole revolutions of a bound orbit change nothing
+    period = 2 * np.pi / np.where(alpha > 0, alpha, 1.0) ** 1.5
+    tau = sqrt_mu * dt
+    tau = np.where(alpha > 0, tau - period * np.round(tau / period), tau)
+    dt = tau / sqrt_mu
+
+    bound = np.abs(tau) / q
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        M = np.abs(tau) * np.abs(alpha) ** 1.5
+        ellipse_bound = (M + 2 * e) / np.sqrt(alpha)
+        hyperbola_bound = 2 * np.arcsinh(M / (2 * (e - 1))) / np.sqrt(-alpha)
+    bound = np.where(alpha > 0, np.fmin(bound, ellipse_bound), bound)
+    bound = np.where(alpha < 0, np.fmin(bound, hyperbola_bound), bound)
+    bound = np.copysign(bound, tau)
+    lo = np.minimum(0.0, bound)
+    hi = np.maximum(0.0, bound)
+    chi = np.clip(tau / r0, lo, hi)
+    b = 1 - alpha * r0
+
+    iterations = np.zeros(shape, dtype=np.intp)
+    active = tau != 0
+    bisections = 0
+    for _ in range(MAX_ITERATIONS):
+        if not active.any():
+            break
+        idx = np.nonzero(active)
+        x = chi[idx]
+        si, bi = sigma[idx], b[idx]
+        z = alpha[idx] * x * x
+        with np.errstate(over='ignore', invalid='ignore'):
+            C, S = stumpff(z)
+            F = si * x * x * C + bi * x ** 3 * S + r0[idx] * x - tau[idx]
+            dF = si * x * (1 - z * S) + bi * x * x * C + r0[idx]
+            d2F = si * (1 - z * C) + bi * x * (1 - z * S)
+
+        above = ~(F <= 0)
+        hi[idx] = np.where(above, x, hi[idx])
+        lo[idx] = np.where(above, lo[idx], x)
+
+        with np.errstate(over='ignore', invalid='ignore'):
+            newton = F / dF
+            step = newton / (1 - 0.5 * newton * d2F / dF)
+        x_next = x - step
+        outside = ~((x_next >= lo[idx]) & (x_next <= hi[idx]))
+        x_next = np.where(outside, 0.5 * (lo[idx] + hi[idx]), x_next)
+        bisections += int(outside.sum())
+
+        chi[idx] = x_next
+        iterations[idx] += 1
+        converged = np.abs(x_next - x) <= TOLERANCE * np.maximum(1.0, np.abs(x_next))
+        active[idx] = ~converged
+
+    z = alpha * chi * chi
+    with np.errstate(over='ignore', invalid='ignore'):
+        C, S = stumpff(z)
+        r = sigma * chi * (1 - z * S) + b * chi * chi * C + r0
+        residual = np.abs(sigma * chi * chi * C + b * chi ** 3 * S + r0 * chi - tau) / np.maximum(np.abs(tau), 1e-300)
+    stats.record(iterations.ravel(), bisections, int(active.sum()), np.nan_to_num(residual).ravel())
+    if active.any():
+        raise ValueError(f"Kepler solver did not converge for {int(active.sum())} of {active.size} states")
+
+    # Lagrange coefficients
+    f = 1 - chi * chi * C / r0
+    g = dt - chi ** 3 * S / sqrt_mu
+    f_dot = sqrt_mu / (r * r0) * chi * (z * S - 1)
+    g_dot = 1 - chi * chi * C / r
+    return (f[..., None] * position + g[..., None] * velocity,
+            f_dot[..., None] * position + g_dot[..., None] * velocity)
@@ -0,0 +1,295 @@
+"""Headless HTTP server for batch queries against the visualizer's model.
+
+    python query_server.py --port 8765 --workers 4
+    curl 'http://127.0.0.1:8765/states?bodies=Earth,Mars&start=2027-01-01&stop=2027-12-31&step=1'
+
+Endpoints, all answering JSON (GET with query parameters, or POST with a JSON
+object of the same parameters):
+
+    /bodies                          names and parents
+    /states   bodies, days | start, stop, step
+                                     heliocentric positions (m) and velocities (m/s),
+                                     shaped (bodies, epochs, 3)
+    /orbits   bodies, day            orbit paths (m) relative to each body's parent
+    /events   start, stop, kind      conjunctions, oppositions, closest approaches,
+                                     eclipses and transits
+
+Days are day numbers or YYYY-MM-DD dates. Every endpoint also takes the
+physics multipliers sun_mass, g, eccentricity and inclination.
+
+Queries are normalized into a key. Answers are kept in an LRU cache of
+encoded responses, and a query that arrives while an identical one is being
+computed waits for that result instead of starting another (coalescing). The
+computing happens on a pool of worker processes, so HTTP threads only parse,
+look up and send. The server binds to localhost only.
+"""
+import argparse
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from multiprocessing import get_context
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+import ephemeris
+import events
+from eclipses import find_eclipses
+
+MAX_STATES = 2_000_000  # bodies x epochs in one /states answer
+MAX_EVENT_DAYS = 40000.0
+CACHE_ENTRIES = 256
+CACHE_BYTES = 256 * 2 ** 20
+
+BODIES = ['Sun'] + list(ephemeris.MEAN_ELEMENTS)
+PHYSICS_PARAMETERS = {'sun_mass': 'sun_mass_scale', 'g': 'G_multiplier', 'eccentricity': 'ecc_multiplier',
+                      'inclination': 'inc_multiplier'}
+
+
+def _day(value):
+    """Day number from a number or a YYYY-MM-DD date"""
+    value = str(value)
+    if '-' in value[1:]:
+        return (datetime.strptime(value, "%Y-%m-%d") - datetime(2000, 1, 1)).total_seconds() / 86400.0
+    return _finite(value, 'days')
+
+
+def _finite(value, name):
+    value = float(value)
+    if not np.isfinite(value):
+        raise ValueError(f"{name} must be finite")
+    return value
+
+
+def _list(value):
+    return value if isinstance(value, list) else [v for v in str(value).split(',') if v]
+
+
+def normalize(endpoint, params):
+    """Canonical, hashable parameters for an endpoint; raises ValueError on bad input"""
+    query = {'endpoint': endpoint}
+    physics = dict(ephemeris.DEFAULT_PHYSICS)
+    for name, key in PHYSICS_PARAMETERS.items():
+        if name in params:
+            physics[key] = _finite(params[name], name)
+    if physics['sun_mass_scale'] <= 0 or physics['G_multiplier'] <= 0:
+        raise ValueError("sun_mass and g must be positive")
+    query['physics'] = tuple(sorted(physics.items()))
+
+    if endpoint in ('states', 'orbits'):
+        bodies = _list(params.get('bodies', 'Earth'))
+        unknown = [body for body in bodies if body not in BODIES]
+        if unknown:
+            raise ValueError(f"Unknown bodies: {', '.join(unknown)}")
+        query['bodies'] = tuple(bodies)
+    if endpoint == 'states':
+        if 'days' in params:
+            days = [_day(day) for day in _list(params['days'])]
+        else:
+            start, stop = _day(params['start']), _day(params['stop'])
+            step = _finite(params.get('step', 1.0), 'step')
+            if step <= 0:
+                raise ValueError("step must be positive")
+            # count first, so oversized ranges are refused before anything is allocated
+            count = max(0.0, np.floor((stop - start) / step + 1e-9) + 1)
+            if count * len(query['bodies']) > MAX_STATES:
+                raise ValueError(f"More than {MAX_STATES} states requested")
+            days = (start + step * np.arange(int(count))).tolist()
+        if len(days) * len(query['bodies']) > MAX_STATES:
+            raise ValueError(f"More than {MAX_STATES} states requested")
+        query['days'] = tuple(days)
+    elif endpoint == 'orbits':
+        query['day'] = _day(params.get('day', 0.0))
+    elif endpoint == 'events':
+        query['start'], query['stop'] = _day(params['start']), _day(params['stop'])
+        if not 0 < query['stop'] - query['start'] <= MAX_EVENT_DAYS:
+            raise ValueError(f"stop must be after start, by at most {MAX_EVENT_DAYS:.0f} days")
+        query['kind'] = params.get('kind') or None
+    elif endpoint != 'bodies':
+        raise KeyError(endpoint)
+    return tuple(query.items())
+
+
+def _encode(answer):
+    return json.dumps(answer, separators=(',', ':')).encode()
+
+
+def answer(query):
+    """Compute and encode the answer to a normalized query (runs in a worker process)"""
+    query = dict(query)
+    physics = dict(query['physics'])
+    endpoint = query['endpoint']
+
+    if endpoint == 'bodies':
+        return _encode({'bodies': [{'name': name, 'parent': ephemeris.PARENT_BODY.get(name)} for name in BODIES]})
+
+    if endpoint == 'states':
+        bodies = list(query['bodies'])
+        tree = events.tree_for(['Sun'] + bodies)
+        position, velocity = ephemeris.state_vectors(tree, query['days'], physics, bodies=bodies)
+        return _encode({'bodies': bodies, 'days': list(query['days']),
+                        'position_m': position.tolist(), 'velocity_m_s': velocity.tolist()})
+
+    if endpoint == 'orbits':
+        bodies = list(query['bodies'])
+        tree = events.tree_for(['Sun'] + bodies)
+        elements = ephemeris.apply_physics(tree.elements_at(query['day']), physics)
+        orbits = np.zeros((len(tree.names), ephemeris.ORBIT_POINTS + 1, 3))
+        ephemeris.compute_orbits(tree, elements, tree.a_scale(physics['sun_mass_scale']), orbits)
+        # compute_orbits draws satellite orbits exaggerated, as on screen
+        orbits /= tree.exaggeration[:, None, None]
+        idx = tree.body_ids(bodies)
+        return _encode({'bodies': bodies, 'day': query['day'],
+                        'parents': [ephemeris.PARENT_BODY.get(body) for body in bodies],
+                        'orbit_m': orbits[idx].tolist()})
+
+    start, stop = query['start'], query['stop']
+    found = events.EventIndex(np.concatenate((events.find_events(start, stop, physics).events,
+                                              find_eclipses(start, stop, physics=physics).events)))
+    return _encode({'events': [{'day': float(event['day']), 'kind': str(event['kind']), 'body': str(event['body']),
+                                'other': str(event['other']), 'value': float(event['value']),
+                                'description': events.describe(event)}
+                               for event in found.select(query['kind'])]})
+
+
+class QueryService:
+    """LRU cache of encoded answers in front of a process pool, coalescing identical queries"""
+
+    def __init__(self, workers=None, entries=CACHE_ENTRIES, max_bytes=CACHE_BYTES):
+        self.pool = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+        self.entries = entries
+        self.max_bytes = max_bytes
+        self.cache = OrderedDict()
+        self.cached_bytes = 0
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = 0
+
+    def get(self, query):
+        started = False
+        with self.lock:
+            if query in self.cache:
+                self.cache.move_to_end(query)
+                self.hits += 1
+                return self.cache[query]
+            future = self.in_flight.get(query)
+            if future is None:
+                self.misses += 1
+                future = self.pool.submit(answer, query)
+                self.in_flight[query] = future
+                started = True
+            else:
+                self.coalesced += 1
+        if started:
+            # outside the lock: a finished future runs the callback right here
+            future.add_done_callback(lambda done: self._store(query, done))
+        return future.result()
+
+    def _store(self, query, future):
+        with self.lock:
+            self.in_flight.pop(query, None)
+            if future.exception() is not None:
+                return
+            body = future.result()
+            if len(body) > self.max_bytes:
+                return
+            self.cache[query] = body
+            self.cached_bytes += len(body)
+            while len(self.cache) > self.entries or self.cached_bytes > self.max_bytes:
+                _, evicted = self.cache.popitem(last=False)
+                self.cached_bytes -= len(evicted)
+
+    def stats(self):
+        with self.lock:
+            return {'cached': len(self.cache), 'cached_bytes': self.cached_bytes, 'in_flight': len(self.in_flight), 'hits': self.hits,
+                    'misses': self.misses, 'coalesced': self.coalesced}
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    service = None
+    verbose = False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        self.respond(url.path.strip('/'), params)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            params = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self.send_json(400, {'error': "Body must be a JSON object"})
+            return
+        self.respond(url.path.strip('/'), params)
+
+    def respond(self, endpoint, params):
+        if endpoint == 'stats':
+            self.send_json(200, self.service.stats())
+            return
+        try:
+            query = normalize(endpoint, params)
+        except KeyError as e:
+            status = 404 if e.args == (endpoint,) else 400
+            self.send_json(status, {'error': f"Unknown endpoint {endpoint}" if status == 404
+                                    else f"Missing parameter {e.args[0]}"})
+            return
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+            return
+        try:
+            body = self.service.get(query)
+        except Exception as e:
+            self.send_json(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+        self.send_body(200, body)
+
+    def send_json(self, status, answer):
+        self.send_body(status, _encode(answer))
+
+    def send_body(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+
+def serve(port=8765, workers=None, entries=CACHE_ENTRIES, verbose=False):
+    service = QueryService(workers, entries)
+    handler = type('Handler', (QueryHandler,), {'service': service, 'verbose': verbose})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    print(f"Serving on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve positions, orbits and events over HTTP on localhost")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--cache", type=int, default=CACHE_ENTRIES, help="cached responses")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args()
+    serve(args.port, args.workers, args.cache, args.verbose)
+
+
+if __name__ == '__main__':
+    main()
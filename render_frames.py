@@ -0,0 +1,293 @@
+"""Render a date range to a PNG sequence without a window, on several processes.
+
+    python render_frames.py frames --start 2027-01-01 --days 365 --jobs 4 --orbit 90
+
+The ephemeris is computed once, by the parent, into a memory-mapped array
+that every worker maps read-only. Each worker process builds the app's scene
+once in its own offscreen render window and renders blocks of frames; a
+writer thread in the worker encodes and writes the PNGs while the next frames
+render. A frame depends only on its index, so blocks can go to any worker.
+The sequence can then be encoded with e.g.
+
+    ffmpeg -framerate 30 -i frames/frame_%05d.png -pix_fmt yuv420p orbits.mp4
+"""
+import argparse
+import contextlib
+import glob
+import io
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import get_context
+
+import numpy as np
+from vtkmodules.vtkIOImage import vtkPNGWriter
+from vtkmodules.vtkCommonDataModel import vtkImageData
+from vtkmodules.vtkRenderingCore import vtkRenderer, vtkRenderWindow, vtkWindowToImageFilter
+
+import ephemeris
+from body_registry import BodyRegistry
+from chebyshev import ChebyshevEphemeris, DEFAULT_FILE as CHEBYSHEV_FILE
+from scene import SolarSystemScene
+from spk import SPKKernel
+
+BLOCK = 32  # frames per task; a worker waits for its writer once per block
+QUEUE_DEPTH = 8  # rendered frames a worker may hold ahead of its writer
+
+
+class OffscreenScene(SolarSystemScene):
+    """The app's scene without Qt: same bodies, textures, orbits and labels"""
+
+    def __init__(self, physics, width=1280, height=720):
+        self.scale_factor = 1e10
+        self.sun_mass_scale = physics['sun_mass_scale']
+        self.physics = dict(physics)
+        self.bodies = BodyRegistry()
+        self.renderer = vtkRenderer()
+        self.renderer.SetBackground(0.0, 0.0, 0.0)
+        self.size = (width, height)
+        self.render_window = None
+        self.orbit_paths = None
+        self.orbit_actor = None
+        self.table_bodies = []
+        # add_celestial_body prints a line per body
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.initialize_planets()
+            self.trajectories = self.add_tabulated_bodies()
+
+    def open_window(self, orbits, labels=True, stars=True):
+        """Finish the scene in an offscreen window; orbits come from compute_frame"""
+        self.render_window = vtkRenderWindow()
+        self.render_window.SetOffScreenRendering(1)
+        self.render_window.SetSize(*self.size)
+        self.render_window.AddRenderer(self.renderer)
+        self.add_lights()
+        self.update_sun_size()
+        # every worker would repeat the texture and background messages
+        with contextlib.redirect_stdout(io.StringIO()):
+            for body in self.bodies:
+                self.load_body_texture(body)
+            if stars:
+                self.add_stars_background()
+        self.create_orbit_paths(orbits)
+        if labels:
+            self.add_labels()
+        # keep near bodies when the far plane is out at the star sphere
+        self.renderer.SetNearClippingPlaneTolerance(1e-4)
+
+    def show(self, positions, day, elapsed):
+        """Move every actor to positions (n, 3) in meters, rotated for elapsed days.
+
+        Bodies known only from their tables are hidden where the tables do
+        not cover day, as in the app.
+        """
+        bodies = self.bodies
+        bodies.position[...] = positions
+        bodies.rotation_angle[...] = 0.0
+        self.update_planet_rotations(elapsed)
+        for body in bodies:
+            self.update_actor_position(body)
+        for body_id, trajectory in self.table_bodies:
+            shown = trajectory.covers(day, self.physics)
+            for actor in (bodies.actor[body_id], bodies.axis_actor[body_id], bodies.label[body_id]):
+                if actor is not None:
+                    actor.SetVisibility(shown)
+            if self.orbit_paths is not None and bool(self.orbit_paths.hidden[body_id]) == shown:
+                self.orbit_paths.set_visible(body_id, shown)
+        if self.orbit_paths is not None:
+            self.orbit_paths.follow(bodies.position)
+
+    def place_camera(self, fraction, orbit=0.0, zoom=1.0, follow=None):
+        """The default view turned by orbit * fraction degrees, optionally centered on a body"""
+        camera = self.renderer.GetActiveCamera()
+        self.set_default_view()
+        camera.Azimuth(orbit * fraction)
+        camera.Dolly(zoom)
+        if follow is not None:
+            offset = self.bodies[follow].position / self.scale_factor
+            camera.SetFocalPoint(*(np.array(camera.GetFocalPoint()) + offset))
+            camera.SetPosition(*(np.array(camera.GetPosition()) + offset))
+        self.renderer.ResetCameraClippingRange()
+
+
+def load_sources():
+    """Precomputed ephemerides from the working directory, as the app uses them"""
+    sources = []
+    for path in sorted(glob.glob("*.bsp")):
+        try:
+            sources.append(SPKKernel(path))
+        except (OSError, ValueError) as e:
+            print(f"Could not load {path}: {e}")
+    if os.path.exists(CHEBYSHEV_FILE):
+        try:
+            sources.append(ChebyshevEphemeris.load(CHEBYSHEV_FILE))
+        except (OSError, ValueError) as e:
+            print(f"Could not load {CHEBYSHEV_FILE}: {e}")
+    return sources
+
+
+def compute_ephemeris(names, parents, days, physics, path, tables=()):
+    """Displayed positions of every frame into a .npy file; returns the orbits of the first.
+
+    tables are the TabulatedTrajectory sources of the scene; as in the app
+    they take precedence over the kernels and Chebyshev segments.
+    """
+    tree = ephemeris.BodyTree(names, parents)
+    sources = list(tables) + load_sources()
+    positions = np.lib.format.open_memmap(path, mode='w+', shape=(len(days), len(names), 3))
+    elements = np.zeros((len(names), len(ephemeris.ELEMENT_KEYS)))
+    orbits = np.zeros((len(names), ephemeris.ORBIT_POINTS + 1, 3))
+    for k, day in enumerate(days):
+        covering = [source for source in sources if source.covers(day, physics)]
+        ephemeris.compute_frame(tree, day, physics, positions[k], elements, orbits if k == 0 else None,
+                                sources=covering)
+    positions.flush()
+    del positions
+    for source in sources:
+        if hasattr(source, 'close'):
+            source.close()
+    return orbits
+
+
+# per-process state of a render worker
+_worker = None
+
+
+class _Worker:
+
+    def __init__(self, ephemeris_path, days, orbits, options):
+        self.positions = np.load(ephemeris_path, mmap_mode='r')
+        self.days = days
+        self.options = options
+        self.scene = OffscreenScene(options['physics'], options['width'], options['height'])
+        self.scene.open_window(orbits, options['labels'], options['stars'])
+        self.grabber = vtkWindowToImageFilter()
+        self.grabber.SetInput(self.scene.render_window)
+        self.grabber.SetInputBufferTypeToRGB()
+        self.grabber.ReadFrontBufferOff()
+        self.pending = queue.Queue(maxsize=QUEUE_DEPTH)
+        # the first failure of the writer thread, raised again by render()
+        self.error = None
+        # the PNG writer releases the GIL, so writing overlaps the next render
+        threading.Thread(target=self.write_frames, daemon=True).start()
+
+    def write_frames(self):
+        writer = vtkPNGWriter()
+        while True:
+            path, image = self.pending.get()
+            try:
+                if self.error is None:
+                    writer.SetFileName(path)
+                    writer.SetInputData(image)
+                    writer.Write()
+                    # VTK reports write failures through its error code, not exceptions
+                    if writer.GetErrorCode():
+                        raise OSError(f"Could not write {path}")
+            except Exception as e:
+                self.error = e
+            finally:
+                self.pending.task_done()
+
+    def render(self, first, stop):
+        options = self.options
+        last = max(len(self.days) - 1, 1)
+        for k in range(first, stop):
+            if self.error is not None:
+                break
+            self.scene.show(self.positions[k], self.days[k], self.days[k] - self.days[0])
+            self.scene.place_camera(k / last, options['orbit'], options['zoom'], options['follow'])
+            self.scene.render_window.Render()
+            self.grabber.Modified()
+            self.grabber.Update()
+            image = vtkImageData()
+            image.DeepCopy(self.grabber.GetOutput())
+            self.pending.put((os.path.join(options['output'], f"frame_{k:05d}.png"), image))
+        self.pending.join()
+        if self.error is not None:
+            raise self.error
+        return stop - first
+
+
+def _start_worker(ephemeris_path, days, orbits, options):
+    global _worker
+    _worker = _Worker(ephemeris_path, days, orbits, options)
+
+
+def _render_block(first, stop):
+    return _worker.render(first, stop)
+
+
+def render_frames(output, days, physics=None, jobs=None, width=1280, height=720, orbit=0.0, zoom=1.0,
+                  follow=None, labels=True, stars=True):
+    """Render one PNG per day number in days into the directory output"""
+    physics = dict(ephemeris.DEFAULT_PHYSICS if physics is None else physics)
+    days = np.asarray(days, dtype=float)
+    jobs = jobs or os.cpu_count() or 1
+    os.makedirs(output, exist_ok=True)
+
+    scene = OffscreenScene(physics)
+    if follow is not None and follow not in scene.bodies:
+        raise ValueError(f"Unknown body {follow}")
+    names, parents = scene.bodies.names, scene.bodies.parent_names()
+
+    start_time = time.perf_counter()
+    handle, ephemeris_path = tempfile.mkstemp(suffix='.npy', dir=output)
+    os.close(handle)
+    try:
+        orbits = compute_ephemeris(names, parents, days, physics, ephemeris_path, scene.trajectories)
+        print(f"Ephemeris for {len(days)} frames in {time.perf_counter() - start_time:.2f} s")
+
+        options = dict(output=output, physics=physics, width=width, height=height, orbit=orbit, zoom=zoom,
+                       follow=follow, labels=labels, stars=stars)
+        done = 0
+        # spawn: a forked VTK/OpenGL context is not safe to reuse
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=get_context('spawn'), initializer=_start_worker,
+                                 initargs=(ephemeris_path, days, orbits, options)) as pool:
+            blocks = [pool.submit(_render_block, first, min(first + BLOCK, len(days)))
+                      for first in range(0, len(days), BLOCK)]
+            for block in as_completed(blocks):
+                done += block.result()
+                print(f"Rendered {done}/{len(days)} frames")
+    finally:
+        os.remove(ephemeris_path)
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Wrote {len(days)} frames to {output} in {elapsed:.1f} s "
+          f"({len(days) / elapsed:.1f} frames/s on {jobs} processes)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a date range to an image sequence")
+    parser.add_argument("output", help="directory for frame_00000.png, ...")
+    parser.add_argument("--start", help="first date, YYYY-MM-DD (default today)")
+    parser.add_argument("--days", type=float, default=365.0, help="length of the range in days")
+    parser.add_argument("--step", type=float, default=1.0, help="days between frames")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--size", default="1280x720", help="frame size, WIDTHxHEIGHT")
+    parser.add_argument("--orbit", type=float, default=0.0, help="degrees the camera turns over the range")
+    parser.add_argument("--zoom", type=float, default=1.0, help="camera dolly factor, > 1 moves closer")
+    parser.add_argument("--follow", help="keep this body at the center of the view")
+    parser.add_argument("--no-labels", action="store_true")
+    parser.add_argument("--no-stars", action="store_true")
+    parser.add_argument("--sun-mass", type=float, default=1.0, help="Sun mass multiplier")
+    parser.add_argument("--g", type=float, default=1.0, help="G multiplier")
+    parser.add_argument("--eccentricity", type=float, default=1.0, help="eccentricity multiplier")
+    parser.add_argument("--inclination", type=float, default=1.0, help="inclination multiplier")
+    args = parser.parse_args()
+
+    start_date = datetime.strptime(args.start, "%Y-%m-%d") if args.start else datetime.now()
+    start = (start_date - datetime(2000, 1, 1)).total_seconds() / 86400.0
+    days = start + args.step * np.arange(int(args.days / args.step) + 1)
+    width, height = (int(v) for v in args.size.lower().split("x"))
+    physics = dict(sun_mass_scale=args.sun_mass, G_multiplier=args.g, ecc_multiplier=args.eccentricity,
+                   inc_multiplier=args.inclination)
+    render_frames(args.output, days, physics, args.jobs, width, height, args.orbit, args.zoom, args.follow,
+                  labels=not args.no_labels, stars=not args.no_stars)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,507 @@
+"""Building the solar system scene in a VTK renderer, without Qt.
+
+SolarSystemScene holds the scene-building methods shared by the app window
+and the offscreen frame renderer. Subclasses provide renderer, bodies (a
+BodyRegistry), scale_factor, sun_mass_scale, orbit_paths, orbit_actor and
+table_bodies.
+"""
+import math
+import os
+
+import numpy as np
+from vtkmodules.vtkFiltersSources import vtkCylinderSource, vtkSphereSource
+from vtkmodules.vtkFiltersTexture import vtkTextureMapToSphere
+from vtkmodules.vtkIOImage import vtkJPEGReader, vtkPNGReader
+from vtkmodules.vtkRenderingCore import vtkActor, vtkBillboardTextActor3D, vtkLight, vtkPolyDataMapper, vtkTexture
+import vtkmodules.vtkRenderingFreeType  # noqa: F401 (text rendering for labels)
+import vtkmodules.vtkRenderingOpenGL2  # noqa: F401 (render window backend)
+
+import ephemeris
+from gravity_field import G
+from orbit_paths import OrbitPaths
+from tabulated import TabulatedTrajectory, ORDER as TABLE_ORDER, TRAJECTORY_FILE, read_manifest
+
+
+class SolarSystemScene:
+    """Bodies, textures, lights, stars, labels and orbit paths in self.renderer"""
+
+    def initialize_planets(self):
+      self.add_celestial_body(
+          name="Sun",
+          mass=1.989e30,
+          radius=696340000,
+          color=(1.0, 1.0, 0.7),
+          visual_scale=3.0,
+          texture_path="sun_texture.jpg",
+          rotation_period=609.6,  #  ~25.4 day
+          axial_tilt=7.25
+      )
+
+      # Mercury
+      self.add_celestial_body(
+          name="Mercury",
+          mass=0.330e24,
+          radius=4879000/2,
+          color=(0.8, 0.8, 0.8),
+          visual_scale=3.0,
+          texture_path="mercury_texture.jpg",
+          rotation_period=1407.6,
+          axial_tilt=0.03
+      )
+
+      # Venus
+      self.add_celestial_body(
+          name="Venus",
+          mass=4.87e24,
+          radius=12104000/2,
+          color=(0.9, 0.8, 0.6),
+          visual_scale=3.0,
+          texture_path="venus_texture.jpg",
+          rotation_period=-5832.5,
+          axial_tilt=2.64
+      )
+
+      # Earth
+      self.add_celestial_body(
+          name="Earth",
+          mass=5.97e24,
+          radius=12756000/2,
+          color=(0.2, 0.4, 0.8),
+          visual_scale=3.0,
+          texture_path="earth_texture.jpg",
+          rotation_period=23.9,
+          axial_tilt=23.44
+      )
+
+      self.add_celestial_body(
+        name="Moon",
+        mass=7.34767309e22,
+        radius=3476000/2,
+        color=(0.8, 0.8, 0.8),
+        visual_scale=3.0,
+        texture_path="moon_texture.jpg",
+        rotation_period=655.7,
+        axial_tilt=6.68,
+        parent_body="Earth"
+    )
+
+      # Lunar Reconnaissance Orbiter, too small to see at true scale
+      self.add_celestial_body(
+          name="LRO",
+          mass=1916,
+          radius=2.0,
+          color=(0.9, 0.9, 0.95),
+          rotation_period=0.0,
+          axial_tilt=0.0,
+          parent_body="Moon",
+          visual_radius=0.12
+      )
+
+      # Mars
+      self.add_celestial_body(
+          name="Mars",
+          mass=0.642e24,
+          radius=6792000/2,
+          color=(0.9, 0.3, 0.2),
+          visual_scale=3.0,
+          texture_path="mars_texture.jpg",
+          rotation_period=24.6,
+          axial_tilt=25.19
+      )
+
+      # Jupiter
+      self.add_celestial_body(
+          name="Jupiter",
+          mass=1898e24,  # From fact sheet
+          radius=142984000/2,  # From fact sheet
+          color=(0.9, 0.75, 0.6),
+          visual_scale=3.0,
+          texture_path="jupiter_texture.jpg",
+          rotation_period=9.9,  # Very fast rotation
+          axial_tilt=3.13
+      )
+
+      # Galilean moons, all in synchronous rotation
+      for name, mass, radius, color, rotation_period in [
+          ("Io", 8.93e22, 1821600, (0.9, 0.8, 0.3), 42.5),
+          ("Europa", 4.80e22, 1560800, (0.85, 0.8, 0.7), 85.2),
+          ("Ganymede", 1.48e23, 2634100, (0.6, 0.55, 0.5), 171.7),
+          ("Callisto", 1.08e23, 2410300, (0.45, 0.4, 0.35), 400.5),
+      ]:
+          self.add_celestial_body(name=name, mass=mass, radius=radius, color=color, visual_scale=3.0,
+                                  rotation_period=rotation_period, axial_tilt=0.0, parent_body="Jupiter")
+
+      # Saturn
+      self.add_celestial_body(
+          name="Saturn",
+          mass=568e24,  # From fact sheet
+          radius=120536000/2,  # From fact sheet
+          color=(0.9, 0.8, 0.6),
+          visual_scale=3.0,
+          texture_path="saturn_texture.jpg",
+          rotation_period=10.7,  # Also fast rotation
+          axial_tilt=26.73
+      )
+
+      # Major moons of Saturn, synchronous rotation
+      for name, mass, radius, color, rotation_period in [
+          ("Mimas", 3.75e19, 198200, (0.75, 0.75, 0.75), 22.6),
+          ("Enceladus", 1.08e20, 252100, (0.95, 0.95, 0.95), 32.9),
+          ("Tethys", 6.17e20, 531100, (0.85, 0.85, 0.85), 45.3),
+          ("Dione", 1.095e21, 561400, (0.8, 0.8, 0.8), 65.7),
+          ("Rhea", 2.31e21, 763800, (0.75, 0.75, 0.7), 108.4),
+          ("Titan", 1.345e23, 2574700, (0.9, 0.7, 0.3), 382.7),
+      ]:
+          self.add_celestial_body(name=name, mass=mass, radius=radius, color=color, visual_scale=3.0,
+                                  rotation_period=rotation_period, axial_tilt=0.0, parent_body="Saturn")
+
+
+      # Uranus
+      self.add_celestial_body(
+          name="Uranus",
+          mass=86.8e24,  # From fact sheet
+          radius=51118000/2,  # From fact sheet
+          color=(0.6, 0.8, 0.9),
+          visual_scale=3.0,
+          texture_path="uranus_texture.jpg",
+          rotation_period=-17.2,  # Negative indicates retrograde rotation
+          axial_tilt=82.23
+      )
+
+      # Neptune
+      self.add_celestial_body(
+          name="Neptune",
+          mass=102e24,  # From fact sheet
+          radius=49528000/2,  # From fact sheet
+          color=(0.2, 0.3, 0.9),
+          visual_scale=3.0,
+          texture_path="neptune_texture.jpg",
+          rotation_period=16.1,
+          axial_tilt=28.32
+      )
+
+      # Comet Halley and the interstellar object 'Oumuamua (hyperbolic orbit)
+      self.add_celestial_body(
+          name="Halley",
+          mass=2.2e14,
+          radius=5500,
+          color=(0.8, 0.85, 0.9),
+          rotation_period=52.8,
+          axial_tilt=0.0,
+          visual_radius=0.15
+      )
+      self.add_celestial_body(
+          name="Oumuamua",
+          mass=8e9,
+          radius=100,
+          color=(0.7, 0.45, 0.35),
+          rotation_period=7.3,
+          axial_tilt=0.0,
+          visual_radius=0.15
+      )
+
+      # After adding all planets, populate the selection dropdown
+      self.populate_planet_dropdown()
+
+    def populate_planet_dropdown(self):
+        """Called once every body is added; the app fills its selection dropdown"""
+        pass
+
+    def add_celestial_body(self, name, mass, radius, color, visual_scale=1.0, texture_path=None, rotation_period=24.0, axial_tilt=0.0,parent_body=None, visual_radius=None):
+
+        sphere = vtkSphereSource()
+
+        if visual_radius is None:
+            visual_radius = 0.3 * math.log10(1 + radius / 1e6) * visual_scale
+        body_id = self.bodies.add(name, mass, radius, color, visual_radius, rotation_period=rotation_period,
+                                  axial_tilt=axial_tilt, parent_body=parent_body, texture_path=texture_path)
+        body = self.bodies.view(body_id)
+
+        sphere.SetRadius(visual_radius)
+        sphere.SetThetaResolution(30)
+        sphere.SetPhiResolution(30)
+        sphere.Update()
+
+        text_map = vtkTextureMapToSphere()
+        text_map.SetInputConnection(sphere.GetOutputPort())
+        text_map.PreventSeamOn()
+
+        mapper = vtkPolyDataMapper()
+        mapper.SetInputConnection(text_map.GetOutputPort())
+
+        actor = vtkActor()
+        actor.SetMapper(mapper)
+
+        # textures are loaded after the first frame, see load_body_texture
+        actor.GetProperty().SetColor(color)
+
+        actor.GetProperty().SetAmbient(0.3)
+        actor.GetProperty().SetDiffuse(0.8)
+        actor.GetProperty().SetSpecular(0.2)
+        actor.GetProperty().SetSpecularPower(10)
+        self.renderer.AddActor(actor)
+        body.actor = actor
+
+        vis = visual_radius
+        axis_mapper = vtkPolyDataMapper()
+        cyl = vtkCylinderSource()
+        cyl.SetRadius(vis * 0.02)
+        cyl.SetHeight(vis * 3.0)
+        cyl.SetResolution(12)
+        cyl.Update()
+        axis_mapper.SetInputConnection(cyl.GetOutputPort())
+        axis_actor = vtkActor()
+        axis_actor.SetMapper(axis_mapper)
+        axis_actor.GetProperty().SetColor(1.0, 0.2, 0.2)
+        axis_actor.GetProperty().SetAmbient(1.0)
+        axis_actor.RotateX(90)
+        self.renderer.AddActor(axis_actor)
+        body.axis_actor = axis_actor
+
+        print(f"Added {name}")
+        return body
+
+    def add_tabulated_bodies(self):
+        """Bodies listed in trajectories.json; returns their tables as ephemeris sources.
+
+        Bodies known only from a table are added to the scene and recorded
+        in self.table_bodies with their tables.
+        """
+        if not os.path.exists(TRAJECTORY_FILE):
+            return []
+        try:
+            entries = read_manifest(TRAJECTORY_FILE)
+        except (OSError, ValueError) as e:
+            print(f"Could not load {TRAJECTORY_FILE}: {e}")
+            return []
+
+        trajectories = []
+        bodies = self.bodies
+        for entry in entries:
+            name, center = entry['name'], entry.get('center')
+            if center is not None and center not in bodies:
+                print(f"Skipping {name}: unknown center {center}")
+                continue
+            if name in bodies and bodies[name].parent_body != center:
+                print(f"Skipping {name}: it orbits {bodies[name].parent_body or 'the Sun'}, not {center}")
+                continue
+            mass = bodies[name].mass if name in bodies else entry.get('mass', 0.0)
+            gm = G * (bodies[center or 'Sun'].mass + mass)
+            try:
+                trajectory = TabulatedTrajectory.load(name, entry['table'], center, gm, entry.get('column'),
+                                                      entry.get('order', TABLE_ORDER))
+            except (OSError, ValueError) as e:
+                print(f"Could not load {entry['table']}: {e}")
+                continue
+
+            if name not in bodies:
+                body = self.add_celestial_body(
+                    name, mass, entry.get('radius', 1.0), tuple(entry.get('color', (0.9, 0.9, 0.9))),
+                    rotation_period=0.0, axial_tilt=0.0, parent_body=center,
+                    visual_radius=entry.get('visual_radius', 0.1))
+                # without elements of its own the body only exists where its table does
+                self.table_bodies.append((body.id, trajectory))
+            trajectories.append(trajectory)
+            print(f"Loaded {entry['table']}: {name}, {trajectory.rows} rows, "
+                  f"days {trajectory.start:.1f} to {trajectory.stop:.1f}")
+        return trajectories
+
+    def load_body_texture(self, body):
+        name = body.name
+        texture_path = body.texture_path
+        actor = body.actor
+        if texture_path and os.path.exists(texture_path):
+            try:
+                extension = texture_path.split('.')[-1].lower()
+                if extension == 'jpg' or extension == 'jpeg':
+                    reader = vtkJPEGReader()
+                elif extension == 'png':
+                    reader = vtkPNGReader()
+                else:
+                    raise ValueError(f"Unsupported texture format: {extension}")
+
+                reader.SetFileName(texture_path)
+                reader.Update()
+
+                texture = vtkTexture()
+                texture.SetInputConnection(reader.GetOutputPort())
+                texture.InterpolateOn()
+
+                actor.SetTexture(texture)
+                actor.GetProperty().SetColor(1.0, 1.0, 1.0)
+
+                #print(f"Texture applied to {name} successfully")
+            except Exception as e:
+                #print(f"Error loading texture for {name}: {e}. Using color instead.")
+                pass
+        elif texture_path:
+            print(f"Texture file for {name} not found at {texture_path}. Using color.")
+
+    def add_lights(self):
+        # Add light for sun
+        self.sun_light = vtkLight()
+        self.sun_light.SetPosition(0, 0, 0)
+        self.sun_light.SetColor(1.0, 1.0, 1.0)
+        self.sun_light.SetIntensity(3.0)
+        self.renderer.AddLight(self.sun_light)
+        ambient_light = vtkLight()
+        ambient_light.SetColor(1.0, 1.0, 1.0)
+        ambient_light.SetIntensity(0.8)
+        ambient_light.SetPositional(False)
+        self.renderer.AddLight(ambient_light)
+
+        headlight = vtkLight()
+        headlight.SetLightTypeToHeadlight()
+        headlight.SetIntensity(0.6)
+        headlight.SetColor(1.0, 1.0, 1.0)
+        self.renderer.AddLight(headlight)
+
+    def add_stars_background(self):
+        try:
+            stars_reader = vtkJPEGReader()
+            stars_reader.SetFileName("background_stars.jpg")
+            stars_reader.Update()
+
+            sphere = vtkSphereSource()
+            sphere.SetThetaResolution(32)
+            sphere.SetPhiResolution(32)
+            sphere.SetRadius(5000)
+            sphere.Update()
+
+            sphere_texture = vtkTextureMapToSphere()
+            sphere_texture.SetInputConnection(sphere.GetOutputPort())
+            sphere_texture.PreventSeamOn()
+
+            #map
+            sphere_mapper = vtkPolyDataMapper()
+            sphere_mapper.SetInputConnection(sphere_texture.GetOutputPort())
+            #actor
+            sphere_actor = vtkActor()
+            sphere_actor.SetMapper(sphere_mapper)
+            # texture
+            texture = vtkTexture()
+            texture.SetInputConnection(stars_reader.GetOutputPort())
+            texture.InterpolateOn()
+            sphere_actor.SetTexture(texture)
+
+            sphere_actor.GetProperty().SetOpacity(1.0)
+            sphere_actor.GetProperty().SetAmbient(1.0)
+            sphere_actor.GetProperty().BackfaceCullingOff()
+            sphere_actor.GetProperty().FrontfaceCullingOn()
+
+            # Add to renderer
+            self.renderer.AddActor(sphere_actor)
+            print("Stars background added")
+        except Exception as e:
+            print(f"Error stars background: {e}")
+
+    def set_default_view(self):
+        camera = self.renderer.GetActiveCamera()
+        camera.SetPosition(40, -60, 40)
+        camera.SetFocalPoint(0, 0, 0)
+        camera.SetViewUp(0, 0, 1)
+        camera.Azimuth(30)
+        camera.Elevation(20)
+
+    def add_labels(self):
+        for body in self.bodies:
+            name = body.name
+            pos = list(body.actor.GetPosition())
+            pos[2] += 0.3
+
+            follower = vtkBillboardTextActor3D()
+            follower.SetInput(name)
+            follower.SetPosition(pos)
+            follower.GetTextProperty().SetColor(1.0, 1.0, 1.0)
+            follower.GetTextProperty().SetFontSize(14)
+            follower.GetTextProperty().SetJustificationToCentered()
+            follower.GetTextProperty().SetVerticalJustificationToCentered()
+            follower.GetTextProperty().SetBold(True)
+
+            if hasattr(self, 'show_labels_checkbox'):
+                if self.show_labels_checkbox.isChecked():
+                    follower.VisibilityOn()
+                else:
+                    follower.VisibilityOff()
+
+            self.renderer.AddActor(follower)
+            body.label = follower
+
+    def create_orbit_paths(self, orbits):
+        """Write orbits (bodies, ORBIT_POINTS + 1, 3), relative to the parents, into the orbit polydata"""
+        bodies = self.bodies
+        if self.orbit_paths is None or self.orbit_paths.count != bodies.count:
+            self.remove_orbit_paths()
+            self.orbit_paths = OrbitPaths(bodies.parent, bodies.color, ephemeris.ORBIT_POINTS + 1,
+                                          self.scale_factor)
+            self.orbit_paths.set_visible(bodies.ids['Sun'], False)
+
+            mapper = vtkPolyDataMapper()
+            mapper.SetInputData(self.orbit_paths.polydata)
+            mapper.SetScalarModeToUseCellData()
+            mapper.SetColorModeToDirectScalars()
+
+            self.orbit_actor = vtkActor()
+            self.orbit_actor.SetMapper(mapper)
+            self.orbit_actor.GetProperty().SetLineWidth(2.0)
+            if hasattr(self, 'show_orbits_checkbox'):
+                self.orbit_actor.SetVisibility(self.show_orbits_checkbox.isChecked())
+            self.renderer.AddActor(self.orbit_actor)
+
+        self.orbit_paths.set_orbits(orbits, bodies.position)
+
+    def remove_orbit_paths(self):
+        if self.orbit_actor is not None:
+            self.renderer.RemoveActor(self.orbit_actor)
+            self.orbit_actor = None
+            self.orbit_paths = None
+
+    def update_planet_rotations(self, time_step=1.0):
+      period = self.bodies.rotation_period
+      spinning = np.abs(period) >= 0.001
+
+      # degrees per day, negative for retrograde rotation
+      rotation_per_day = np.zeros_like(period)
+      rotation_per_day[spinning] = 24.0 / period[spinning] * 360.0
+
+      angle = self.bodies.rotation_angle
+      angle += rotation_per_day * time_step
+      angle %= 360.0
+
+    def update_actor_position(self, body):
+      scaled_position = body.position / self.scale_factor
+      actor = body.actor
+      if actor is not None:
+          actor.SetPosition(0, 0, 0)
+          actor.SetOrientation(0, 0, 0)
+
+          # Apply rotation
+          actor.RotateZ(body.rotation_angle)
+
+          # Apply axial tilt
+          actor.RotateY(body.axial_tilt)
+
+          #set pos
+          actor.SetPosition(scaled_position)
+
+      ax = body.axis_actor
+      if ax is not None:
+          ax.SetPosition(scaled_position)
+          # Orient axis Y to Z, then apply tilt
+          ax.SetOrientation(90 + body.axial_tilt, 0.0, 0.0)
+
+      if body.label is not None:
+          body.label.SetPosition(scaled_position + (0.0, 0.0, 0.3))
+
+    def update_sun_size(self):
+        if "Sun" in self.bodies:
+            sun = self.bodies["Sun"]
+            original_scale = 3.0
+
+            new_scale = original_scale * (self.sun_mass_scale ** 0.33)
+            if sun.actor:
+                sun.actor.SetScale(new_scale / original_scale)
+
+                axis = sun.axis_actor
+                if axis:
+                    axis.SetScale(new_scale / original_scale)
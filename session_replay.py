@@ -0,0 +1,306 @@
+"""Record UI sessions of the app and replay them as benchmarks.
+
+    python session_replay.py record session.jsonl
+    python session_replay.py play session.jsonl --max-speed --headless --report timings.json
+
+Recording starts once the scene is complete. The starting state is saved as
+a checkpoint next to the log (session.ckpt), and every user input is logged
+as one JSON line with its time in seconds: slider values, spin boxes, combo
+boxes, check boxes, button clicks and camera moves. Playback ticks are logged
+too, and on replay they drive advance_time instead of the animation timer,
+so playback replays frame for frame even at maximum speed. Replaying sets the
+same widgets, so the app's own handlers run as they did for the user.
+
+The replayer restores the checkpoint, feeds the log at its original pace (or
+a multiple of it, or as fast as the event loop allows) and reports render
+times, intervals between computed frames, and the latency from each input to
+the next computed frame.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QApplication, QCheckBox, QComboBox
+
+from orbital_fw import SolarSystemApp
+
+VERSION = 1
+
+# widgets whose value is logged, and the buttons whose clicks are
+VALUE_WIDGETS = (
+    'slider', 'mass_spin', 'g_spin', 'ecc_spin', 'inc_spin', 'trail_spin',
+    'speed_combo', 'planet_combo', 'event_kind_combo', 'interpolate_checkbox',
+    'show_orbits_checkbox', 'show_labels_checkbox', 'show_trails_checkbox', 'show_gravity_checkbox',
+)
+BUTTONS = ('play_button', 'reset_button', 'apply_physics_btn', 'reset_physics_btn',
+           'previous_event_button', 'next_event_button')
+SETTLE = 0.5  # seconds to wait for the last frame after the last input
+
+
+def checkpoint_path(path):
+    return os.path.splitext(path)[0] + '.ckpt'
+
+
+def _camera_state(camera):
+    return {'position': camera.GetPosition(), 'focal_point': camera.GetFocalPoint(),
+            'view_up': camera.GetViewUp(), 'view_angle': camera.GetViewAngle()}
+
+
+def _value(widget):
+    if isinstance(widget, QComboBox):
+        return widget.currentText()
+    if isinstance(widget, QCheckBox):
+        return widget.isChecked()
+    return widget.value()
+
+
+def _changed_signal(widget):
+    if isinstance(widget, QComboBox):
+        return widget.currentTextChanged
+    if isinstance(widget, QCheckBox):
+        return widget.stateChanged
+    return widget.valueChanged
+
+
+class SessionRecorder:
+    """Appends the user's inputs to a JSON-lines log"""
+
+    def __init__(self, app, path):
+        self.app = app
+        self.path = path
+        self.file = None
+        self.start_time = None
+
+    def start(self):
+        """Save the starting state and begin logging (call once the scene is complete)"""
+        self.app.capture_checkpoint().save(checkpoint_path(self.path))
+        self.file = open(self.path, 'w')
+        self.write({'version': VERSION, 'checkpoint': os.path.basename(checkpoint_path(self.path))})
+        self.start_time = time.perf_counter()
+
+        app = self.app
+        for name in VALUE_WIDGETS:
+            widget = getattr(app, name)
+            _changed_signal(widget).connect(lambda *args, name=name, widget=widget: self.on_value(name, widget))
+        for name in BUTTONS:
+            getattr(app, name).clicked.connect(lambda checked=False, name=name: self.log({'click': name}))
+        app.animation_timer.timeout.connect(lambda: self.log({'tick': True}))
+        app.interactor.GetInteractorStyle().AddObserver('EndInteractionEvent', self.on_camera)
+        print(f"Recording to {self.path}")
+
+    def on_value(self, name, widget):
+        # while playing, slider steps come from the animation timer and are logged as ticks
+        if name == 'slider' and self.app.animation_active and not widget.isSliderDown():
+            return
+        self.log({'widget': name, 'value': _value(widget)})
+
+    def on_camera(self, caller, event):
+        self.log({'camera': _camera_state(self.app.renderer.GetActiveCamera())})
+
+    def log(self, entry):
+        self.write(dict(t=round(time.perf_counter() - self.start_time, 4), **entry))
+
+    def write(self, entry):
+        self.file.write(json.dumps(entry) + '\n')
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_session(path):
+    """(header, entries) of a recorded log"""
+    with open(path) as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get('version') != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} session log")
+    return lines[0], lines[1:]
+
+
+class FrameTimings:
+    """Render durations, computed-frame arrivals and input times, in seconds"""
+
+    def __init__(self):
+        self.render_start = None
+        self.render_time = []
+        self.frame_time = []
+        self.input_time = []
+
+    def attach(self, app):
+        app.render_window.AddObserver('StartEvent', self.on_render_start)
+        app.render_window.AddObserver('EndEvent', self.on_render_end)
+        app.compute_worker.frame_ready.connect(lambda request: self.frame_time.append(time.perf_counter()))
+
+    def on_render_start(self, caller, event):
+        self.render_start = time.perf_counter()
+
+    def on_render_end(self, caller, event):
+        if self.render_start is not None:
+            self.render_time.append(time.perf_counter() - self.render_start)
+            self.render_start = None
+
+    def summary(self, wall_time):
+        """Milliseconds at the median, 95th percentile and maximum for each measure"""
+        frames = np.array(self.frame_time)
+        inputs = np.array(self.input_time)
+        # latency of each input that was followed by a computed frame
+        k = np.searchsorted(frames, inputs)
+        answered = k < len(frames)
+        latency = frames[k[answered]] - inputs[answered]
+
+        def stats(values):
+            values = np.asarray(values) * 1000.0
+            if not len(values):
+                return None
+            return {'median': float(np.median(values)), 'p95': float(np.percentile(values, 95)),
+                    'max': float(values.max())}
+
+        return {
+            'wall_time_s': wall_time,
+            'inputs': len(inputs),
+            'frames': len(frames),
+            'renders': len(self.render_time),
+            'render_ms': stats(self.render_time),
+            'frame_interval_ms': stats(np.diff(frames)),
+            'input_to_frame_ms': stats(latency),
+            'unanswered_inputs': int((~answered).sum()),
+        }
+
+
+class SessionReplayer:
+    """Drives the app from a recorded log and collects FrameTimings"""
+
+    def __init__(self, app, path, speed=1.0, on_finished=None):
+        self.app = app
+        self.header, self.entries = read_session(path)
+        self.checkpoint = os.path.join(os.path.dirname(path), self.header['checkpoint'])
+        self.speed = speed  # None: as fast as possible
+        self.on_finished = on_finished
+        self.timings = FrameTimings()
+        self.next_entry = 0
+        self.start_time = None
+
+    def start(self):
+        """Restore the starting state and feed the log (call once the scene is complete)"""
+        self.app.load_checkpoint(self.checkpoint)
+        self.timings.attach(self.app)
+        self.start_time = time.perf_counter()
+        self.schedule()
+
+    def schedule(self):
+        if self.next_entry == len(self.entries):
+            QTimer.singleShot(int(SETTLE * 1000), self.finish)
+            return
+        delay = 0.0
+        if self.speed is not None:
+            due = self.entries[self.next_entry]['t'] / self.speed
+            delay = max(0.0, due - (time.perf_counter() - self.start_time))
+        QTimer.singleShot(int(delay * 1000), self.step)
+
+    def step(self):
+        entry = self.entries[self.next_entry]
+        self.next_entry += 1
+        self.timings.input_time.append(time.perf_counter())
+        self.dispatch(entry)
+        # ticks from the log stand in for the animation timer
+        if self.app.animation_timer.isActive():
+            self.app.animation_timer.stop()
+        self.schedule()
+
+    def dispatch(self, entry):
+        app = self.app
+        if 'tick' in entry:
+            app.advance_time()
+        elif 'click' in entry:
+            getattr(app, entry['click']).click()
+        elif 'camera' in entry:
+            camera = app.renderer.GetActiveCamera()
+            view = entry['camera']
+            camera.SetPosition(view['position'])
+            camera.SetFocalPoint(view['focal_point'])
+            camera.SetViewUp(view['view_up'])
+            camera.SetViewAngle(view['view_angle'])
+            app.renderer.ResetCameraClippingRange()
+            app.vtk_widget.GetRenderWindow().Render()
+        else:
+            widget = getattr(app, entry['widget'])
+            if isinstance(widget, QComboBox):
+                widget.setCurrentText(entry['value'])
+            elif isinstance(widget, QCheckBox):
+                widget.setChecked(entry['value'])
+            else:
+                widget.setValue(entry['value'])
+
+    def finish(self):
+        summary = self.timings.summary(time.perf_counter() - self.start_time)
+        if self.on_finished is not None:
+            self.on_finished(summary)
+
+
+def print_summary(summary):
+    print(f"{summary['inputs']} inputs, {summary['frames']} computed frames and {summary['renders']} renders "
+          f"in {summary['wall_time_s']:.2f} s")
+    for key, label in (('render_ms', 'render'), ('frame_interval_ms', 'frame interval'),
+                       ('input_to_frame_ms', 'input to frame')):
+        stats = summary[key]
+        if stats is not None:
+            print(f"{label:>15}: median {stats['median']:7.1f} ms, p95 {stats['p95']:7.1f} ms, "
+                  f"max {stats['max']:7.1f} ms")
+    if summary['unanswered_inputs']:
+        print(f"{summary['unanswered_inputs']} inputs were not followed by a computed frame")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record or replay an interactive session")
+    sub = parser.add_subparsers(dest='command', required=True)
+    record = sub.add_parser('record', help="run the app and log the inputs")
+    record.add_argument("session", help="log file, e.g. session.jsonl")
+    play = sub.add_parser('play', help="replay a log and report frame timings")
+    play.add_argument("session")
+    play.add_argument("--speed", type=float, default=1.0, help="multiple of the recorded pace")
+    play.add_argument("--max-speed", action="store_true", help="feed inputs as fast as the event loop allows")
+    play.add_argument("--headless", action="store_true", help="no window, render offscreen")
+    play.add_argument("--report", help="write the timings as JSON to this file")
+    play.add_argument("--stay", action="store_true", help="keep the app open after the replay")
+    args = parser.parse_args()
+
+    headless = args.command == 'play' and args.headless
+    if headless:
+        os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    qt_app = QApplication(sys.argv[:1])
+    window = SolarSystemApp()
+    if headless:
+        window.render_window.SetOffScreenRendering(1)
+    window.resize(1200, 800)
+
+    if args.command == 'record':
+        recorder = SessionRecorder(window, args.session)
+        window.deferred_steps.append(recorder.start)
+        window.show()
+        status = qt_app.exec_()
+        recorder.close()
+        sys.exit(status)
+
+    def finished(summary):
+        print_summary(summary)
+        if args.report:
+            with open(args.report, 'w') as f:
+                json.dump(summary, f, indent=2)
+        if not args.stay:
+            window.close()
+            qt_app.quit()
+
+    replayer = SessionReplayer(window, args.session, None if args.max_speed else args.speed, finished)
+    window.deferred_steps.append(replayer.start)
+    window.show()
+    sys.exit(qt_app.exec_())
+
+
+if __name__ == '__main__':
+    main()
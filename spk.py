@@ -0,0 +1,239 @@
+"""Memory-mapped reader for JPL SPK ephemeris kernels (.bsp, DAF format).
+
+The kernel is mapped, never read: the file record and segment summaries are
+decoded up front, and evaluating an epoch touches only the Chebyshev records
+that cover it, so a multi-hundred-MB kernel costs a few pages per frame.
+Segment types 2 (position) and 3 (position and velocity) are supported, which
+covers the DE planetary and the satellite kernels.
+
+Drop a kernel such as de440s.bsp into the working directory and the app
+takes positions from it instead of the mean elements, for every body the
+kernel covers, while the physics parameters are at their defaults.
+"""
+import mmap
+import struct
+
+import numpy as np
+
+import ephemeris
+from chebyshev import clenshaw, derivative_coefficients
+
+RECORD_BYTES = 1024
+SUPPORTED_TYPES = (2, 3)
+
+# NAIF integer codes of the app's bodies. Kernels without a planet's own
+# center fall back to its system barycenter (e.g. 499 -> 4 in de440s).
+NAIF_IDS = {
+    'Sun': 10, 'Mercury': 199, 'Venus': 299, 'Earth': 399, 'Moon': 301,
+    'Mars': 499, 'Jupiter': 599, 'Saturn': 699, 'Uranus': 799, 'Neptune': 899,
+    'Io': 501, 'Europa': 502, 'Ganymede': 503, 'Callisto': 504,
+    'Mimas': 601, 'Enceladus': 602, 'Tethys': 603, 'Dione': 604, 'Rhea': 605, 'Titan': 606,
+}
+
+FRAME_J2000 = 1  # Earth mean equator; the app works in the ecliptic
+FRAME_ECLIPJ2000 = 17
+OBLIQUITY_J2000 = np.radians(84381.448 / 3600.0)
+
+# SPK epochs are TDB seconds from J2000 (2000 Jan 1 12h); day numbers start at
+# 2000 Jan 1 0h. The TDB - UT offset of about a minute is ignored.
+ET_AT_DAY_ZERO = -0.5 * ephemeris.SECONDS_PER_DAY
+
+
+class Segment:
+    __slots__ = ('target', 'center', 'frame', 'data_type', 'start', 'stop',
+                 'init', 'interval', 'record_size', 'records', 'degree', 'first_word')
+
+    def __init__(self, words, summary):
+        start, stop, self.target, self.center, self.frame, self.data_type, first, last = summary
+        self.start, self.stop = start, stop
+        # directory at the end of the segment: INIT, INTLEN, RSIZE, N
+        init, interval, record_size, records = words[last - 4:last]
+        self.init, self.interval = init, interval
+        self.record_size, self.records = int(record_size), int(records)
+        components = 3 if self.data_type == 2 else 6
+        self.degree = (self.record_size - 2) // components - 1
+        self.first_word = first - 1  # DAF addresses count doubles from 1
+
+    def evaluate(self, words, et):
+        """Position (km) and velocity (km/s) at TDB seconds et, each (len(et), 3)"""
+        index = np.clip(((et - self.init) // self.interval).astype(np.intp), 0, self.records - 1)
+        base = self.first_word + index * self.record_size
+        # gather just the records in use; this is where pages are touched
+        records = words[base[:, None] + np.arange(self.record_size)]
+        mid, radius = records[:, 0], records[:, 1]
+        n = self.degree + 1
+        coefficients = records[:, 2:].reshape(len(et), -1, n)
+
+        x = ((et - mid) / radius)[:, None]
+        position = clenshaw(coefficients[:, :3], x)
+        if self.data_type == 3:
+            velocity = clenshaw(coefficients[:, 3:6], x)
+        else:
+            velocity = clenshaw(derivative_coefficients(coefficients[:, :3]), x) / radius[:, None]
+        return position, velocity
+
+
+class SPKKernel:
+    """Segments of one .bsp file, evaluated straight from the mapping"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        locidw = self._map[:8]
+        if not locidw.startswith(b'DAF/SPK'):
+            raise ValueError(f"{path} is not an SPK file")
+        endian = {b'LTL-IEEE': '<', b'BIG-IEEE': '>'}.get(self._map[88:96])
+        if endian is None:
+            raise ValueError(f"{path} has an unknown binary format")
+        nd, ni = struct.unpack(endian + 'ii', self._map[8:16])
+        forward, = struct.unpack(endian + 'i', self._map[76:80])
+
+        # every double in the file, as a zero-copy view of the mapping
+        self.words = np.frombuffer(self._map, dtype=endian + 'f8')
+        self.segments = {}
+        summary_words = nd + (ni + 1) // 2
+        summary_format = endian + 'd' * nd + 'i' * ni
+        summary_bytes = struct.calcsize(summary_format)
+        record = forward
+        while record:
+            offset = (record - 1) * RECORD_BYTES
+            next_record, _, count = struct.unpack(endian + 'ddd', self._map[offset:offset + 24])
+            for k in range(int(count)):
+                start = offset + 24 + k * summary_words * 8
+                summary = struct.unpack(summary_format, self._map[start:start + summary_bytes])
+                if summary[nd + 3] in SUPPORTED_TYPES:
+                    segment = Segment(self.words, summary)
+                    # later segments take precedence, as in SPICE
+                    self.segments.setdefault(segment.target, []).insert(0, segment)
+            record = int(next_record)
+
+        # union of the segment spans in day numbers, as sorted disjoint intervals
+        spans = sorted(((segment.start - ET_AT_DAY_ZERO) / ephemeris.SECONDS_PER_DAY,
+                        (segment.stop - ET_AT_DAY_ZERO) / ephemeris.SECONDS_PER_DAY)
+                       for segments in self.segments.values() for segment in segments)
+        merged = []
+        for start, stop in spans:
+            if merged and start <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], stop)
+            else:
+                merged.append([start, stop])
+        self.span_start = np.array([span[0] for span in merged])
+        self.span_stop = np.array([span[1] for span in merged])
+        self._rows = {}
+
+    def close(self):
+        self.words = None
+        self._map.close()
+        self._file.close()
+
+    def resolve(self, code):
+        """The code, or for a planet center missing from the kernel its barycenter"""
+        if code in self.segments or code == 0:
+            return code
+        if code % 100 == 99 and code // 100 in self.segments:
+            return code // 100
+        return None
+
+    def state(self, code, et, memo=None):
+        """Position (km) and velocity (km/s) of code relative to the solar system barycenter.
+
+        memo maps codes to states already computed at the same epochs, so
+        bodies sharing a center chain evaluate it once.
+        """
+        if code == 0:
+            return np.zeros((len(et), 3)), np.zeros((len(et), 3))
+        if memo is not None and code in memo:
+            return memo[code]
+        segments = self.segments[code]
+        position = np.zeros((len(et), 3))
+        velocity = np.zeros((len(et), 3))
+        done = np.zeros(len(et), dtype=bool)
+        for segment in segments:
+            use = ~done & (et >= segment.start) & (et <= segment.stop)
+            if use.any():
+                p, v = segment.evaluate(self.words, et[use])
+                if segment.frame == FRAME_J2000:
+                    p, v = _to_ecliptic(p), _to_ecliptic(v)
+                position[use] = p
+                velocity[use] = v
+                done |= use
+        if not done.all():
+            raise ValueError(f"{self.path} does not cover NAIF {code} at all requested epochs")
+        center_position, center_velocity = self.state(segments[0].center, et, memo)
+        state = position + center_position, velocity + center_velocity
+        if memo is not None:
+            memo[code] = state
+        return state
+
+    def coverage(self, code):
+        """(start, stop) in TDB seconds over which code and its centers are all covered"""
+        start, stop = -np.inf, np.inf
+        while code != 0:
+            segments = self.segments[code]
+            start = max(start, min(s.start for s in segments))
+            stop = min(stop, max(s.stop for s in segments))
+            code = segments[0].center
+        return start, stop
+
+    def relative_states(self, target, center, days):
+        """States of target relative to center at day numbers: meters and meters per day"""
+        et = np.atleast_1d(np.asarray(days, dtype=float)) * ephemeris.SECONDS_PER_DAY + ET_AT_DAY_ZERO
+        position, velocity = self.state(target, et)
+        if center != 0:
+            center_position, center_velocity = self.state(center, et)
+            position -= center_position
+            velocity -= center_velocity
+        return position * 1000.0, velocity * (1000.0 * ephemeris.SECONDS_PER_DAY)
+
+    def covers(self, d, physics):
+        k = np.searchsorted(self.span_start, d, side='right') - 1
+        return bool(k >= 0 and d <= self.span_stop[k]) and physics == ephemeris.DEFAULT_PHYSICS
+
+    def fill(self, tree, d, physics, relative, relative_velocity, wanted):
+        """Same contract as ChebyshevEphemeris.fill"""
+        covered = np.zeros(len(tree.names), dtype=bool)
+        if not self.covers(d, physics):
+            return covered
+        et = np.array([d * ephemeris.SECONDS_PER_DAY + ET_AT_DAY_ZERO])
+        memo = {}
+        for row, target, center, start, stop in self._bind(tree):
+            if not (wanted[row] and start <= et[0] <= stop):
+                continue
+            target_position, target_velocity = self.state(target, et, memo)
+            center_position, center_velocity = self.state(center, et, memo)
+            relative[row] = (target_position - center_position)[0] * 1000.0
+            relative_velocity[row] = (target_velocity - center_velocity)[0] * (1000.0 * ephemeris.SECONDS_PER_DAY)
+            covered[row] = True
+        return covered
+
+    def _bind(self, tree):
+        # (row, target, center, coverage) for the tree bodies this kernel covers
+        key = tree.key
+        if key not in self._rows:
+            bound = []
+            for row, name in enumerate(tree.names):
+                parent = tree.parent_index[row]
+                # top-level bodies are heliocentric
+                parent_name = tree.names[parent] if parent >= 0 else 'Sun'
+                if name == 'Sun' or name not in NAIF_IDS or parent_name not in NAIF_IDS:
+                    continue
+                target = self.resolve(NAIF_IDS[name])
+                center = self.resolve(NAIF_IDS[parent_name])
+                if target is None or center is None or target == center:
+                    continue
+                start = max(self.coverage(target)[0], self.coverage(center)[0])
+                stop = min(self.coverage(target)[1], self.coverage(center)[1])
+                bound.append((row, target, center, start, stop))
+            self._rows[key] = bound
+        return self._rows[key]
+
+
+def _to_ecliptic(vectors):
+    c, s = np.cos(OBLIQUITY_J2000), np.sin(OBLIQUITY_J2000)
+    out = np.empty_like(vectors)
+    out[:, 0] = vectors[:, 0]
+    out[:, 1] = c * vectors[:, 1] + s * vectors[:, 2]
+    out[:, 2] = -s * vectors[:, 1] + c * vectors[:, 2]
+    return out
@@ -0,0 +1,196 @@
+"""Bodies whose states come from time-tagged tables instead of orbital elements.
+
+A table is a .npy file, opened as a memory map, with one row per epoch in
+increasing day number (days from 2000 Jan 1 0h) and states relative to the
+body's center in meters and m/s. Two layouts are read:
+
+- records with 'day', 'position' and optionally 'velocity' fields, such as
+  the .npy files written by trajectory_export.py (pick the body with
+  `column`);
+- a plain (rows, 4) or (rows, 7) array: day, x, y, z and optionally vx, vy, vz.
+
+A frame binary-searches the epoch and reads only the rows around it. With
+velocities the state is the cubic Hermite interpolant between the two
+bracketing rows, without them a Lagrange polynomial through ORDER rows. The
+bodies themselves are listed in trajectories.json in the working directory:
+
+    [{"name": "Psyche probe", "table": "psyche.npy", "center": "Sun",
+      "mass": 2600, "radius": 5.0, "color": [0.9, 0.7, 0.3], "visual_radius": 0.1}]
+
+    python tabulated.py psyche.npy --day 9000.5
+
+prints a table's coverage, and the interpolated state at a day.
+"""
+import argparse
+import json
+
+import numpy as np
+
+import ephemeris
+
+ORDER = 8  # rows per Lagrange window
+TRAJECTORY_FILE = "trajectories.json"
+
+
+def lagrange_weights(t, x):
+    """Weights of the Lagrange polynomial through nodes t and of its derivative, at x"""
+    n = len(t)
+    offset = x - t
+    denominator = t[:, None] - t[None, :]
+    np.fill_diagonal(denominator, 1.0)
+    denominator = denominator.prod(axis=1)
+    eye = np.eye(n, dtype=bool)
+    weights = np.where(eye, 1.0, offset[None, :]).prod(axis=1) / denominator
+    # derivative: drop one more factor i != j from each product
+    skip = eye[:, None, :] | eye[None, :, :]
+    derivative = np.where(skip, 1.0, offset[None, None, :]).prod(axis=2)
+    derivative[eye] = 0.0
+    return weights, derivative.sum(axis=1) / denominator
+
+
+def hermite(s, h, p0, v0, p1, v1):
+    """Cubic Hermite position and derivative at fraction s of an interval of length h"""
+    s2, s3 = s * s, s * s * s
+    position = (2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * h * v0 \
+        + (3 * s2 - 2 * s3) * p1 + (s3 - s2) * h * v1
+    velocity = ((6 * s2 - 6 * s) * p0 + (3 * s2 - 4 * s + 1) * h * v0
+                + (6 * s - 6 * s2) * p1 + (3 * s2 - 2 * s) * h * v1) / h
+    return position, velocity
+
+
+class TabulatedTrajectory:
+    """One body's memory-mapped table, as an ephemeris source.
+
+    `gm` (m^3/s^2, center plus body) gives the osculating elements shown in
+    the info panel and drawn as the orbit path; without it the body has
+    none. The source covers the table's span at the default physics only,
+    since a recorded trajectory cannot follow changed masses.
+    """
+
+    def __init__(self, name, table, center=None, gm=None, column=None, order=ORDER):
+        self.name = name
+        self.center = center
+        self.gm = gm
+        self.order = order
+        if table.dtype.names:
+            self.days = table['day']
+            self.position = table['position']
+            self.velocity = table['velocity'] if 'velocity' in table.dtype.names else None
+            if self.position.ndim == 3:
+                self.position = self.position[:, 0 if column is None else column]
+                if self.velocity is not None:
+                    self.velocity = self.velocity[:, 0 if column is None else column]
+        else:
+            if table.ndim != 2 or table.shape[1] not in (4, 7):
+                raise ValueError(f"A plain table needs 4 or 7 columns, not shape {table.shape}")
+            self.days = table[:, 0]
+            self.position = table[:, 1:4]
+            self.velocity = table[:, 4:7] if table.shape[1] == 7 else None
+        if len(self.days) < 2:
+            raise ValueError(f"{name}: a table needs at least two rows")
+        self.start = float(self.days[0])
+        self.stop = float(self.days[-1])
+        self.rows = len(self.days)
+        self._window = None  # (first row, days, positions, velocities) of the rows last read
+        self._rows = {}
+
+    @classmethod
+    def load(cls, name, path, center=None, gm=None, column=None, order=ORDER):
+        return cls(name, np.load(path, mmap_mode='r'), center, gm, column, order)
+
+    def covers(self, d, physics):
+        return self.start <= d <= self.stop and physics == ephemeris.DEFAULT_PHYSICS
+
+    def _read(self, first, count):
+        if self._window is None or self._window[0] != first or len(self._window[1]) != count:
+            rows = slice(first, first + count)
+            velocity = None if self.velocity is None else np.array(self.velocity[rows])
+            self._window = (first, np.array(self.days[rows]), np.array(self.position[rows]), velocity)
+        return self._window[1:]
+
+    def state(self, d):
+        """Position (m) and velocity (m/day) at day d, inside the table"""
+        k = int(np.clip(np.searchsorted(self.days, d, side='right') - 1, 0, self.rows - 2))
+        if self.velocity is not None:
+            days, position, velocity = self._read(k, 2)
+            h = days[1] - days[0]
+            velocity = velocity * ephemeris.SECONDS_PER_DAY
+            return hermite((d - days[0]) / h, h, position[0], velocity[0], position[1], velocity[1])
+        order = min(self.order, self.rows)
+        first = int(np.clip(k - order // 2 + 1, 0, self.rows - order))
+        days, position, _ = self._read(first, order)
+        weights, derivative = lagrange_weights(days - days[0], d - days[0])
+        return weights @ position, derivative @ position
+
+    def fill(self, tree, d, physics, relative, relative_velocity, wanted):
+        """Same contract as ChebyshevEphemeris.fill"""
+        covered = np.zeros(len(tree.names), dtype=bool)
+        row = self._bind(tree)
+        if row is None or not wanted[row] or not self.covers(d, physics):
+            return covered
+        relative[row], relative_velocity[row] = self.state(d)
+        covered[row] = True
+        return covered
+
+    def fill_elements(self, tree, d, elements, covered, a_scale):
+        """Osculating elements about the center, with a in the units compute_orbits scales"""
+        row = self._bind(tree)
+        if self.gm is None or row is None or not covered[row]:
+            return
+        position, velocity = self.state(d)
+        elements[row] = ephemeris.elements_from_states(position, velocity / ephemeris.SECONDS_PER_DAY, self.gm)
+        elements[row, ephemeris.IDX_A] /= a_scale[row]
+
+    def _bind(self, tree):
+        # the tree row of this body, if its parent there is this table's center
+        key = tree.key
+        if key not in self._rows:
+            row = tree.ids.get(self.name)
+            if row is not None:
+                parent = tree.parent_index[row]
+                if (tree.names[parent] if parent >= 0 else None) != self.center:
+                    row = None
+            self._rows[key] = row
+        return self._rows[key]
+
+
+def read_manifest(path=TRAJECTORY_FILE):
+    """Body entries of a trajectories.json: name, table, and optionally center, column,
+    order, mass, radius, color and visual_radius"""
+    with open(path) as f:
+        entries = json.load(f)
+    for entry in entries:
+        missing = {'name', 'table'} - set(entry)
+        if missing:
+            raise ValueError(f"{path}: entry without {', '.join(sorted(missing))}")
+        # heliocentric tables name no center, or the Sun
+        if entry.get('center') == 'Sun':
+            entry['center'] = None
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the coverage of a trajectory table")
+    parser.add_argument("table", help=".npy table")
+    parser.add_argument("--column", type=int, help="body column of a trajectory_export.py file")
+    parser.add_argument("--day", type=float, help="print the interpolated state at this day number")
+    args = parser.parse_args()
+
+    trajectory = TabulatedTrajectory.load(args.table, args.table, column=args.column)
+    steps = np.diff(trajectory.days)
+    kind = "Hermite (positions and velocities)" if trajectory.velocity is not None else \
+        f"Lagrange over {min(trajectory.order, trajectory.rows)} rows (positions only)"
+    print(f"{trajectory.rows} rows, days {trajectory.start:.6f} to {trajectory.stop:.6f}")
+    print(f"steps {steps.min():.6g} to {steps.max():.6g} days, {kind}")
+    if np.any(steps <= 0):
+        print("Epochs are not strictly increasing; interpolation needs them to be")
+    if args.day is not None:
+        if not trajectory.start <= args.day <= trajectory.stop:
+            parser.error(f"day {args.day} is outside the table")
+        position, velocity = trajectory.state(args.day)
+        print(f"position {position} m")
+        print(f"velocity {velocity / ephemeris.SECONDS_PER_DAY} m/s")
+
+
+if __name__ == '__main__':
+    main()
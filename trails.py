@@ -0,0 +1,73 @@
+"""Fixed-size motion trails shared zero-copy with VTK."""
+import numpy as np
+from vtkmodules.util.numpy_support import numpy_to_vtk, numpy_to_vtkIdTypeArray
+from vtkmodules.vtkCommonCore import vtkPoints
+from vtkmodules.vtkCommonDataModel import vtkCellArray, vtkPolyData
+
+
+class TrailBuffer:
+    """Circular buffer holding the last `capacity` positions of one body.
+
+    `points` is the vtkPoints storage itself. The polyline takes its point ids
+    from a doubled table [0..n-1, 0..n-1], so the window from the oldest to the
+    newest sample is always contiguous in it. Appending a sample writes one row
+    and moves the two offsets of the single cell; nothing is reallocated.
+    The cell therefore does not start at offset 0, which vtkCellArray.IsValid()
+    flags, but cell access and rendering handle it.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.count = 0
+        self.head = 0  # next slot to write
+
+        self.points = np.zeros((capacity, 3))
+        ids = np.arange(capacity, dtype=np.int64)
+        self._connectivity = np.concatenate((ids, ids))
+        self._offsets = np.zeros(2, dtype=np.int64)
+
+        self._vtk_points = vtkPoints()
+        self._vtk_points.SetData(numpy_to_vtk(self.points, deep=False))
+        self._vtk_offsets = numpy_to_vtkIdTypeArray(self._offsets, deep=False)
+        self._cells = vtkCellArray()
+        self._cells.SetData(self._vtk_offsets, numpy_to_vtkIdTypeArray(self._connectivity, deep=False))
+
+        self.polydata = vtkPolyData()
+        self.polydata.SetPoints(self._vtk_points)
+        self.polydata.SetLines(self._cells)
+
+    def append(self, position):
+        self.points[self.head] = position
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+        start = (self.head - self.count) % self.capacity
+        self._offsets[0] = start
+        self._offsets[1] = start + self.count
+        self._modified()
+
+    def clear(self):
+        self.count = 0
+        self._offsets[:] = 0
+        self._modified()
+
+    def restore(self, points, count, head):
+        """Take over saved contents of a buffer with the same capacity"""
+        self.points[...] = points
+        self.count = int(count)
+        self.head = int(head)
+        start = (self.head - self.count) % self.capacity
+        self._offsets[0] = start
+        self._offsets[1] = start + self.count
+        self._modified()
+
+    def ordered(self):
+        """Samples from oldest to newest (a copy, for analysis rather than rendering)"""
+        return self.points[self._connectivity[self._offsets[0]:self._offsets[1]]]
+
+    def _modified(self):
+        self._vtk_points.GetData().Modified()
+        self._vtk_points.Modified()
+        self._vtk_offsets.Modified()
+        self._cells.Modified()
@@ -0,0 +1,159 @@
+"""Stream state vectors of any bodies over any date range to CSV or .npy.
+
+    python trajectory_export.py mars.csv --bodies Earth Mars --days 3650 --step 0.01
+
+Epochs are generated and solved a chunk at a time, so memory stays at one
+chunk however long the range is. The next chunk is computed on a second
+thread while the current one is written. Positions are true heliocentric
+meters and velocities m/s, as returned by ephemeris.state_vectors.
+
+CSV has one row per epoch and body. A .npy file holds one record per epoch
+(day, then position and velocity of every body), written sequentially after
+its header, and is best read back through a memory map:
+
+    states = np.load('mars.npy', mmap_mode='r')
+    states['position'][:, 1]  # second body, every epoch
+"""
+import argparse
+import queue
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+import ephemeris
+from events import tree_for
+
+CHUNK = 8192  # epochs per chunk
+
+
+def epoch_count(start, stop, step):
+    return int(np.floor((stop - start) / step + 1e-9)) + 1
+
+
+def epoch_chunks(start, stop, step, chunk=CHUNK):
+    """Day numbers start, start + step, ... up to stop, in arrays of at most chunk"""
+    count = epoch_count(start, stop, step)
+    for first in range(0, count, chunk):
+        yield start + step * np.arange(first, min(first + chunk, count))
+
+
+def stream_states(bodies, start, stop, step, physics=None, chunk=CHUNK):
+    """Yield (days, positions, velocities) per chunk; arrays are (epochs, bodies, 3)"""
+    tree = tree_for(['Sun'] + list(bodies))
+    for days in epoch_chunks(start, stop, step, chunk):
+        position, velocity = ephemeris.state_vectors(tree, days, physics, bodies=bodies)
+        yield days, position.transpose(1, 0, 2), velocity.transpose(1, 0, 2)
+
+
+def prefetch(chunks, depth=2):
+    """Run a chunk generator on a thread, up to depth chunks ahead of the consumer"""
+    pending = queue.Queue(maxsize=depth)
+    done = object()
+
+    def produce():
+        try:
+            for item in chunks:
+                pending.put(item)
+        except Exception as e:
+            pending.put(e)
+        pending.put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = pending.get()
+        if item is done:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def state_dtype(count):
+    return np.dtype([('day', '<f8'), ('position', '<f8', (count, 3)), ('velocity', '<f8', (count, 3))])
+
+
+def write_csv(path, bodies, chunks):
+    """One row per epoch and body; each chunk is formatted with a single % operation"""
+    row = '%.6f,%s,' + ','.join(['%.17g'] * 6) + '\n'
+    rows = 0
+    with open(path, 'w') as f:
+        f.write('day,body,x_m,y_m,z_m,vx_m_s,vy_m_s,vz_m_s\n')
+        names = np.array(bodies, dtype=object)
+        for days, position, velocity in chunks:
+            epochs, count = position.shape[:2]
+            table = np.empty((epochs, count, 8), dtype=object)
+            table[..., 0] = days[:, None]
+            table[..., 1] = names[None, :]
+            table[..., 2:5] = position
+            table[..., 5:8] = velocity
+            f.write((row * (epochs * count)) % tuple(table.ravel()))
+            rows += epochs * count
+    return rows
+
+
+def write_npy(path, bodies, chunks, count):
+    """Records of count epochs in a .npy file, header first, then chunk after chunk"""
+    dtype = state_dtype(len(bodies))
+    written = 0
+    with open(path, 'wb') as f:
+        np.lib.format.write_array_header_1_0(
+            f, {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': (count,)})
+        for days, position, velocity in chunks:
+            block = np.empty(len(days), dtype=dtype)
+            block['day'] = days
+            block['position'] = position
+            block['velocity'] = velocity
+            f.write(block.data)
+            written += len(days)
+    if written != count:
+        raise RuntimeError(f"Wrote {written} epochs into a header for {count}")
+    return written
+
+
+def export(path, bodies, start, stop, step, physics=None, chunk=CHUNK):
+    """Write the states of bodies to path (.csv or .npy); returns the number of epochs"""
+    bodies = list(bodies)
+    if not bodies:
+        raise ValueError("No bodies to export")
+    unknown = [body for body in bodies if body != 'Sun' and body not in ephemeris.MEAN_ELEMENTS]
+    if unknown:
+        raise ValueError(f"Unknown bodies: {', '.join(unknown)}")
+    chunks = prefetch(stream_states(bodies, start, stop, step, physics, chunk))
+    count = epoch_count(start, stop, step)
+    if path.endswith('.npy'):
+        return write_npy(path, bodies, chunks, count)
+    if path.endswith('.csv'):
+        return write_csv(path, bodies, chunks) // len(bodies)
+    raise ValueError(f"Unsupported export format: {path} (use .csv or .npy)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export state vectors to CSV or .npy")
+    parser.add_argument("output", help="output file, .csv or .npy")
+    parser.add_argument("--bodies", nargs="+", default=['Earth'], help="body names")
+    parser.add_argument("--start", help="first date, YYYY-MM-DD (default today)")
+    parser.add_argument("--days", type=float, default=365.0, help="length of the range in days")
+    parser.add_argument("--step", type=float, default=1.0, help="days between epochs")
+    parser.add_argument("--chunk", type=int, default=CHUNK, help="epochs per chunk")
+    parser.add_argument("--sun-mass", type=float, default=1.0, help="Sun mass multiplier")
+    parser.add_argument("--g", type=float, default=1.0, help="G multiplier")
+    parser.add_argument("--eccentricity", type=float, default=1.0, help="eccentricity multiplier")
+    parser.add_argument("--inclination", type=float, default=1.0, help="inclination multiplier")
+    args = parser.parse_args()
+
+    start_date = datetime.strptime(args.start, "%Y-%m-%d") if args.start else datetime.now()
+    start = (start_date - datetime(2000, 1, 1)).total_seconds() / 86400.0
+    physics = dict(sun_mass_scale=args.sun_mass, G_multiplier=args.g, ecc_multiplier=args.eccentricity,
+                   inc_multiplier=args.inclination)
+
+    started = time.perf_counter()
+    epochs = export(args.output, args.bodies, start, start + args.days, args.step, physics, args.chunk)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {epochs} epochs of {len(args.bodies)} bodies to {args.output} in {elapsed:.2f} s "
+          f"({epochs * len(args.bodies) / elapsed:,.0f} states/s)")
+
+
+if __name__ == '__main__':
+    main()